@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -44,7 +45,6 @@ class ActionLogService:
         Lấy nhật ký hành động với các bộ lọc.
         Lưu ý: Firestore yêu cầu tạo index cho các truy vấn này.
         """
-        logs = []
         try:
             query = self.collection
 
@@ -61,12 +61,7 @@ class ActionLogService:
             # Sắp xếp theo thời gian gần nhất và giới hạn kết quả
             query = query.order_by('logAt', direction='DESC').limit(limit)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                log_item = doc.to_dict()
-                log_item['id'] = doc.id
-                logs.append(log_item)
-            return logs
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding action logs: {str(e)}")
             return []
\ No newline at end of file
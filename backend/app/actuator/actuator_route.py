@@ -3,6 +3,8 @@ from typing import List, Dict, Optional
 
 from app.actuator.actuator_model import ActuatorCreate, ActuatorUpdate, ActuatorResponse
 from app.actuator.actuator_service import ActuatorService
+from app.services.topology_cache import zone_topology_cache
+from app.services.actuator_state_tracker import actuator_state_tracker
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,6 +27,7 @@ async def create_actuator(actuator_data: ActuatorCreate):
     created_actuator = await actuator_service.create_actuator(actuator_data.dict())
     if not created_actuator:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create actuator")
+    zone_topology_cache.invalidate(created_actuator['zoneId'])
     
     return ActuatorResponse(**created_actuator)
 
@@ -61,6 +64,11 @@ async def update_actuator(actuator_data: ActuatorUpdate, actuator: dict = Depend
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not update actuator")
 
+    # Actuator có thể được chuyển sang zone khác: làm mới cả zone cũ và zone mới
+    zone_topology_cache.invalidate(actuator['zoneId'])
+    if update_dict.get('zoneId'):
+        zone_topology_cache.invalidate(update_dict['zoneId'])
+
     updated_actuator = await actuator_service.get_actuator(actuator_id)
     return ActuatorResponse(**updated_actuator)
 
@@ -73,4 +81,6 @@ async def delete_actuator(actuator: dict = Depends(get_actuator_or_404)):
     success = await actuator_service.delete_actuator(actuator_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not delete actuator")
+    zone_topology_cache.invalidate(actuator['zoneId'])
+    actuator_state_tracker.forget([actuator_id])
     return None
\ No newline at end of file
@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts, stream_pages
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -50,7 +51,6 @@ class ActuatorService:
 
     async def get_all_actuators(self, zone_id: Optional[str] = None, device_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Lấy tất cả các actuator, có thể lọc theo zoneId hoặc deviceId."""
-        actuators = []
         try:
             query = self.collection
             if zone_id:
@@ -58,12 +58,7 @@ class ActuatorService:
             if device_id:
                 query = query.where('deviceId', '==', device_id)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                actuator_data = doc.to_dict()
-                actuator_data['id'] = doc.id
-                actuators.append(actuator_data)
-            return actuators
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding actuators: {str(e)}")
             return []
@@ -97,16 +92,14 @@ class ActuatorService:
     async def delete_actuators_by_zone(self, zone_id: str) -> bool:
         try:
             query = self.collection.where('zoneId', '==', zone_id)
-            docs = await run_in_threadpool(query.stream)
-            
-            batch = db.batch()
             count = 0
-            for doc in docs:
-                batch.delete(doc.reference)
-                count += 1
-            
-            if count > 0:
+            # Mỗi trang tối đa 500 document, vừa một batch ghi
+            async for docs in stream_pages(query):
+                batch = db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
                 await run_in_threadpool(batch.commit)
+                count += len(docs)
             
             logger.info(f"Deleted {count} actuators for zone {zone_id}")
             return True
@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts
 from app.utils.logger import get_logger
 from app.alter.alter_model import AlterStatus, AlterSeverity # Import enum
 
@@ -52,10 +53,10 @@ class AlterService:
         self,
         zone_id: Optional[str] = None,
         status: Optional[AlterStatus] = None,
-        severity: Optional[AlterSeverity] = None
+        severity: Optional[AlterSeverity] = None,
+        limit: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Lấy danh sách các cảnh báo với các bộ lọc."""
-        alerts = []
+        """Lấy danh sách các cảnh báo với các bộ lọc (tối đa `limit` cảnh báo gần nhất nếu có)."""
         try:
             query = self.collection
             if zone_id:
@@ -67,13 +68,10 @@ class AlterService:
 
             # Sắp xếp theo thời gian gần nhất
             query = query.order_by('at', direction='DESC')
+            if limit:
+                query = query.limit(limit)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                alert_data = doc.to_dict()
-                alert_data['id'] = doc.id
-                alerts.append(alert_data)
-            return alerts
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding alters: {str(e)}")
             return []
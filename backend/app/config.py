@@ -35,7 +35,47 @@ class Settings(BaseSettings):
     # Command topic is optional at load time to avoid validation errors;
     # we validate presence in validate_settings()
     mqtt_command_topic: Optional[str] = os.getenv("MQTT_COMMAND_TOPIC")
-    
+    # MQTT client backend: "paho" (background thread) hoặc "gmqtt" (asyncio, chạy trên event loop)
+    mqtt_transport: str = os.getenv("MQTT_TRANSPORT", "paho")
+
+    # Ingest Pipeline Configuration
+    # Mỗi shard có một worker riêng: số shard = số zone được xử lý song song
+    ingest_shard_count: int = int(os.getenv("INGEST_SHARD_COUNT", 16))
+    ingest_shard_queue_size: int = int(os.getenv("INGEST_SHARD_QUEUE_SIZE", 1000))
+    ingest_drain_timeout: float = float(os.getenv("INGEST_DRAIN_TIMEOUT", 10.0))
+
+    # History Write-Behind Configuration
+    history_batch_max_delay: float = float(os.getenv("HISTORY_BATCH_MAX_DELAY", 2.0))
+    history_batch_max_in_flight: int = int(os.getenv("HISTORY_BATCH_MAX_IN_FLIGHT", 4))
+
+    # Zone Topology Cache Configuration
+    topology_cache_ttl: float = float(os.getenv("TOPOLOGY_CACHE_TTL", 300.0))
+    # Zone không tồn tại chỉ được nhớ trong khoảng ngắn này (lỗi đọc Firestore thì không được lưu)
+    topology_cache_negative_ttl: float = float(os.getenv("TOPOLOGY_CACHE_NEGATIVE_TTL", 30.0))
+
+    # Zone Status Write-Behind Configuration
+    # Trạng thái mỗi zone được ghi xuống Firestore tối đa một lần mỗi N giây (ngay lập tức nếu status thay đổi)
+    zone_status_flush_interval: float = float(os.getenv("ZONE_STATUS_FLUSH_INTERVAL", 30.0))
+
+    # Reading Storage Policy (mặc định, có thể ghi đè theo zone hoặc crop profile)
+    # Chế độ nén: "none", "deadband" hoặc "swinging_door"
+    storage_compression: str = os.getenv("STORAGE_COMPRESSION", "swinging_door")
+    storage_heartbeat_seconds: float = float(os.getenv("STORAGE_HEARTBEAT_SECONDS", 900.0))
+
+    # Reading Storage Layout: "documents" (một document mỗi giá trị) hoặc "buckets" (một document mỗi zone / loại đo / giờ)
+    reading_storage_layout: str = os.getenv("READING_STORAGE_LAYOUT", "documents")
+    reading_bucket_flush_interval: float = float(os.getenv("READING_BUCKET_FLUSH_INTERVAL", 10.0))
+    # Mã hóa các mẫu trong bucket: "gorilla" (nén delta-of-delta / XOR) hoặc "arrays"
+    reading_bucket_encoding: str = os.getenv("READING_BUCKET_ENCODING", "gorilla")
+
+    # Alert State Machine Configuration
+    # Thời gian vượt ngưỡng liên tục trước khi gửi cảnh báo (0 = gửi ngay)
+    alert_min_breach_seconds: float = float(os.getenv("ALERT_MIN_BREACH_SECONDS", 0.0))
+    # Gửi lại cảnh báo nếu vẫn còn vượt ngưỡng sau khoảng thời gian này
+    alert_renotify_seconds: float = float(os.getenv("ALERT_RENOTIFY_SECONDS", 3600.0))
+    # Vượt ngưỡng trở lại trong khoảng này sau lần thông báo trước thì không gửi lại
+    alert_cooldown_seconds: float = float(os.getenv("ALERT_COOLDOWN_SECONDS", 600.0))
+    alert_state_persist_interval: float = float(os.getenv("ALERT_STATE_PERSIST_INTERVAL", 60.0))
 
     # Threshold Configuration
     TEMP_THRESHOLD_HIGH: float = float(os.getenv("TEMP_THRESHOLD_HIGH", 35.0))
@@ -50,8 +90,55 @@ class Settings(BaseSettings):
     mail_server: str = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
-    mail_starttls: bool = True
-    mail_ssl_tls: bool = False
+    # Email Outbox Configuration (hàng đợi email bền vững trên SQLite)
+    email_outbox_path: str = os.getenv("EMAIL_OUTBOX_PATH", "data/email_outbox.db")
+    email_worker_count: int = int(os.getenv("EMAIL_WORKER_COUNT", 4))
+    email_max_attempts: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+    email_retry_base_delay: float = float(os.getenv("EMAIL_RETRY_BASE_DELAY", 30.0))
+    email_outbox_poll_interval: float = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", 5.0))
+    email_outbox_retention_days: int = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 7))
+
+    mail_starttls: bool = os.getenv("MAIL_STARTTLS", "true").lower() == "true"
+    mail_ssl_tls: bool = os.getenv("MAIL_SSL_TLS", "false").lower() == "true"
+    mail_validate_certs: bool = os.getenv("MAIL_VALIDATE_CERTS", "true").lower() == "true"
+
+    # SMTP Connection Pool Configuration
+    smtp_pool_size: int = int(os.getenv("SMTP_POOL_SIZE", 4))
+    smtp_idle_timeout: float = float(os.getenv("SMTP_IDLE_TIMEOUT", 60.0))
+    smtp_health_check_after: float = float(os.getenv("SMTP_HEALTH_CHECK_AFTER", 15.0))
+    smtp_send_timeout: float = float(os.getenv("SMTP_SEND_TIMEOUT", 30.0))
+
+    # Notification Rate Limit Configuration (maxPerHour / maxPerDay của từng người dùng)
+    rate_limit_checkpoint_interval: float = float(os.getenv("RATE_LIMIT_CHECKPOINT_INTERVAL", 60.0))
+    # Số thông báo bị hoãn tối đa giữ lại cho email tổng hợp của mỗi người dùng
+    rate_limit_max_deferred: int = int(os.getenv("RATE_LIMIT_MAX_DEFERRED", 100))
+
+    # Alert Digest Configuration (cửa sổ mặc định khi người dùng chọn nhận email tổng hợp)
+    digest_window_minutes: int = int(os.getenv("DIGEST_WINDOW_MINUTES", 5))
+
+    # Hot Window Configuration (giá trị gần đây của mỗi zone / loại đo giữ trong bộ nhớ)
+    hot_window_seconds: float = float(os.getenv("HOT_WINDOW_SECONDS", 86400.0))
+    # Chu kỳ gửi dữ liệu dự kiến, dùng để cấp phát sẵn bộ đệm của mỗi chuỗi
+    hot_window_sample_interval: float = float(os.getenv("HOT_WINDOW_SAMPLE_INTERVAL", 5.0))
+
+    # Reading Rollup Configuration (tổng hợp 1m / 1h / 1d, ghi xuống Firestore mỗi N giây)
+    rollup_flush_interval: float = float(os.getenv("ROLLUP_FLUSH_INTERVAL", 60.0))
+
+    # Response Cache Configuration (hồ sơ cây trồng, dữ liệu cài đặt zone; ghi qua API sẽ xóa cache ngay)
+    # Giới hạn thời gian dữ liệu cũ tồn tại khi Firestore bị sửa từ bên ngoài tiến trình này
+    response_cache_ttl: float = float(os.getenv("RESPONSE_CACHE_TTL", 300.0))
+
+    # Status Stream Configuration (SSE đẩy trạng thái zone tới trình duyệt)
+    status_stream_heartbeat_interval: float = float(os.getenv("STATUS_STREAM_HEARTBEAT_INTERVAL", 15.0))
+    # Client không đọc cập nhật trong khoảng này sẽ bị ngắt kết nối
+    status_stream_slow_consumer_timeout: float = float(os.getenv("STATUS_STREAM_SLOW_CONSUMER_TIMEOUT", 30.0))
+    # Ticket dùng một lần để mở status stream (thay cho ID token trong URL)
+    stream_ticket_ttl: float = float(os.getenv("STREAM_TICKET_TTL", 30.0))
+
+    # Firebase Auth Configuration
+    auth_token_cache_size: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    # Chu kỳ tải lại chứng chỉ ký token của Google (nằm trong cache HTTP nếu còn hạn)
+    firebase_cert_refresh_interval: float = float(os.getenv("FIREBASE_CERT_REFRESH_INTERVAL", 600.0))
     
     class Config:
         env_file = ".env"
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, AliasChoices
 from typing import Optional, List
 from datetime import datetime
 
+from app.zone.zone_model import StoragePolicy
+
 class IdealThresholdSetting(BaseModel):
     """Model cho một ngưỡng lý tưởng (chỉ có min/max)."""
     min: float = Field(..., description="Lower threshold")
@@ -23,6 +25,7 @@ class CropProfileBase(BaseModel):
     """Base model với các trường chung của một hồ sơ cây trồng."""
     name: str = Field(..., description="Crop profile name")
     idealThresholds: IdealThresholds = Field(..., description="Thresholds")
+    storagePolicy: Optional[StoragePolicy] = Field(None, description="Default reading storage policy of zones using this profile")
 
 class CropProfileCreate(CropProfileBase):
     """Model để tạo một hồ sơ cây trồng mới."""
@@ -32,6 +35,7 @@ class CropProfileUpdate(BaseModel):
     """Model để cập nhật thông tin hồ sơ, tất cả các trường đều không bắt buộc."""
     name: Optional[str] = Field(None, description="New crop profile name")
     idealThresholds: Optional[IdealThresholds] = Field(None, description="New thresholds")
+    storagePolicy: Optional[StoragePolicy] = Field(None, description="New reading storage policy")
 
 class CropProfileResponse(CropProfileBase):
     """Model cho dữ liệu trả về, bao gồm các trường do server tạo."""
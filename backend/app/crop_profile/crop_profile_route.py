@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from typing import List, Dict
 
 from app.crop_profile.crop_profile_model import CropProfileCreate, CropProfileUpdate, CropProfileResponse
 from app.crop_profile.crop_profile_service import CropProfileService
+from app.services.response_cache import cached_json_response
+from app.services.topology_cache import zone_topology_cache
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -31,19 +33,26 @@ async def create_crop_profile(profile_data: CropProfileCreate):
     return CropProfileResponse(**created_profile)
 
 @router.get("/", response_model=List[CropProfileResponse])
-async def get_all_crop_profiles():
+async def get_all_crop_profiles(request: Request):
     """
     Lấy danh sách tất cả các hồ sơ cây trồng có sẵn.
+    Kèm ETag: client gửi If-None-Match trùng khớp sẽ nhận 304.
     """
-    profiles = await crop_profile_service.get_all_crop_profiles()
-    return [CropProfileResponse(**profile) for profile in profiles]
+    response = await crop_profile_service.get_all_crop_profiles_response()
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not load crop profiles")
+    return cached_json_response(request, response)
 
 @router.get("/{profile_id}", response_model=CropProfileResponse)
-async def get_crop_profile(profile: dict = Depends(get_profile_or_404)):
+async def get_crop_profile(profile_id: str, request: Request):
     """
     Lấy thông tin chi tiết của một hồ sơ cây trồng bằng ID.
+    Kèm ETag: client gửi If-None-Match trùng khớp sẽ nhận 304.
     """
-    return CropProfileResponse(**profile)
+    response = await crop_profile_service.get_crop_profile_response(profile_id)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Crop profile with ID {profile_id} not found")
+    return cached_json_response(request, response)
 
 @router.put("/{profile_id}", response_model=CropProfileResponse)
 async def update_crop_profile(profile_data: CropProfileUpdate, profile: dict = Depends(get_profile_or_404)):
@@ -59,6 +68,8 @@ async def update_crop_profile(profile_data: CropProfileUpdate, profile: dict = D
     success = await crop_profile_service.update_crop_profile(profile_id, update_dict)
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not update crop profile")
+    # Nhiều zone có thể dùng chung hồ sơ này
+    zone_topology_cache.invalidate()
 
     updated_profile = await crop_profile_service.get_crop_profile(profile_id)
     return CropProfileResponse(**updated_profile)
@@ -72,4 +83,5 @@ async def delete_crop_profile(profile: dict = Depends(get_profile_or_404)):
     success = await crop_profile_service.delete_crop_profile(profile_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not delete crop profile")
+    zone_topology_cache.invalidate()
     return None
\ No newline at end of file
@@ -2,11 +2,20 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
+from app.crop_profile.crop_profile_model import CropProfileResponse
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts
+from app.services.response_cache import CachedResponse, crop_profile_cache
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Khóa của danh sách đầy đủ trong crop_profile_cache (các khóa khác là ID hồ sơ)
+ALL_PROFILES_KEY = "*"
+
+def _render_profiles(profiles: List[Dict[str, Any]]) -> List[CropProfileResponse]:
+    return [CropProfileResponse(**profile) for profile in profiles]
+
 class CropProfileService:
     """Service class for managing crop profile operations in Firestore."""
     
@@ -14,6 +23,10 @@ class CropProfileService:
         self.collection_name = collection_name
         self.collection = db.collection(collection_name)
 
+    def _invalidate(self, profile_id: str):
+        crop_profile_cache.invalidate(profile_id)
+        crop_profile_cache.invalidate(ALL_PROFILES_KEY)
+
     async def create_crop_profile(self, profile_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Tạo một hồ sơ cây trồng mới."""
         try:
@@ -25,6 +38,8 @@ class CropProfileService:
             
             logger.info(f"Crop profile created successfully with ID: {doc_ref.id}")
             
+            crop_profile_cache.invalidate(ALL_PROFILES_KEY)
+
             created_data = profile_data.copy()
             created_data['id'] = doc_ref.id
             return created_data
@@ -50,17 +65,26 @@ class CropProfileService:
 
     async def get_all_crop_profiles(self) -> List[Dict[str, Any]]:
         """Lấy tất cả các hồ sơ cây trồng."""
-        profiles = []
+        response = await self.get_all_crop_profiles_response()
+        return [dict(profile) for profile in response.value] if response else []
+
+    async def get_all_crop_profiles_response(self) -> Optional[CachedResponse]:
+        """Danh sách hồ sơ cây trồng đã render sẵn (kèm ETag) từ cache; None nếu không đọc được Firestore."""
         try:
-            docs = await run_in_threadpool(self.collection.stream)
-            for doc in docs:
-                profile_data = doc.to_dict()
-                profile_data['id'] = doc.id
-                profiles.append(profile_data)
-            return profiles
+            return await crop_profile_cache.get(
+                ALL_PROFILES_KEY, lambda: fetch_dicts(self.collection), render=_render_profiles
+            )
         except Exception as e:
             logger.error(f"Error finding crop profiles: {str(e)}")
-            return []
+            return None
+
+    async def get_crop_profile_response(self, profile_id: str) -> Optional[CachedResponse]:
+        """Hồ sơ cây trồng đã render sẵn (kèm ETag) từ cache; None nếu không tìm thấy."""
+        return await crop_profile_cache.get(
+            profile_id,
+            lambda: self.get_crop_profile(profile_id),
+            render=lambda profile: CropProfileResponse(**profile),
+        )
 
     async def update_crop_profile(self, profile_id: str, profile_data: Dict[str, Any]) -> bool:
         """Cập nhật thông tin hồ sơ cây trồng."""
@@ -69,6 +93,7 @@ class CropProfileService:
             
             doc_ref = self.collection.document(profile_id)
             await run_in_threadpool(doc_ref.update, profile_data)
+            self._invalidate(profile_id)
             
             logger.info(f"Crop profile updated successfully: {profile_id}")
             return True
@@ -82,6 +107,7 @@ class CropProfileService:
         try:
             doc_ref = self.collection.document(profile_id)
             await run_in_threadpool(doc_ref.delete)
+            self._invalidate(profile_id)
             logger.info(f"Crop profile deleted successfully: {profile_id}")
             return True
         except Exception as e:
@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts, stream_pages
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -53,18 +54,12 @@ class DeviceService:
 
     async def get_all_devices(self, zone_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Lấy tất cả các device, có thể lọc theo zoneId."""
-        devices = []
         try:
             query = self.collection
             if zone_id:
                 query = query.where('zoneId', '==', zone_id)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                device_data = doc.to_dict()
-                device_data['id'] = doc.id
-                devices.append(device_data)
-            return devices
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding devices (zone_id={zone_id}): {str(e)}")
             return []
@@ -98,16 +93,14 @@ class DeviceService:
     async def delete_devices_by_zone(self, zone_id: str) -> bool:
         try:
             query = self.collection.where('zoneId', '==', zone_id)
-            docs = await run_in_threadpool(query.stream)
-            
-            batch = db.batch()
             count = 0
-            for doc in docs:
-                batch.delete(doc.reference)
-                count += 1
-            
-            if count > 0:
+            # Mỗi trang tối đa 500 document, vừa một batch ghi
+            async for docs in stream_pages(query):
+                batch = db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
                 await run_in_threadpool(batch.commit)
+                count += len(docs)
             
             logger.info(f"Deleted {count} devices for zone {zone_id}")
             return True
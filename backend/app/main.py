@@ -22,11 +22,24 @@ from app.alter.alter_route import router as alter_router
 from app.actuator.actuator_route import router as actuator_router
 from app.action_log.action_log_route import router as action_log_router
 from app.scheduler.scheduler_route import router as scheduler_router
+from app.stats.stats_route import router as stats_router
 
 from app.services import mqtt_service
+from app.services.ingest_service import ingest_service
+from app.services.history_writer import history_writer
+from app.services.zone_status_store import zone_status_store
+from app.services.actuator_state_tracker import actuator_state_tracker
+from app.services.alert_state_machine import alert_state_machine
+from app.services.email_outbox import email_outbox
+from app.services.notification_rate_limiter import notification_rate_limiter
+from app.services.reading_rollup import reading_rollup
+from app.services.reading_buckets import reading_bucket_writer
+from app.services.status_hub import status_hub
+from app.services.email_service import email_service
 from app.services.scheduler_service import apscheduler_service
 from app.services.command_service import publish_command
 from app.services.firebase_auth import get_verified_user
+from app.services.token_verifier import token_verifier
 # from app.middleware.auth import AuthMiddleware
 
 logger = get_logger(__name__)
@@ -40,8 +53,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting FastAPI application...")
     
+    # Tải trước chứng chỉ ký Firebase ID token
+    await token_verifier.start()
+
+    # --- START INGEST PIPELINE (before MQTT so no message is dropped) ---
+    await history_writer.start()
+    await zone_status_store.start()
+    # Trạng thái actuator cuối cùng, để chỉ ghi lịch sử khi có chuyển trạng thái
+    await actuator_state_tracker.seed()
+    await alert_state_machine.start()
+    await notification_rate_limiter.start()
+    await email_outbox.start()
+    # Rollup 1m / 1h / 1d, ghi định kỳ bởi APScheduler
+    reading_rollup.start()
+    reading_bucket_writer.start()
+    await ingest_service.start(mqtt_service.process_sensor_data)
+
     # --- CONNECT MQTT ---
-    mqtt_service.start_mqtt_service()
+    await mqtt_service.start_mqtt_service()
     
     # --- START APSCHEDULER ---
     await apscheduler_service.start_scheduler()
@@ -55,8 +84,22 @@ async def lifespan(app: FastAPI):
     yield  # Application is running
     
     # Shutdown
+    # Kết thúc các status stream đang mở để server không phải chờ client
+    status_hub.close()
     apscheduler_service.stop_scheduler()
-    mqtt_service.stop_mqtt_service()
+    await mqtt_service.stop_mqtt_service()
+    await ingest_service.stop()
+    mqtt_service.flush_pending_readings()
+    await reading_rollup.stop()
+    await reading_bucket_writer.stop()
+    # Flush buffered history rows and zone statuses so they survive the restart
+    await zone_status_store.stop()
+    await alert_state_machine.stop()
+    await email_outbox.stop()
+    await notification_rate_limiter.stop()
+    await email_service.close()
+    await history_writer.stop()
+    await token_verifier.stop()
     logger.info("Shutting down FastAPI application...")
 
 
@@ -79,6 +122,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Attach global auth middleware
@@ -110,7 +154,7 @@ async def send_command_to_zone_device(zone_id: str, request: CommandRequest, use
     logger.info(f"Received API request to send command: {request.command} to zone '{zone_id}'")
     
     # Gọi hàm publish từ command service
-    success = publish_command(zone_id, request.command, user_info=user)
+    success = await publish_command(zone_id, request.command, user_info=user)
     
     if success:
         return {"status": "success", "message": f"Command '{request.command}' published zone '{zone_id}' successfully."}
@@ -133,6 +177,7 @@ app.include_router(alter_router)
 app.include_router(actuator_router)
 app.include_router(action_log_router)
 app.include_router(scheduler_router)
+app.include_router(stats_router)
 
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -3,9 +3,8 @@ from typing import Optional, Set
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
-from firebase_admin import auth as firebase_auth
 
-from app.services.database import initialize_firebase
+from app.services.token_verifier import token_verifier
 
 
 class AuthMiddleware(BaseHTTPMiddleware):
@@ -34,8 +33,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             return JSONResponse(status_code=401, content={"detail": "Invalid Authorization scheme"})
 
         try:
-            initialize_firebase()
-            decoded = firebase_auth.verify_id_token(token)
+            decoded = await token_verifier.verify(token)
             if not decoded.get("email_verified", False):
                 return JSONResponse(status_code=403, content={"detail": "Email not verified"})
             request.state.user = decoded
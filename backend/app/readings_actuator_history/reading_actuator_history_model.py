@@ -8,6 +8,8 @@ class ReadingActuatorHistoryBase(BaseModel):
     zoneId: str = Field(..., description="ID của khu vực")
     type: str = Field(..., description="Loại actuator (ví dụ: PUMP, FAN)")
     state: str = Field(..., description="Trạng thái của actuator (ví dụ: 'ON', 'OFF', 'AUTO')")
+    previousState: Optional[str] = Field(None, description="Trạng thái trước khi chuyển (None nếu chưa biết)")
+    previousStateDurationSeconds: Optional[float] = Field(None, description="Thời gian (giây) actuator đã ở trạng thái trước đó")
 
 class ReadingActuatorHistoryCreate(ReadingActuatorHistoryBase):
 
@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -46,14 +47,7 @@ class ReadingActuatorHistoryService:
             if type:
                 query = query.where(field_path='type', op_string='==', value=type)
        
-            docs_stream = await run_in_threadpool(query.stream)
-            
-            logs = []
-            for doc in docs_stream:
-                log_data = doc.to_dict()
-                log_data['id'] = doc.id
-                logs.append(log_data)
-            
+            logs = await fetch_dicts(query)
 
             logs.sort(key=lambda x: x.get('readAt', datetime.min), reverse=True)
             
@@ -62,3 +56,19 @@ class ReadingActuatorHistoryService:
             logger.error(f"Error finding actuator history: {str(e)}")
             return []
 
+
+    async def get_latest_actuator_log(self, actuator_id: str) -> Optional[Dict[str, Any]]:
+        """Lấy bản ghi lịch sử mới nhất của một actuator (cần index actuatorId + readAt)."""
+        try:
+            query = self.collection.where(field_path='actuatorId', op_string='==', value=actuator_id)\
+                                   .order_by('readAt', direction='DESCENDING')\
+                                   .limit(1)
+            docs = await run_in_threadpool(query.get)
+            for doc in docs:
+                log_data = doc.to_dict()
+                log_data['id'] = doc.id
+                return log_data
+            return None
+        except Exception as e:
+            logger.error(f"Error finding latest history of actuator {actuator_id}: {str(e)}")
+            return None
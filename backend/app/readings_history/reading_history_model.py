@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class ReadingHistoryBase(BaseModel):
@@ -25,4 +25,22 @@ class ReadingHistoryResponse(ReadingHistoryBase):
 
 class ReadingHistoryInDB(ReadingHistoryResponse):
     """Model đầy đủ của bản ghi lịch sử trong DB."""
-    pass
\ No newline at end of file
+    pass
+
+class SeriesPoint(BaseModel):
+    """Một điểm của chuỗi đã giảm mẫu."""
+    readAt: datetime = Field(..., description="Time readed")
+    value: float = Field(..., description="Value")
+
+class ReadingSeriesResponse(BaseModel):
+    """Chuỗi giá trị của một đại lượng đã được giảm mẫu để vẽ biểu đồ."""
+    zoneId: str = Field(..., description="ID zone")
+    type: str = Field(..., description="Type of Measure")
+    sensorId: Optional[str] = Field(None, description="ID sensor")
+    start: datetime = Field(..., description="Start of the window (inclusive)")
+    end: datetime = Field(..., description="End of the window (exclusive)")
+    method: Literal["lttb", "minmax"] = Field(..., description="Downsampling method")
+    resolution: Literal["raw", "1m", "1h", "1d"] = Field("raw", description="Source of the points: raw readings or a rollup resolution")
+    source: Literal["memory", "firestore"] = Field("firestore", description="memory when served from the recent-readings window")
+    rawPoints: int = Field(..., description="Number of readings in the window (sum of bucket counts for rollups)")
+    points: List[SeriesPoint] = Field(default_factory=list, description="Downsampled points, oldest first")
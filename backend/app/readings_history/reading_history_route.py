@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+from fastapi.concurrency import run_in_threadpool
+import numpy as np
 
-from app.readings_history.reading_history_model import ReadingHistoryCreate, ReadingHistoryResponse
-from app.readings_history.reading_history_service import ReadingHistoryService
+from app.readings_history.reading_history_model import ReadingHistoryCreate, ReadingHistoryResponse, ReadingSeriesResponse, SeriesPoint
+from app.readings_history.reading_history_service import ReadingHistoryService, decode_cursor
+from app.services.hot_window import hot_window_store
+from app.services.reading_rollup import RESOLUTIONS, choose_resolution, reading_rollup
+from app.utils.downsample import MIN_MAX, downsample
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -11,6 +16,31 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/readings_history", tags=["readings history"])
 reading_service = ReadingHistoryService()
 
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Query datetimes without an offset are taken as UTC."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _rollup_series(buckets: List[dict], method: str):
+    """
+    Rollup buckets -> (timestamps, values): the bucket average for lttb, the
+    bucket min and max for minmax so that extremes survive the aggregation.
+    """
+    timestamps, values = [], []
+    for bucket in buckets:
+        at = _as_utc(bucket["bucketStart"]).timestamp()
+        if method == MIN_MAX:
+            timestamps.extend((at, at))
+            values.extend((bucket["min"], bucket["max"]))
+        else:
+            timestamps.append(at)
+            values.append(bucket["sum"] / bucket["count"])
+    return np.asarray(timestamps, dtype=np.float64), np.asarray(values, dtype=np.float64)
+
+
 @router.post("/", response_model=ReadingHistoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_reading_history(reading_data: ReadingHistoryCreate):
     """
@@ -20,22 +50,119 @@ async def create_reading_history(reading_data: ReadingHistoryCreate):
     created_reading = await reading_service.create_reading(reading_data.dict())
     if not created_reading:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not save reading record")
-    
+    reading_rollup.add(created_reading['zoneId'], created_reading['type'], created_reading['readAt'], created_reading['value'])
+    hot_window_store.append(created_reading['zoneId'], created_reading['type'], created_reading['readAt'], created_reading['value'], created_reading['sensorId'])
+
     return ReadingHistoryResponse(**created_reading)
 
 @router.get("/", response_model=List[ReadingHistoryResponse])
 async def get_readings_history(
+    response: Response,
     zone_id: str = Query(..., description="ID của khu vực cần truy vấn lịch sử"),
     sensor_id: Optional[str] = Query(None, description="Lọc theo ID của cảm biến cụ thể"),
     type: Optional[str] = Query(None, description="Lọc theo loại đại lượng đo (ví dụ: temperature)"),
+    start: Optional[datetime] = Query(None, description="Chỉ lấy bản ghi có readAt >= start"),
+    end: Optional[datetime] = Query(None, description="Chỉ lấy bản ghi có readAt < end"),
+    limit: int = Query(1000, ge=1, le=10000, description="Số bản ghi tối đa của một trang"),
+    start_after: Optional[str] = Query(None, description="Cursor trả về trong header X-Next-Cursor của trang trước"),
+    order: Literal["asc", "desc"] = Query("desc", description="Thứ tự theo readAt"),
 ):
     """
-    Truy vấn lịch sử các giá trị đọc được từ cảm biến.
+    Truy vấn lịch sử các giá trị đọc được từ cảm biến, theo từng trang.
+    Nếu còn trang tiếp theo, cursor của nó nằm trong header X-Next-Cursor.
     """
-        
-    readings = await reading_service.get_readings(
+    start, end = _as_utc(start), _as_utc(end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+
+    cursor = None
+    if start_after:
+        try:
+            cursor = decode_cursor(start_after)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid start_after cursor")
+
+    readings, next_cursor = await reading_service.get_readings_page(
         zone_id=zone_id,
         sensor_id=sensor_id,
         type=type,
+        start=start,
+        end=end,
+        limit=limit,
+        start_after=cursor,
+        descending=order == "desc",
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [ReadingHistoryResponse(**reading) for reading in readings]
+
+
+@router.get("/series", response_model=ReadingSeriesResponse)
+async def get_readings_series(
+    zone_id: str = Query(..., description="ID của khu vực"),
+    type: str = Query(..., description="Loại đại lượng đo (ví dụ: temperature)"),
+    sensor_id: Optional[str] = Query(None, description="Lọc theo ID của cảm biến cụ thể"),
+    start: Optional[datetime] = Query(None, description="Đầu khoảng thời gian (mặc định: 24 giờ trước end)"),
+    end: Optional[datetime] = Query(None, description="Cuối khoảng thời gian (mặc định: hiện tại)"),
+    max_points: int = Query(300, ge=3, le=5000, description="Số điểm tối đa trả về"),
+    method: Literal["lttb", "minmax"] = Query("lttb", description="lttb giữ hình dạng chuỗi, minmax giữ giá trị cực trị của mỗi bucket"),
+    resolution: Literal["auto", "raw", "1m", "1h", "1d"] = Query("auto", description="auto chọn rollup thô nhất vẫn đủ max_points điểm"),
+):
+    """
+    Lấy chuỗi giá trị của một đại lượng trong một khoảng thời gian, đã giảm mẫu còn tối đa max_points điểm để vẽ biểu đồ.
+    Khoảng thời gian dài được đọc từ các rollup 1m / 1h / 1d thay vì từ từng bản ghi (rollup tổng hợp theo zone, nên không dùng khi lọc theo sensor_id).
+    Khoảng thời gian nằm trọn trong cửa sổ gần đây được giữ trong bộ nhớ thì không cần đọc Firestore.
+    """
+    end = _as_utc(end) or datetime.now(timezone.utc)
+    start = _as_utc(start) or end - timedelta(hours=24)
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+
+    memory = None
+    if resolution in ("auto", "raw"):
+        memory = hot_window_store.query(zone_id, type, start, end, sensor_id)
+        if memory is not None:
+            resolution = "raw"
+
+    if resolution == "auto":
+        resolution = choose_resolution(start, end, max_points) or "raw"
+    if resolution != "raw" and sensor_id:
+        resolution = "raw"
+
+    buckets = None
+    if memory is None and resolution in RESOLUTIONS:
+        buckets = await reading_rollup.get_buckets(zone_id, type, resolution, start, end)
+        if buckets is None:
+            # Rollup không bao phủ trọn khoảng này (dữ liệu cũ hơn rollup): đọc bản ghi gốc
+            resolution = "raw"
+
+    if memory is not None:
+        timestamps, values = memory
+        raw_points = len(values)
+    elif resolution != "raw":
+        timestamps, values = _rollup_series(buckets, method)
+        raw_points = sum(bucket["count"] for bucket in buckets)
+    else:
+        timestamps, values = await reading_service.get_series(
+            zone_id=zone_id, type=type, start=start, end=end, sensor_id=sensor_id
+        )
+        raw_points = len(values)
+    # Giảm mẫu trong thread để không chặn event loop với cửa sổ lớn
+    keep = await run_in_threadpool(downsample, timestamps, values, max_points, method)
+    points = [
+        # str() cho giá trị float32 ngắn nhất (23.4 thay vì 23.399999618530273)
+        SeriesPoint(readAt=datetime.fromtimestamp(timestamps[i], tz=timezone.utc), value=float(str(values[i])))
+        for i in keep.tolist()
+    ]
+    return ReadingSeriesResponse(
+        zoneId=zone_id,
+        type=type,
+        sensorId=sensor_id,
+        start=start,
+        end=end,
+        method=method,
+        resolution=resolution,
+        source="memory" if memory is not None else "firestore",
+        rawPoints=raw_points,
+        points=points,
     )
-    return [ReadingHistoryResponse(**reading) for reading in readings]
\ No newline at end of file
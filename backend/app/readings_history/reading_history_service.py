@@ -1,25 +1,86 @@
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import base64
+import json
+from typing import Dict, List, Optional, Any, Tuple
+from datetime import datetime, timezone
+import numpy as np
 from fastapi.concurrency import run_in_threadpool
 
+from app.config import settings
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts, stream_dicts, stream_pages
+from app.services.reading_buckets import (
+    BUCKET_LAYOUT, BUCKETS_COLLECTION, as_utc, bucket_start, decode_bucket, expand_bucket, reading_bucket_writer
+)
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Số bucket giờ đọc mỗi lần khi phân trang (một ngày)
+BUCKET_PAGE_SIZE = 24
+
+
+def encode_cursor(read_at: datetime, doc_id: str) -> str:
+    """Opaque pagination cursor: the readAt and id of the last returned reading."""
+    raw = json.dumps({"readAt": read_at.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["readAt"]), str(data["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _series_point(doc) -> Tuple[float, float]:
+    """Snapshot -> (epoch seconds, value); runs in the stream worker thread."""
+    data = doc.to_dict()
+    read_at = data['readAt']
+    if read_at.tzinfo is None:
+        read_at = read_at.replace(tzinfo=timezone.utc)
+    return read_at.timestamp(), float(data['value'])
+
+
+def _bucket_series(sensor_id: Optional[str]):
+    """Transform: bucket snapshot -> (epoch seconds, values) arrays; runs in the stream worker thread."""
+    def transform(doc) -> Tuple[np.ndarray, np.ndarray]:
+        data = doc.to_dict()
+        # Chỉ giải mã chuỗi của sensor cần lấy (hoặc tất cả nếu không lọc)
+        offsets, values, _ = decode_bucket(data, sensor_id)
+        return as_utc(data['bucketStart']).timestamp() + offsets / 1000.0, values
+    return transform
+
+
+def _page_key(reading: Dict[str, Any]) -> Tuple[datetime, str]:
+    return as_utc(reading['readAt']), reading['id']
+
+
 class ReadingHistoryService:
     """Service class for managing sensor reading history."""
     
-    def __init__(self, collection_name: str = "readings_history"):
+    def __init__(self, collection_name: str = "readings_history", buckets_collection_name: str = BUCKETS_COLLECTION):
         self.collection_name = collection_name
         self.collection = db.collection(collection_name)
+        # Layout theo giờ (readings_buckets). Khi đọc, cả hai layout đều được gộp lại
+        # để dữ liệu vẫn đầy đủ trong lúc chuyển đổi.
+        self.buckets = db.collection(buckets_collection_name)
 
     async def create_reading(self, reading_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Tạo một bản ghi lịch sử mới."""
         try:
             # Server tự quyết định thời gian đọc để đảm bảo tính nhất quán
             reading_data['readAt'] = datetime.utcnow()
-            
+
+            if settings.reading_storage_layout == BUCKET_LAYOUT:
+                reading_id = reading_bucket_writer.add(
+                    reading_data['zoneId'], reading_data['type'], reading_data['readAt'],
+                    reading_data['value'], reading_data['sensorId']
+                )
+                return {**reading_data, 'id': reading_id}
+
             _update_time, doc_ref = await run_in_threadpool(self.collection.add, reading_data)
             
             logger.info(f"Reading record created successfully with ID: {doc_ref.id}")
@@ -32,45 +93,159 @@ class ReadingHistoryService:
             logger.error(f"Error creating reading record: {str(e)}")
             return None
 
-    async def get_readings(
+    async def get_readings_page(
         self,
         zone_id: str,
         sensor_id: Optional[str] = None,
         type: Optional[str] = None,
-    ) -> List[Dict[str, Any]]:
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 1000,
+        start_after: Optional[Tuple[datetime, str]] = None,
+        descending: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        Lấy lịch sử các giá trị đọc được với các bộ lọc.
-        Lưu ý: Firestore yêu cầu tạo index cho các truy vấn phức tạp này.
+        Lấy một trang lịch sử đọc cảm biến, sắp xếp theo readAt ngay trên Firestore.
+        start (bao gồm) / end (không bao gồm) giới hạn khoảng thời gian; start_after là
+        cursor đã giải mã (readAt, id) của bản ghi cuối trang trước.
+        Trả về (các bản ghi, cursor của trang tiếp theo hoặc None).
+        Bản ghi được đọc từ cả readings_history và readings_buckets rồi gộp theo (readAt, id).
+        Lưu ý: cần các composite index trong firestore.indexes.json.
         """
-        readings = []
         try:
             query = self.collection.where(field_path='zoneId', op_string='==', value=zone_id)
-            
             if sensor_id:
                 query = query.where(field_path='sensorId', op_string='==', value=sensor_id)
-            elif type:
+            if type:
                 query = query.where(field_path='type', op_string='==', value=type)
-       
-            docs = await run_in_threadpool(query.stream)
-            
-            # Collect all results
-            all_readings = []
-            for doc in docs:
-                reading_data = doc.to_dict()
-                reading_data['id'] = doc.id
-                all_readings.append(reading_data)
-            
-            if sensor_id and type:
-                filtered_readings = [r for r in all_readings if r.get('type') == type]
-            elif not sensor_id and type:
-                filtered_readings = all_readings
-            else:
-                filtered_readings = all_readings
-            
-            filtered_readings.sort(key=lambda x: x.get('readAt', datetime.min), reverse=True)
-            
-            
-            return filtered_readings
+            if start:
+                query = query.where(field_path='readAt', op_string='>=', value=start)
+            if end:
+                query = query.where(field_path='readAt', op_string='<', value=end)
+
+            direction = 'DESCENDING' if descending else 'ASCENDING'
+            # Sắp theo id khi trùng readAt để cursor không bỏ sót / lặp bản ghi
+            query = query.order_by('readAt', direction=direction).order_by('__name__', direction=direction)
+            if start_after:
+                read_at, doc_id = start_after
+                query = query.start_after([read_at, self.collection.document(doc_id)])
+
+            # Lấy thêm một bản ghi để biết còn trang sau hay không
+            readings = await fetch_dicts(query.limit(limit + 1))
+            bucket_readings = await self._bucket_readings_page(
+                zone_id, sensor_id, type, start, end, limit + 1, start_after, descending
+            )
+            if bucket_readings:
+                readings = sorted(readings + bucket_readings, key=_page_key, reverse=descending)[:limit + 1]
+            if len(readings) <= limit:
+                return readings, None
+            readings = readings[:limit]
+            last = readings[-1]
+            return readings, encode_cursor(last['readAt'], last['id'])
         except Exception as e:
             logger.error(f"Error finding reading history: {str(e)}")
-            return []
\ No newline at end of file
+            return [], None
+
+    async def _bucket_readings_page(
+        self,
+        zone_id: str,
+        sensor_id: Optional[str],
+        type: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        count: int,
+        start_after: Optional[Tuple[datetime, str]],
+        descending: bool,
+    ) -> List[Dict[str, Any]]:
+        """
+        The first `count` readings of the bucket layout in page order. Buckets are
+        read an hour at a time and reading stops once an hour completes the page,
+        since readings of later hours cannot come before it.
+        """
+        after = (as_utc(start_after[0]), start_after[1]) if start_after else None
+        lower = as_utc(start) if start else None
+        upper = as_utc(end) if end else None
+
+        query = self.buckets.where(field_path='zoneId', op_string='==', value=zone_id)
+        if type:
+            query = query.where(field_path='type', op_string='==', value=type)
+        if after and not descending:
+            lower = max(lower, after[0]) if lower else after[0]
+        if lower:
+            first_bucket = datetime.fromtimestamp(bucket_start(lower), tz=timezone.utc)
+            query = query.where(field_path='bucketStart', op_string='>=', value=first_bucket)
+        if upper:
+            query = query.where(field_path='bucketStart', op_string='<', value=upper)
+        if after and descending:
+            query = query.where(field_path='bucketStart', op_string='<=', value=after[0])
+        query = query.order_by('bucketStart', direction='DESCENDING' if descending else 'ASCENDING')
+
+        readings: List[Dict[str, Any]] = []
+        current_hour = None
+        async for page in stream_dicts(query, page_size=BUCKET_PAGE_SIZE):
+            for data in page:
+                if len(readings) >= count and data['bucketStart'] != current_hour:
+                    return sorted(readings, key=_page_key, reverse=descending)[:count]
+                current_hour = data['bucketStart']
+                for reading in expand_bucket(data['id'], data, sensor_id):
+                    key = _page_key(reading)
+                    if (start and key[0] < as_utc(start)) or (end and key[0] >= as_utc(end)):
+                        continue
+                    if after and (key <= after if not descending else key >= after):
+                        continue
+                    readings.append(reading)
+        return sorted(readings, key=_page_key, reverse=descending)[:count]
+
+    async def get_series(
+        self,
+        zone_id: str,
+        type: str,
+        start: datetime,
+        end: datetime,
+        sensor_id: Optional[str] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lấy toàn bộ giá trị của một đại lượng trong khoảng [start, end), theo readAt tăng dần,
+        dưới dạng hai mảng NumPy (epoch seconds, value). Chỉ đọc hai trường readAt và value,
+        cộng với các bucket giờ của readings_buckets (khoảng 24 document cho một ngày).
+        """
+        timestamps: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        try:
+            query = self.collection.where(field_path='zoneId', op_string='==', value=zone_id)
+            if sensor_id:
+                query = query.where(field_path='sensorId', op_string='==', value=sensor_id)
+            query = query.where(field_path='type', op_string='==', value=type)\
+                         .where(field_path='readAt', op_string='>=', value=start)\
+                         .where(field_path='readAt', op_string='<', value=end)\
+                         .order_by('readAt')\
+                         .select(['readAt', 'value'])
+
+            async for page in stream_pages(query, transform=_series_point):
+                points = np.asarray(page, dtype=np.float64)
+                timestamps.append(points[:, 0])
+                values.append(points[:, 1])
+
+            bucket_query = self.buckets.where(field_path='zoneId', op_string='==', value=zone_id)\
+                                       .where(field_path='type', op_string='==', value=type)\
+                                       .where(field_path='bucketStart', op_string='>=', value=datetime.fromtimestamp(bucket_start(start), tz=timezone.utc))\
+                                       .where(field_path='bucketStart', op_string='<', value=end)\
+                                       .order_by('bucketStart')
+            start_ts, end_ts = as_utc(start).timestamp(), as_utc(end).timestamp()
+            async for page in stream_pages(bucket_query, transform=_bucket_series(sensor_id)):
+                for bucket_timestamps, bucket_values in page:
+                    mask = (bucket_timestamps >= start_ts) & (bucket_timestamps < end_ts)
+                    timestamps.append(bucket_timestamps[mask])
+                    values.append(bucket_values[mask])
+        except Exception as e:
+            logger.error(f"Error loading reading series (zone_id={zone_id}, type={type}): {str(e)}")
+            return np.empty(0), np.empty(0)
+
+        if not timestamps:
+            return np.empty(0), np.empty(0)
+        timestamps, values = np.concatenate(timestamps), np.concatenate(values)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            # Gộp hai layout: sắp xếp lại theo thời gian
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values
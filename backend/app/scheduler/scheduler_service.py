@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts, stream_pages
 from app.utils.logger import get_logger
 from app.services.scheduler_service import apscheduler_service
 
@@ -71,7 +72,6 @@ class SchedulerService:
                                device_type: Optional[str] = None,
                                is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
         """Get all schedules, optionally filtered by zone_id, device_id, device_type, or active status."""
-        schedules = []
         try:
             query = self.collection
             
@@ -84,12 +84,7 @@ class SchedulerService:
             if is_active is not None:
                 query = query.where(field_path='isActive', op_string='==', value=is_active)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                schedule_data = doc.to_dict()
-                schedule_data['id'] = doc.id
-                schedules.append(schedule_data)
-            return schedules
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding schedules: {str(e)}")
             return []
@@ -197,21 +192,18 @@ class SchedulerService:
         """Delete all schedules for a specific device."""
         try:
             query = self.collection.where(field_path='deviceId', op_string='==', value=device_id)
-            docs = await run_in_threadpool(query.stream)
-            
-            # Remove schedules from APScheduler first
-            for doc in docs:
-                await apscheduler_service.delete_schedule_job(doc.id)
-            
-            # Delete from Firestore
-            batch = db.batch()
             count = 0
-            for doc in docs:
-                batch.delete(doc.reference)
-                count += 1
-            
-            if count > 0:
+            async for docs in stream_pages(query):
+                # Remove schedules from APScheduler first
+                for doc in docs:
+                    await apscheduler_service.delete_schedule_job(doc.id)
+                
+                # Delete from Firestore
+                batch = db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
                 await run_in_threadpool(batch.commit)
+                count += len(docs)
             
             logger.info(f"Deleted {count} schedules for device {device_id}")
             return True
@@ -3,6 +3,7 @@ from typing import List, Dict, Optional
 
 from app.sensor.sensor_model import SensorCreate, SensorUpdate, SensorResponse
 from app.sensor.sensor_service import SensorService
+from app.services.topology_cache import zone_topology_cache
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -25,6 +26,7 @@ async def create_sensor(sensor_data: SensorCreate):
     created_sensor = await sensor_service.create_sensor(sensor_data.dict())
     if not created_sensor:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create sensor")
+    zone_topology_cache.invalidate(created_sensor['zoneId'])
     
     return SensorResponse(**created_sensor)
 
@@ -58,6 +60,11 @@ async def update_sensor(sensor_data: SensorUpdate, sensor: dict = Depends(get_se
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not update sensor")
 
+    # Sensor có thể được chuyển sang zone khác: làm mới cả zone cũ và zone mới
+    zone_topology_cache.invalidate(sensor['zoneId'])
+    if update_dict.get('zoneId'):
+        zone_topology_cache.invalidate(update_dict['zoneId'])
+
     updated_sensor = await sensor_service.get_sensor(sensor_id)
     return SensorResponse(**updated_sensor)
 
@@ -70,4 +77,5 @@ async def delete_sensor(sensor: dict = Depends(get_sensor_or_404)):
     success = await sensor_service.delete_sensor(sensor_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not delete sensor")
+    zone_topology_cache.invalidate(sensor['zoneId'])
     return None
\ No newline at end of file
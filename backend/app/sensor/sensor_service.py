@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
+from app.services.firestore_stream import fetch_dicts, stream_pages
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -50,18 +51,12 @@ class SensorService:
 
     async def get_all_sensors(self, zone_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Lấy tất cả các sensor, có thể lọc theo zoneId."""
-        sensors = []
         try:
             query = self.collection
             if zone_id:
                 query = query.where('zoneId', '==', zone_id)
             
-            docs = await run_in_threadpool(query.stream)
-            for doc in docs:
-                sensor_data = doc.to_dict()
-                sensor_data['id'] = doc.id
-                sensors.append(sensor_data)
-            return sensors
+            return await fetch_dicts(query)
         except Exception as e:
             logger.error(f"Error finding sensors (zone_id={zone_id}): {str(e)}")
             return []
@@ -95,16 +90,14 @@ class SensorService:
     async def delete_sensors_by_zone(self, zone_id: str) -> bool:
         try:
             query = self.collection.where('zoneId', '==', zone_id)
-            docs = await run_in_threadpool(query.stream)
-            
-            batch = db.batch()
             count = 0
-            for doc in docs:
-                batch.delete(doc.reference)
-                count += 1
-            
-            if count > 0:
+            # Mỗi trang tối đa 500 document, vừa một batch ghi
+            async for docs in stream_pages(query):
+                batch = db.batch()
+                for doc in docs:
+                    batch.delete(doc.reference)
                 await run_in_threadpool(batch.commit)
+                count += len(docs)
             
             logger.info(f"Deleted {count} sensors for zone {zone_id}")
             return True
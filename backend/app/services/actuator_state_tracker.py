@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.actuator.actuator_service import ActuatorService
+from app.readings_actuator_history.reading_actuator_history_service import ReadingActuatorHistoryService
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Số truy vấn Firestore chạy song song khi khởi tạo trạng thái
+SEED_CONCURRENCY = 16
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    """Firestore returns timezone-aware timestamps, the pipeline uses naive UTC."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ActuatorStateTracker:
+    """
+    Last known state of every actuator, so actuator history only stores transitions.
+
+    Each transition record carries the state it replaced and how long the
+    actuator stayed in it, which makes duty-cycle queries a simple sum.
+    """
+
+    def __init__(self):
+        self.actuator_service = ActuatorService()
+        self.history_service = ReadingActuatorHistoryService()
+        # actuator_id -> (trạng thái, thời điểm bắt đầu trạng thái)
+        self.states: Dict[str, Tuple[str, datetime]] = {}
+
+        # Counters
+        self.observed = 0
+        self.transitions = 0
+        self.seeded = 0
+
+    async def seed(self):
+        """Load the last recorded state of every actuator from Firestore."""
+        actuators = await self.actuator_service.get_all_actuators()
+        semaphore = asyncio.Semaphore(SEED_CONCURRENCY)
+
+        async def load(actuator_id: str):
+            async with semaphore:
+                return actuator_id, await self.history_service.get_latest_actuator_log(actuator_id)
+
+        results = await asyncio.gather(
+            *(load(actuator['id']) for actuator in actuators if actuator.get('id')),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error seeding actuator state: {result}")
+                continue
+            actuator_id, latest = result
+            if latest and latest.get('state') and latest.get('readAt') and actuator_id not in self.states:
+                self.states[actuator_id] = (latest['state'], _as_utc_naive(latest['readAt']))
+                self.seeded += 1
+        logger.info(f"Actuator state tracker seeded with {self.seeded}/{len(actuators)} actuator(s)")
+
+    def observe(self, actuator_id: str, actuator_type: str, zone_id: str, state: str, at: datetime) -> Optional[Dict[str, Any]]:
+        """
+        Record a reported state. Returns the history record to store when the
+        state changed (or is seen for the first time), otherwise None.
+        """
+        self.observed += 1
+        previous = self.states.get(actuator_id)
+        if previous and previous[0] == state:
+            return None
+
+        self.states[actuator_id] = (state, at)
+        self.transitions += 1
+        previous_state, previous_since = previous if previous else (None, None)
+        return {
+            "readAt": at,
+            "actuatorId": actuator_id,
+            "type": actuator_type,
+            "state": state,
+            "zoneId": zone_id,
+            "previousState": previous_state,
+            "previousStateDurationSeconds": round((at - previous_since).total_seconds(), 3) if previous_since else None,
+        }
+
+    def get_state(self, actuator_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current state of an actuator and since when it holds."""
+        current = self.states.get(actuator_id)
+        if not current:
+            return None
+        return {"state": current[0], "since": current[1]}
+
+    def forget(self, actuator_ids: List[str]):
+        for actuator_id in actuator_ids:
+            self.states.pop(actuator_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return observed/transition counters."""
+        return {
+            "actuators": len(self.states),
+            "seeded": self.seeded,
+            "observed": self.observed,
+            "transitions": self.transitions,
+            "writesSaved": self.observed - self.transitions,
+        }
+
+
+# Global actuator state tracker instance
+actuator_state_tracker = ActuatorStateTracker()
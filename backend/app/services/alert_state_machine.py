@@ -0,0 +1,264 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.database import db
+from app.services.firestore_stream import stream_dicts
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Trạng thái của một điều kiện cảnh báo
+ALERT_OK = "OK"
+ALERT_BREACHED = "BREACHED"
+ALERT_NOTIFIED = "NOTIFIED"
+ALERT_RECOVERED = "RECOVERED"
+
+# Độ rộng vùng trễ mặc định: giá trị phải quay lại trong ngưỡng ít nhất chừng này mới coi là hồi phục
+DEFAULT_HYSTERESIS = {
+    "temperature": 0.5,
+    "airHumidity": 2.0,
+    "soilMoisture": 2.0,
+    "lightIntensity": 50.0,
+    "co2": 25.0,
+    "ph": 0.1,
+}
+
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def _as_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class AlertCondition:
+    """State of one alert condition (e.g. temperature_high) of one zone."""
+
+    __slots__ = ("state", "since", "breached_since", "last_notified_at")
+
+    def __init__(self, state: str = ALERT_OK, since: Optional[datetime] = None,
+                 breached_since: Optional[datetime] = None, last_notified_at: Optional[datetime] = None):
+        self.state = state
+        self.since = since
+        self.breached_since = breached_since
+        self.last_notified_at = last_notified_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "since": self.since,
+            "breachedSince": self.breached_since,
+            "lastNotifiedAt": self.last_notified_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertCondition":
+        return cls(
+            state=data.get("state", ALERT_OK),
+            since=_as_utc_naive(data.get("since")) or datetime.utcnow(),
+            breached_since=_as_utc_naive(data.get("breachedSince")),
+            last_notified_at=_as_utc_naive(data.get("lastNotifiedAt")),
+        )
+
+
+class AlertStateMachine:
+    """
+    Per-zone, per-condition alert states: OK -> BREACHED -> NOTIFIED -> RECOVERED -> OK.
+
+    - A condition is breached when the value crosses its limit and only recovers
+      once it is back inside the limit by the hysteresis band.
+    - A notification is sent when a breach has lasted alert_min_breach_seconds,
+      then again every alert_renotify_seconds while it lasts.
+    - A breach coming back within alert_cooldown_seconds of the last
+      notification does not notify again.
+
+    States live in memory and are persisted to the alert_states collection
+    every alert_state_persist_interval seconds (and on shutdown).
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "alert_states",
+        min_breach_seconds: float = settings.alert_min_breach_seconds,
+        renotify_seconds: float = settings.alert_renotify_seconds,
+        cooldown_seconds: float = settings.alert_cooldown_seconds,
+        persist_interval: float = settings.alert_state_persist_interval,
+    ):
+        self.collection = db.collection(collection_name)
+        self.min_breach_seconds = min_breach_seconds
+        self.renotify_seconds = renotify_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.persist_interval = persist_interval
+
+        self.conditions: Dict[Tuple[str, str], AlertCondition] = {}
+        self.dirty_zones = set()
+        self.running = False
+        self._persist_task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.evaluations = 0
+        self.notifications = 0
+        self.suppressed = 0
+        self.transitions = 0
+
+    async def start(self):
+        """Load persisted states and start the periodic persistence loop."""
+        if self.running:
+            return
+        await self._load()
+        self.running = True
+        self._persist_task = asyncio.create_task(self._persist_loop(), name="alert-state-persist")
+        logger.info(f"Alert state machine started with {len(self.conditions)} condition(s)")
+
+    async def stop(self):
+        """Persist every changed state."""
+        if not self.running:
+            return
+        self.running = False
+        if self._persist_task:
+            self._persist_task.cancel()
+            await asyncio.gather(self._persist_task, return_exceptions=True)
+        await self.persist()
+        logger.info("Alert state machine stopped.")
+
+    def update(self, zone_id: str, condition: str, value: float, limit: float, direction: str,
+               hysteresis: float, now: datetime) -> bool:
+        """
+        Feed one reading of a condition. direction is "min" (alert below the limit)
+        or "max" (alert above it). Returns True when a notification must be sent.
+        """
+        self.evaluations += 1
+        if direction == "max":
+            breached = value > limit
+            recovered = value <= limit - hysteresis
+        else:
+            breached = value < limit
+            recovered = value >= limit + hysteresis
+
+        key = (zone_id, condition)
+        alert = self.conditions.get(key)
+        if alert is None:
+            alert = self.conditions[key] = AlertCondition(since=now)
+        previous_state = alert.state
+        notify = False
+
+        if alert.state == ALERT_OK:
+            if breached:
+                self._move(zone_id, alert, ALERT_BREACHED, now)
+                alert.breached_since = now
+
+        elif alert.state == ALERT_RECOVERED:
+            if breached:
+                in_cooldown = alert.last_notified_at and (now - alert.last_notified_at).total_seconds() < self.cooldown_seconds
+                # Dao động quanh ngưỡng trong thời gian cooldown: không gửi lại thông báo
+                self._move(zone_id, alert, ALERT_NOTIFIED if in_cooldown else ALERT_BREACHED, now)
+                alert.breached_since = now
+                if in_cooldown:
+                    self.suppressed += 1
+            elif (now - alert.since).total_seconds() >= self.cooldown_seconds:
+                self._move(zone_id, alert, ALERT_OK, now)
+
+        elif alert.state == ALERT_NOTIFIED:
+            if recovered:
+                self._move(zone_id, alert, ALERT_RECOVERED, now)
+            elif breached and (now - (alert.last_notified_at or alert.since)).total_seconds() >= self.renotify_seconds:
+                notify = True
+            elif breached:
+                self.suppressed += 1
+
+        if alert.state == ALERT_BREACHED:
+            if recovered:
+                self._move(zone_id, alert, ALERT_OK, now)
+                alert.breached_since = None
+            elif breached and (now - (alert.breached_since or alert.since)).total_seconds() >= self.min_breach_seconds:
+                self._move(zone_id, alert, ALERT_NOTIFIED, now)
+                notify = True
+
+        if notify:
+            alert.last_notified_at = now
+            self.notifications += 1
+            self.dirty_zones.add(zone_id)
+        if alert.state != previous_state:
+            logger.info(f"Alert {condition} of zone {zone_id}: {previous_state} -> {alert.state}")
+        return notify
+
+    def _move(self, zone_id: str, alert: AlertCondition, state: str, now: datetime):
+        alert.state = state
+        alert.since = now
+        self.transitions += 1
+        # Chỉ các zone có chuyển trạng thái mới cần ghi lại
+        self.dirty_zones.add(zone_id)
+
+    def get_zone_states(self, zone_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return the alert states of one zone, keyed by condition."""
+        return {
+            condition: alert.to_dict()
+            for (alert_zone_id, condition), alert in self.conditions.items()
+            if alert_zone_id == zone_id
+        }
+
+    async def discard(self, zone_id: str):
+        """Forget a deleted zone and remove its persisted states."""
+        for key in [key for key in self.conditions if key[0] == zone_id]:
+            del self.conditions[key]
+        self.dirty_zones.discard(zone_id)
+        try:
+            await run_in_threadpool(self.collection.document(zone_id).delete)
+        except Exception as e:
+            logger.error(f"Error deleting alert states of zone {zone_id}: {e}")
+
+    async def _load(self):
+        try:
+            async for docs in stream_dicts(self.collection):
+                for doc in docs:
+                    for condition, data in (doc.get("conditions") or {}).items():
+                        self.conditions[(doc["id"], condition)] = AlertCondition.from_dict(data)
+        except Exception as e:
+            logger.error(f"Error loading alert states: {e}")
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.persist()
+
+    async def persist(self):
+        """Write the states of every zone whose alerts changed since the last persist."""
+        zone_ids = list(self.dirty_zones)
+        self.dirty_zones.clear()
+        for start in range(0, len(zone_ids), FIRESTORE_BATCH_LIMIT):
+            chunk = zone_ids[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = db.batch()
+            for zone_id in chunk:
+                batch.set(self.collection.document(zone_id), {
+                    "conditions": self.get_zone_states(zone_id),
+                    "updatedAt": datetime.utcnow(),
+                }, merge=True)
+            try:
+                await run_in_threadpool(batch.commit)
+            except Exception as e:
+                logger.error(f"Error persisting alert states of {len(chunk)} zone(s): {e}")
+                self.dirty_zones.update(chunk)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return evaluation/notification counters and the number of conditions per state."""
+        by_state: Dict[str, int] = {}
+        for alert in self.conditions.values():
+            by_state[alert.state] = by_state.get(alert.state, 0) + 1
+        return {
+            "conditions": len(self.conditions),
+            "byState": by_state,
+            "evaluations": self.evaluations,
+            "transitions": self.transitions,
+            "notifications": self.notifications,
+            "suppressed": self.suppressed,
+            "dirtyZones": len(self.dirty_zones),
+        }
+
+
+# Global alert state machine instance
+alert_state_machine = AlertStateMachine()
@@ -1,5 +1,3 @@
-import json
-import paho.mqtt.client as mqtt
 from app.config import settings
 from app.utils.logger import get_logger
 from app.action_log.action_log_service import ActionLogService
@@ -10,25 +8,23 @@ logger = get_logger(__name__)
 # Initialize action log service
 action_log_service = ActionLogService()
 
-# Global MQTT client reference - will be set by MQTT service
-_mqtt_client = None
+# Global MQTT transport reference - will be set by MQTT service
+_mqtt_transport = None
 
-def set_mqtt_client(client):
-    """Set the MQTT client reference from MQTT service."""
-    global _mqtt_client
-    _mqtt_client = client
+def set_mqtt_transport(transport):
+    """Set the MQTT transport reference from MQTT service."""
+    global _mqtt_transport
+    _mqtt_transport = transport
 
-def publish_command(zone_id: str, command: str, user_info: dict = None):
+async def publish_command(zone_id: str, command: str, user_info: dict = None):
     """Publish a command to MQTT broker for a specific zone."""
     try:
-        if not _mqtt_client:
-            logger.error("MQTT client not initialized")
+        if not _mqtt_transport:
+            logger.error("MQTT transport not initialized")
             return False
             
         command_topic = f"ecohub/{zone_id}/commands"
-        result = _mqtt_client.publish(command_topic, command)
-        
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        if await _mqtt_transport.publish(command_topic, command):
             logger.info(f"Successfully published command '{command}' to topic '{command_topic}'")
             
             # Log action if user info is provided
@@ -47,28 +43,26 @@ def publish_command(zone_id: str, command: str, user_info: dict = None):
 
             return True
         else:
-            logger.error(f"Failed to publish command '{command}'. Return code: {result.rc}")
+            logger.error(f"Failed to publish command '{command}' to topic '{command_topic}'")
             return False
             
     except Exception as e:
         logger.error(f"Exception while publishing command: {e}")
         return False
 
-def publish_scheduled_command(zone_id: str, command: str):
+async def publish_scheduled_command(zone_id: str, command: str):
     """Publish a scheduled command to MQTT broker (without user info)."""
     try:
-        if not _mqtt_client:
-            logger.error("MQTT client not initialized")
+        if not _mqtt_transport:
+            logger.error("MQTT transport not initialized")
             return False
             
         command_topic = f"ecohub/{zone_id}/commands"
-        result = _mqtt_client.publish(command_topic, command)
-        
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        if await _mqtt_transport.publish(command_topic, command):
             logger.info(f"Successfully published scheduled command '{command}' to topic '{command_topic}'")
             return True
         else:
-            logger.error(f"Failed to publish scheduled command '{command}'. Return code: {result.rc}")
+            logger.error(f"Failed to publish scheduled command '{command}' to topic '{command_topic}'")
             return False
             
     except Exception as e:
@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Handler của một loại job: trả về True nếu đã xong (không cần thử lại)
+JobHandler = Callable[[Dict[str, Any]], Awaitable[bool]]
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT,
+    group_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_email_jobs_due ON email_jobs (status, next_attempt_at);
+"""
+
+# Outbox cũ chưa có cột group_key
+MIGRATIONS = [
+    "ALTER TABLE email_jobs ADD COLUMN group_key TEXT",
+]
+GROUP_INDEX = "CREATE INDEX IF NOT EXISTS idx_email_jobs_group ON email_jobs (kind, group_key, status)"
+
+
+class EmailOutbox:
+    """
+    Durable outbox for emails, backed by a local SQLite file.
+
+    Callers enqueue a job and return immediately; a pool of workers sends the
+    emails with bounded concurrency, retrying failures with exponential backoff.
+    Jobs that were queued or in flight when the process stopped are picked up
+    again on the next start.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.email_outbox_path,
+        worker_count: int = settings.email_worker_count,
+        max_attempts: int = settings.email_max_attempts,
+        retry_base_delay: float = settings.email_retry_base_delay,
+    ):
+        self.path = path
+        self.worker_count = max(1, worker_count)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_delay = retry_base_delay
+
+        self.handlers: Dict[str, JobHandler] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._workers: List[asyncio.Task] = []
+        self.running = False
+
+        # Counters
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.pending = 0
+        self.in_flight = 0
+        self.total_send_time = 0.0
+        self.total_delivery_latency = 0.0
+        self.last_delivery_latency = 0.0
+
+    def register_handler(self, kind: str, handler: JobHandler):
+        """Register the coroutine that delivers jobs of a given kind."""
+        self.handlers[kind] = handler
+
+    async def start(self):
+        """Open the outbox file, recover interrupted jobs and start the workers."""
+        if self.running:
+            return
+        await asyncio.to_thread(self._open)
+        self._queue = asyncio.Queue(maxsize=self.worker_count * 2)
+        self._wakeup = asyncio.Event()
+        self.running = True
+        self._dispatcher = asyncio.create_task(self._dispatch_loop(), name="email-outbox-dispatch")
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"email-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+        logger.info(f"Email outbox started ({self.path}, {self.worker_count} worker(s), {self.pending} pending job(s))")
+
+    async def stop(self):
+        """Stop the workers. Unsent jobs stay in the outbox for the next start."""
+        if not self.running:
+            # Có thể đã mở file do enqueue trước start()
+            await asyncio.to_thread(self._close)
+            return
+        self.running = False
+        tasks = [self._dispatcher] + self._workers if self._dispatcher else self._workers
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        # Job đang gửi dở được đưa lại hàng chờ
+        await asyncio.to_thread(self._execute, "UPDATE email_jobs SET status = ? WHERE status = ?",
+                                (STATUS_PENDING, STATUS_SENDING))
+        await asyncio.to_thread(self._close)
+        logger.info("Email outbox stopped.")
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> Optional[int]:
+        """
+        Persist an email job and wake up the workers. Returns the job id.
+        Jobs queued before start() are kept in the outbox and sent once it starts.
+        """
+        try:
+            now = time.time()
+            job_id = await asyncio.to_thread(
+                self._execute,
+                "INSERT INTO email_jobs (kind, payload, status, attempts, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, 0, ?, ?)",
+                (kind, json.dumps(payload, default=str), STATUS_PENDING, now, now),
+            )
+            self.enqueued += 1
+            self.pending += 1
+            if self._wakeup:
+                self._wakeup.set()
+            logger.info(f"Queued email job {job_id} ({kind})")
+            return job_id
+        except Exception as e:
+            logger.error(f"Error queueing email job ({kind}): {e}")
+            return None
+
+    async def enqueue_grouped(self, kind: str, group_key: str, payload: Dict[str, Any],
+                              item: Optional[Dict[str, Any]], due_at: float) -> Optional[int]:
+        """
+        Add an item to the pending job of a group (e.g. the digest of one user),
+        creating the job if needed. The job is sent at due_at, or earlier if an
+        item with an earlier due_at joins the group. Returns the job id.
+        """
+        try:
+            job_id, created = await asyncio.to_thread(self._merge_grouped, kind, group_key, payload, item, due_at)
+            if created:
+                self.enqueued += 1
+                self.pending += 1
+                logger.info(f"Queued grouped email job {job_id} ({kind}, {group_key})")
+            if self._wakeup:
+                self._wakeup.set()
+            return job_id
+        except Exception as e:
+            logger.error(f"Error queueing grouped email job ({kind}, {group_key}): {e}")
+            return None
+
+    # --- SQLite (chạy trong thread) ---
+
+    def _open(self):
+        with self._db_lock:
+            conn = self._connection()
+            # Job bị gián đoạn ở lần chạy trước
+            conn.execute("UPDATE email_jobs SET status = ? WHERE status = ?", (STATUS_PENDING, STATUS_SENDING))
+            retention_cutoff = time.time() - settings.email_outbox_retention_days * 86400
+            conn.execute("DELETE FROM email_jobs WHERE status IN (?, ?) AND created_at < ?",
+                         (STATUS_SENT, STATUS_FAILED, retention_cutoff))
+            # Tính lại từ file: gồm cả job được thêm trước khi start()
+            self.pending = conn.execute(
+                "SELECT COUNT(*) FROM email_jobs WHERE status = ?", (STATUS_PENDING,)
+            ).fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the SQLite connection, opening the file on first use. Caller holds _db_lock."""
+        if self._conn is not None:
+            return self._conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(email_jobs)")}
+        if "group_key" not in columns:
+            for statement in MIGRATIONS:
+                conn.execute(statement)
+        conn.execute(GROUP_INDEX)
+        self._conn = conn
+        return conn
+
+    def _close(self):
+        with self._db_lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def _execute(self, sql: str, params: Tuple = ()) -> int:
+        with self._db_lock:
+            cursor = self._connection().execute(sql, params)
+            return cursor.lastrowid
+
+    def _merge_grouped(self, kind: str, group_key: str, payload: Dict[str, Any],
+                       item: Optional[Dict[str, Any]], due_at: float) -> Tuple[int, bool]:
+        with self._db_lock:
+            self._connection().execute("BEGIN IMMEDIATE")
+            try:
+                # Chỉ gộp vào job chưa được gửi lần nào
+                row = self._conn.execute(
+                    "SELECT id, payload, next_attempt_at FROM email_jobs "
+                    "WHERE kind = ? AND group_key = ? AND status = ? AND attempts = 0 ORDER BY id LIMIT 1",
+                    (kind, group_key, STATUS_PENDING),
+                ).fetchone()
+                if row:
+                    job_id, stored, next_attempt_at = row
+                    merged = json.loads(stored)
+                    if item is not None:
+                        merged.setdefault("items", []).append(item)
+                    self._conn.execute("UPDATE email_jobs SET payload = ?, next_attempt_at = ? WHERE id = ?",
+                                       (json.dumps(merged, default=str), min(next_attempt_at, due_at), job_id))
+                    created = False
+                else:
+                    merged = {**payload, "items": [item] if item is not None else []}
+                    job_id = self._conn.execute(
+                        "INSERT INTO email_jobs (kind, payload, status, attempts, next_attempt_at, created_at, group_key) "
+                        "VALUES (?, ?, ?, 0, ?, ?, ?)",
+                        (kind, json.dumps(merged, default=str), STATUS_PENDING, due_at, time.time(), group_key),
+                    ).lastrowid
+                    created = True
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id, created
+
+    def _claim_due(self, limit: int) -> Tuple[List[Tuple[int, str, str, int, float]], Optional[float]]:
+        """Mark due jobs as sending and return them with the time of the next future job."""
+        now = time.time()
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload, attempts, created_at FROM email_jobs "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (STATUS_PENDING, now, limit),
+            ).fetchall()
+            if rows:
+                self._conn.executemany("UPDATE email_jobs SET status = ? WHERE id = ?",
+                                       [(STATUS_SENDING, row[0]) for row in rows])
+            next_row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM email_jobs WHERE status = ? AND next_attempt_at > ?",
+                (STATUS_PENDING, now),
+            ).fetchone()
+        return rows, next_row[0] if next_row else None
+
+    # --- Dispatcher / workers ---
+
+    async def _dispatch_loop(self):
+        while True:
+            self._wakeup.clear()
+            free_slots = self._queue.maxsize - self._queue.qsize()
+            rows, next_at = ([], None)
+            if free_slots > 0:
+                rows, next_at = await asyncio.to_thread(self._claim_due, free_slots)
+            for row in rows:
+                await self._queue.put(row)
+
+            if rows and len(rows) == free_slots:
+                # Có thể còn job đến hạn: chờ worker nhận bớt rồi lấy tiếp
+                await asyncio.sleep(0.05)
+                continue
+
+            timeout = max(0.0, next_at - time.time()) if next_at else settings.email_outbox_poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(timeout, settings.email_outbox_poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, kind, payload, attempts, created_at = await self._queue.get()
+            self.in_flight += 1
+            started_at = time.monotonic()
+            try:
+                handler = self.handlers.get(kind)
+                if handler is None:
+                    raise RuntimeError(f"No handler registered for email job kind '{kind}'")
+                done = await handler(json.loads(payload))
+                error = None if done else "handler reported failure"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                done, error = False, str(e)
+            finally:
+                self.in_flight -= 1
+                self.total_send_time += time.monotonic() - started_at
+
+            try:
+                await self._complete(job_id, kind, attempts + 1, created_at, done, error)
+            except Exception as e:
+                logger.error(f"Email worker {index}: error updating job {job_id}: {e}")
+            # Có chỗ trống trong hàng đợi: cho dispatcher lấy thêm job
+            self._wakeup.set()
+
+    async def _complete(self, job_id: int, kind: str, attempts: int, created_at: float, done: bool, error: Optional[str]):
+        now = time.time()
+        if done:
+            await asyncio.to_thread(self._execute,
+                                    "UPDATE email_jobs SET status = ?, attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                                    (STATUS_SENT, attempts, now, job_id))
+            self.pending -= 1
+            self.sent += 1
+            self.last_delivery_latency = now - created_at
+            self.total_delivery_latency += self.last_delivery_latency
+            return
+
+        if attempts >= self.max_attempts:
+            await asyncio.to_thread(self._execute,
+                                    "UPDATE email_jobs SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                                    (STATUS_FAILED, attempts, error, job_id))
+            self.pending -= 1
+            self.failed += 1
+            logger.error(f"Email job {job_id} ({kind}) failed after {attempts} attempt(s): {error}")
+            return
+
+        delay = self.retry_base_delay * 2 ** (attempts - 1)
+        await asyncio.to_thread(self._execute,
+                                "UPDATE email_jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                                (STATUS_PENDING, attempts, now + delay, error, job_id))
+        self.retried += 1
+        logger.warning(f"Email job {job_id} ({kind}) attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue depth and latency counters."""
+        return {
+            "running": self.running,
+            "workers": self.worker_count,
+            "queueDepth": self.pending,
+            "inFlight": self.in_flight,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "avgSendMs": round(self.total_send_time / (self.sent + self.failed + self.retried) * 1000, 3)
+            if (self.sent + self.failed + self.retried) else 0.0,
+            "avgDeliveryLatencySeconds": round(self.total_delivery_latency / self.sent, 3) if self.sent else 0.0,
+            "lastDeliveryLatencySeconds": round(self.last_delivery_latency, 3),
+        }
+
+
+# Global email outbox instance
+email_outbox = EmailOutbox()
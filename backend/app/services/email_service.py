@@ -1,8 +1,11 @@
+import asyncio
 import os
-from typing import Optional, Dict, Any
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from email.message import EmailMessage
+from typing import Optional, Dict, Any, List
 from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
+from app.config import settings
+from app.services.smtp_pool import SmtpConnectionPool
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -11,7 +14,8 @@ class EmailService:
     """Service for sending email notifications to users."""
     
     def __init__(self):
-        self.fastmail = None
+        self.smtp_pool = None
+        self.mail_from = None
         self.template_env = None
         self._initialize_email_service()
         self._initialize_templates()
@@ -29,26 +33,41 @@ class EmailService:
             logger.info(f"📧 EMAIL CONFIG - Server: {mail_server}:{mail_port}, From: {mail_from}, Username: {mail_username}")
             logger.info(f"🔐 AUTHENTICATION - Password length: {len(mail_password) if mail_password else 0}")
             
-            # Email configuration from environment variables
-            mail_config = ConnectionConfig(
-                MAIL_USERNAME=mail_username,
-                MAIL_PASSWORD=mail_password,
-                MAIL_FROM=mail_from,
-                MAIL_PORT=mail_port,
-                MAIL_SERVER=mail_server,
-                MAIL_STARTTLS=True,
-                MAIL_SSL_TLS=False,
-                USE_CREDENTIALS=True,
-                VALIDATE_CERTS=True
+            # Các phiên SMTP được giữ lại và dùng chung giữa các lần gửi
+            self.mail_from = mail_from
+            self.smtp_pool = SmtpConnectionPool(
+                hostname=mail_server,
+                port=mail_port,
+                username=mail_username or None,
+                password=mail_password,
+                start_tls=settings.mail_starttls,
+                use_tls=settings.mail_ssl_tls,
+                validate_certs=settings.mail_validate_certs,
+                size=settings.smtp_pool_size,
+                idle_timeout=settings.smtp_idle_timeout,
+                health_check_after=settings.smtp_health_check_after,
+                timeout=settings.smtp_send_timeout,
             )
-            
-            self.fastmail = FastMail(mail_config)
             logger.info("✅ Email service initialized successfully")
             
         except Exception as e:
             logger.error(f"❌ Failed to initialize email service: {str(e)}")
             logger.exception("Full error details:")
-            self.fastmail = None
+            self.smtp_pool = None
+
+    def _build_message(self, recipient: str, subject: str, html_content: str) -> EmailMessage:
+        """Build an HTML email message."""
+        message = EmailMessage()
+        message["From"] = self.mail_from
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(html_content, subtype="html")
+        return message
+
+    async def close(self):
+        """Close the pooled SMTP connections."""
+        if self.smtp_pool:
+            await self.smtp_pool.close()
     
     def _initialize_templates(self):
         """Initialize Jinja2 templates for email formatting."""
@@ -140,9 +159,9 @@ class EmailService:
         zone_id: str
     ) -> bool:
         """Send a notification email to a user."""
-        if not self.fastmail or not self.template_env:
+        if not self.smtp_pool or not self.template_env:
             logger.error(f"❌ EMAIL SERVICE NOT INITIALIZED - Cannot send email to {user_email}")
-            logger.error(f"🔧 SERVICE STATUS - FastMail: {'✅' if self.fastmail else '❌'}, Templates: {'✅' if self.template_env else '❌'}")
+            logger.error(f"🔧 SERVICE STATUS - SMTP pool: {'✅' if self.smtp_pool else '❌'}, Templates: {'✅' if self.template_env else '❌'}")
             return False
         
         try:
@@ -179,40 +198,27 @@ class EmailService:
             
             # Create message
             try:
-                message = MessageSchema(
-                    subject=f"🚨 EcoHub Alert: {notification.get('type', 'System Alert')}",
-                    recipients=[user_email],
-                    body=html_content,
-                    subtype="html"
+                message = self._build_message(
+                    user_email,
+                    f"🚨 EcoHub Alert: {notification.get('type', 'System Alert')}",
+                    html_content
                 )
-                logger.info(f"📨 MESSAGE CREATED - Recipient: {user_email}, Zone: {zone_id}, Subject: {message.subject}")
+                logger.info(f"📨 MESSAGE CREATED - Recipient: {user_email}, Zone: {zone_id}, Subject: {message['Subject']}")
             except Exception as message_error:
                 logger.error(f"❌ MESSAGE CREATION FAILED - Recipient: {user_email}, Zone: {zone_id}, Error: {str(message_error)}")
                 logger.exception(f"Message creation error details for {user_email}:")
                 return False
             
-            logger.info(f"📤 SENDING EMAIL - Recipient: {user_email}, Zone: {zone_id}, Subject: {message.subject}")
+            logger.info(f"📤 SENDING EMAIL - Recipient: {user_email}, Zone: {zone_id}, Subject: {message['Subject']}")
             
-            # Send email
+            # Send email on a pooled SMTP connection (timeout applies per SMTP command)
             try:
-                logger.info(f"🔧 ATTEMPTING SMTP SEND - Recipient: {user_email}, Zone: {zone_id}")
-                logger.info(f"🔧 SMTP CONFIG - Server: {os.getenv('MAIL_SERVER')}, Port: {os.getenv('MAIL_PORT')}, Username: {os.getenv('MAIL_USERNAME')}, Password: {os.getenv('MAIL_PASSWORD')}")
-                
-                # Add a timeout to prevent hanging
-                import asyncio
-                try:
-                    logger.info(f"🔧 STARTING SMTP SEND WITH TIMEOUT - Recipient: {user_email}, Zone: {zone_id}")
-                    logger.info(f"🔧 TIMEOUT SET TO 30 SECONDS - Recipient: {user_email}, Zone: {zone_id}")
-                    
-                    # Send with timeout
-                    await asyncio.wait_for(self.fastmail.send_message(message), timeout=30.0)
-                    logger.info(f"✅ EMAIL SENT SUCCESSFULLY - Recipient: {user_email}, Zone: {zone_id}")
-                    return True
-                except asyncio.TimeoutError:
-                    logger.error(f"⏰ EMAIL SEND TIMEOUT - Recipient: {user_email}, Zone: {zone_id}, Timeout after 30 seconds")
-                    logger.error(f"🔧 SMTP HANGING DETECTED - Recipient: {user_email}, Zone: {zone_id}")
-                    return False
-                    
+                await self.smtp_pool.send_message(message)
+                logger.info(f"✅ EMAIL SENT SUCCESSFULLY - Recipient: {user_email}, Zone: {zone_id}")
+                return True
+            except asyncio.TimeoutError:
+                logger.error(f"⏰ EMAIL SEND TIMEOUT - Recipient: {user_email}, Zone: {zone_id}, Timeout after {settings.smtp_send_timeout} seconds")
+                return False
             except Exception as send_error:
                 logger.error(f"❌ EMAIL SEND FAILED - Recipient: {user_email}, Zone: {zone_id}, Error: {str(send_error)}")
                 logger.error(f"🔧 SMTP DETAILS - Server: {os.getenv('MAIL_SERVER')}, Port: {os.getenv('MAIL_PORT')}, Username: {os.getenv('MAIL_USERNAME')}")
@@ -225,6 +231,50 @@ class EmailService:
             logger.exception(f"Unexpected error details for {user_email}:")
             return False
     
+    async def send_digest_email(
+        self,
+        user_email: str,
+        user_name: str,
+        items: List[Dict[str, Any]]
+    ) -> bool:
+        """Send one email listing several alerts, grouped by zone."""
+        if not self.smtp_pool or not self.template_env:
+            logger.error(f"❌ EMAIL SERVICE NOT INITIALIZED - Cannot send digest to {user_email}")
+            return False
+
+        if not user_email or '@' not in user_email:
+            logger.error(f"❌ INVALID EMAIL ADDRESS - Digest recipient: {user_email}")
+            return False
+
+        try:
+            # Gom cảnh báo theo zone, giữ thứ tự xuất hiện
+            zones: Dict[str, List[Dict[str, Any]]] = {}
+            severity_counts = {"critical": 0, "warning": 0, "info": 0}
+            for item in items:
+                zones.setdefault(item.get("zoneName") or item.get("zoneId") or "Unknown zone", []).append(item)
+                severity = item.get("severity", "info")
+                severity_counts[severity] = severity_counts.get(severity, 0) + 1
+
+            html_content = self.template_env.get_template("digest.html").render(
+                user_name=user_name or "User",
+                zones=zones,
+                total_alerts=len(items),
+                severity_counts=severity_counts,
+                dashboard_url=os.getenv("FRONTEND_URL", "http://localhost:3000"),
+            )
+            message = self._build_message(
+                user_email,
+                f"🚨 EcoHub Alert Digest: {len(items)} alert(s) in {len(zones)} zone(s)",
+                html_content
+            )
+            await self.smtp_pool.send_message(message)
+            logger.info(f"✅ DIGEST EMAIL SENT - Recipient: {user_email}, Alerts: {len(items)}, Zones: {len(zones)}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ DIGEST EMAIL FAILED - Recipient: {user_email}, Error: {str(e)}")
+            logger.exception(f"Digest error details for {user_email}:")
+            return False
+
     async def send_bulk_notification_emails(
         self, 
         user_emails: list, 
@@ -240,24 +290,26 @@ class EmailService:
         logger.info(f"📬 STARTING BULK EMAIL SEND - Zone: {zone_id}, Total Recipients: {len(user_emails)}")
         logger.info(f"📧 RECIPIENT LIST - Zone: {zone_id}, Emails: {user_emails}")
         
-        success_count = 0
-        failed_emails = []
-        
-        for i, email in enumerate(user_emails):
+        # Gửi song song trên các kết nối của pool, tối đa smtp_pool_size email cùng lúc
+        semaphore = asyncio.Semaphore(settings.smtp_pool_size)
+
+        async def send_one(i: int, email: str) -> bool:
             user_name = user_names[i] if i < len(user_names) else None
-            logger.info(f"📤 SENDING EMAIL {i+1}/{len(user_emails)} - Recipient: {email}, Zone: {zone_id}")
-            
-            try:
-                if await self.send_notification_email(email, user_name, notification, zone_id):
-                    success_count += 1
-                    logger.info(f"✅ EMAIL {i+1} SUCCESS - Recipient: {email}, Zone: {zone_id}")
-                else:
-                    failed_emails.append(email)
+            async with semaphore:
+                logger.info(f"📤 SENDING EMAIL {i+1}/{len(user_emails)} - Recipient: {email}, Zone: {zone_id}")
+                try:
+                    if await self.send_notification_email(email, user_name, notification, zone_id):
+                        logger.info(f"✅ EMAIL {i+1} SUCCESS - Recipient: {email}, Zone: {zone_id}")
+                        return True
                     logger.error(f"❌ EMAIL {i+1} FAILED - Recipient: {email}, Zone: {zone_id}")
-            except Exception as e:
-                failed_emails.append(email)
-                logger.error(f"💥 EMAIL {i+1} EXCEPTION - Recipient: {email}, Zone: {zone_id}, Error: {str(e)}")
-                logger.exception(f"Exception details for email {i+1} to {email}:")
+                except Exception as e:
+                    logger.error(f"💥 EMAIL {i+1} EXCEPTION - Recipient: {email}, Zone: {zone_id}, Error: {str(e)}")
+                    logger.exception(f"Exception details for email {i+1} to {email}:")
+                return False
+
+        results = await asyncio.gather(*(send_one(i, email) for i, email in enumerate(user_emails)))
+        success_count = sum(1 for sent in results if sent)
+        failed_emails = [email for email, sent in zip(user_emails, results) if not sent]
         
         logger.info(f"🎯 BULK EMAIL COMPLETE - Zone: {zone_id}, Success: {success_count}/{len(user_emails)}")
         
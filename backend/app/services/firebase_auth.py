@@ -1,10 +1,9 @@
 from typing import Optional, Dict, Any
 
 from fastapi import Depends, HTTPException, Request, status
-from firebase_admin import auth as firebase_auth
-
 from app.utils.logger import get_logger
-from app.services.database import initialize_firebase
+from app.services.token_verifier import token_verifier
+from app.services.stream_tickets import stream_tickets
 
 logger = get_logger(__name__)
 
@@ -27,12 +26,13 @@ def _extract_bearer_token(request: Request) -> str:
 
 async def get_current_user(request: Request) -> Dict[str, Any]:
     """Verify Firebase ID token and return user claims (uid, email, email_verified, name)."""
-    token = _extract_bearer_token(request)
-    print(f"token: ", token)
+    return await _verify_user(_extract_bearer_token(request))
+
+
+async def _verify_user(token: str) -> Dict[str, Any]:
     try:
-        # Ensure Admin SDK is initialized
-        initialize_firebase()
-        decoded = firebase_auth.verify_id_token(token)
+        # Cached per token until it expires, verified off the event loop on a miss
+        decoded = await token_verifier.verify(token)
         uid = decoded.get("uid")
         email = decoded.get("email")
         email_verified = decoded.get("email_verified", False)
@@ -54,3 +54,18 @@ async def get_verified_user(user: Dict[str, Any] = Depends(get_current_user)) ->
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Email not verified")
     return user
 
+
+async def get_stream_user(request: Request) -> Dict[str, Any]:
+    """
+    Like get_verified_user, for server-push endpoints: a browser EventSource
+    cannot send the Authorization header, so a single-use ticket from
+    POST /zones/user/status-stream/ticket may be given as the `ticket` query
+    parameter instead. ID tokens are never accepted in the URL.
+    """
+    ticket = request.query_params.get("ticket")
+    if ticket and not request.headers.get("Authorization"):
+        user = stream_tickets.redeem(ticket)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired stream ticket")
+        return user
+    return await get_verified_user(await get_current_user(request))
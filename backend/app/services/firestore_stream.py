@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Số document mỗi trang (cũng là giới hạn của một batch ghi Firestore)
+DEFAULT_PAGE_SIZE = 500
+# Số trang được đọc trước khi bên tiêu thụ chưa lấy
+DEFAULT_PREFETCH_PAGES = 2
+
+_PAGE = "page"
+_DONE = "done"
+_ERROR = "error"
+
+
+def document_to_dict(doc) -> Dict[str, Any]:
+    """Snapshot -> dict with the document id under 'id'."""
+    data = doc.to_dict()
+    data['id'] = doc.id
+    return data
+
+
+async def stream_pages(
+    query,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: int = DEFAULT_PREFETCH_PAGES,
+    transform: Optional[Callable[[Any], Any]] = None,
+) -> AsyncIterator[List[Any]]:
+    """
+    Iterate a Firestore query page by page without blocking the event loop.
+
+    `query.stream()` is a lazy generator: the gRPC paging and the decoding of
+    every document happen while it is iterated. Here it is consumed in a worker
+    thread that hands over pages of `page_size` snapshots (or of
+    `transform(snapshot)` when given, also applied in the thread). At most
+    `prefetch` pages are read ahead of the consumer; stopping the iteration
+    early closes the underlying stream.
+    """
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max(1, prefetch))
+    stopped = threading.Event()
+
+    def hand_over(kind: str, value: Any):
+        try:
+            loop.call_soon_threadsafe(pages.put_nowait, (kind, value))
+        except RuntimeError:
+            # Event loop đã đóng
+            stopped.set()
+
+    def offer(page: List[Any]) -> bool:
+        # Chờ bên tiêu thụ lấy bớt trang (backpressure)
+        while not slots.acquire(timeout=0.1):
+            if stopped.is_set():
+                return False
+        if stopped.is_set():
+            return False
+        hand_over(_PAGE, page)
+        return True
+
+    def produce():
+        stream = None
+        try:
+            stream = query.stream()
+            page: List[Any] = []
+            for doc in stream:
+                page.append(transform(doc) if transform else doc)
+                if len(page) >= page_size:
+                    if not offer(page):
+                        return
+                    page = []
+            if page and not offer(page):
+                return
+            hand_over(_DONE, None)
+        except Exception as e:
+            hand_over(_ERROR, e)
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            kind, value = await pages.get()
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise value
+            slots.release()
+            yield value
+    finally:
+        stopped.set()
+
+
+async def stream_dicts(query, page_size: int = DEFAULT_PAGE_SIZE,
+                       prefetch: int = DEFAULT_PREFETCH_PAGES) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Like stream_pages, with every document already converted by document_to_dict."""
+    async for page in stream_pages(query, page_size, prefetch, transform=document_to_dict):
+        yield page
+
+
+async def fetch_dicts(query, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+    """Run a query off the event loop and return every document as a dict with its id."""
+    results: List[Dict[str, Any]] = []
+    async for page in stream_dicts(query, page_size):
+        results.extend(page)
+    return results
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.database import db
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Firestore cho phép tối đa 500 thao tác trong một batch
+FIRESTORE_BATCH_LIMIT = 500
+COMMIT_MAX_ATTEMPTS = 3
+
+
+class HistoryWriter:
+    """
+    Write-behind batcher for history rows (readings_history, readings_actuator_history, ...).
+
+    Rows from all zones are buffered and committed together, either when a batch
+    reaches Firestore's 500-operation limit or when the oldest buffered row has
+    waited max_delay seconds. Commits run concurrently, bounded by max_in_flight.
+
+    Rows added before start() wait for it; stop() keeps flushing until no row
+    is buffered or being committed, including rows added while it waits. Rows
+    added after stop() has returned are rejected (and logged), not scheduled
+    on a loop that nobody waits for.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = FIRESTORE_BATCH_LIMIT,
+        max_delay: float = settings.history_batch_max_delay,
+        max_in_flight: int = settings.history_batch_max_in_flight,
+    ):
+        self.max_batch_size = min(max_batch_size, FIRESTORE_BATCH_LIMIT)
+        self.max_delay = max_delay
+        self.max_in_flight = max(1, max_in_flight)
+
+        self.buffer: List[Tuple[Any, Dict[str, Any]]] = []
+        self.running = False
+        self.stopped = False
+        self._has_rows: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._commits: Set[asyncio.Task] = set()
+
+        # Counters
+        self.rows_added = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rows_rejected = 0
+        self.commits = 0
+        self.failed_commits = 0
+        self.total_commit_time = 0.0
+
+    async def start(self):
+        """Start the max-delay flush loop."""
+        if self.running:
+            return
+        self._has_rows = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.stopped = False
+        self.running = True
+        self._flush_task = asyncio.create_task(self._flush_loop(), name="history-writer-flush")
+        if self.buffer:
+            # Các hàng được thêm trước khi start
+            self._has_rows.set()
+        logger.info(f"History writer started (max delay {self.max_delay}s, {self.max_in_flight} commit(s) in flight)")
+
+    async def stop(self):
+        """Flush every buffered row and wait for all commits to finish."""
+        if self.stopped:
+            return
+        self.running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+        # Các hàng được thêm trong lúc chờ commit (ví dụ giá trị xả ra khi tắt) cũng được ghi
+        while self.buffer or self._commits:
+            await self.flush()
+        self.stopped = True
+        logger.info(f"History writer stopped, {self.rows_written} row(s) written in {self.commits} commit(s)")
+
+    def add(self, collection, data: Dict[str, Any], doc_id: Optional[str] = None):
+        """Buffer one document to be created (or overwritten when doc_id is given)."""
+        if self.stopped:
+            self.rows_rejected += 1
+            logger.warning("History writer already stopped, dropping a history row")
+            return
+        doc_ref = collection.document(doc_id) if doc_id else collection.document()
+        self.buffer.append((doc_ref, data))
+        self.rows_added += 1
+
+        # Chưa start hoặc đang stop: hàng nằm trong buffer cho tới khi start() / stop() ghi
+        if not self.running:
+            return
+        if len(self.buffer) >= self.max_batch_size:
+            self._flush_batch()
+        else:
+            self._has_rows.set()
+
+    async def flush(self):
+        """Flush everything buffered right now and wait for the commits."""
+        while self.buffer:
+            self._flush_batch()
+        if self._commits:
+            await asyncio.gather(*list(self._commits), return_exceptions=True)
+
+    def _flush_batch(self):
+        rows = self.buffer[:self.max_batch_size]
+        del self.buffer[:self.max_batch_size]
+        if not rows:
+            return
+        task = asyncio.ensure_future(self._commit(rows))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+
+    async def _flush_loop(self):
+        while True:
+            await self._has_rows.wait()
+            # Hàng cũ nhất trong buffer chờ tối đa max_delay giây
+            await asyncio.sleep(self.max_delay)
+            self._has_rows.clear()
+            while self.buffer:
+                self._flush_batch()
+
+    async def _commit(self, rows: List[Tuple[Any, Dict[str, Any]]]):
+        semaphore = self._semaphore or asyncio.Semaphore(1)
+        async with semaphore:
+            for attempt in range(1, COMMIT_MAX_ATTEMPTS + 1):
+                batch = db.batch()
+                for doc_ref, data in rows:
+                    batch.set(doc_ref, data)
+
+                started_at = time.monotonic()
+                try:
+                    await asyncio.to_thread(batch.commit)
+                    self.total_commit_time += time.monotonic() - started_at
+                    self.commits += 1
+                    self.rows_written += len(rows)
+                    logger.debug(f"History writer committed {len(rows)} row(s)")
+                    return
+                except Exception as e:
+                    self.failed_commits += 1
+                    logger.error(f"History batch commit failed (attempt {attempt}/{COMMIT_MAX_ATTEMPTS}, {len(rows)} rows): {e}")
+                    if attempt < COMMIT_MAX_ATTEMPTS:
+                        await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+            self.rows_failed += len(rows)
+            logger.error(f"Dropping {len(rows)} history row(s) after {COMMIT_MAX_ATTEMPTS} failed commits")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return batching counters."""
+        return {
+            "running": self.running,
+            "buffered": len(self.buffer),
+            "commitsInFlight": len(self._commits),
+            "rowsAdded": self.rows_added,
+            "rowsWritten": self.rows_written,
+            "rowsFailed": self.rows_failed,
+            "rowsRejected": self.rows_rejected,
+            "commits": self.commits,
+            "failedCommits": self.failed_commits,
+            "avgRowsPerCommit": round(self.rows_written / self.commits, 2) if self.commits else 0.0,
+            "avgCommitMs": round(self.total_commit_time / self.commits * 1000, 3) if self.commits else 0.0,
+        }
+
+
+# Global history writer instance
+history_writer = HistoryWriter()
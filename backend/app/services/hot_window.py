@@ -0,0 +1,173 @@
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bộ đệm được cấp phát dư so với cửa sổ để truy vấn đúng bằng hot_window_seconds
+# (ví dụ 24 giờ gần nhất) vẫn nằm trọn trong bộ nhớ khi dữ liệu đến dày hơn dự kiến
+CAPACITY_HEADROOM = 1.1
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _Ring:
+    """Preallocated ring buffer of one series: float64 epoch seconds and float32 values, oldest at `head` once full."""
+
+    __slots__ = ("timestamps", "values", "head", "size", "sensor_id", "evicted_until", "rejected")
+
+    def __init__(self, capacity: int, sensor_id: Optional[str]):
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.values = np.empty(capacity, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+        self.sensor_id = sensor_id
+        # Thời điểm của mẫu mới nhất đã bị ghi đè: trước đó bộ nhớ không còn đầy đủ
+        self.evicted_until = -math.inf
+        self.rejected = 0
+
+    def append(self, at: float, value: float) -> bool:
+        capacity = len(self.timestamps)
+        if self.size and at < self.timestamps[self.head - 1]:
+            # Giữ bộ đệm có thứ tự để tìm kiếm nhị phân: bỏ giá trị đến trễ
+            self.rejected += 1
+            return False
+        if self.size == capacity:
+            self.evicted_until = float(self.timestamps[self.head])
+        else:
+            self.size += 1
+        self.timestamps[self.head] = at
+        self.values[self.head] = value
+        self.head = (self.head + 1) % capacity
+        return True
+
+    def window(self, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the samples in [start, end), oldest first."""
+        capacity = len(self.timestamps)
+        if self.size < capacity:
+            segments = ((0, self.size),)
+        else:
+            segments = ((self.head, capacity), (0, self.head))
+        timestamps, values = [], []
+        for first, stop in segments:
+            segment = self.timestamps[first:stop]
+            lo = first + int(np.searchsorted(segment, start, side="left"))
+            hi = first + int(np.searchsorted(segment, end, side="left"))
+            timestamps.append(self.timestamps[lo:hi])
+            values.append(self.values[lo:hi])
+        return np.concatenate(timestamps), np.concatenate(values)
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+
+class HotWindowStore:
+    """
+    In-process copy of the most recent readings of every zone/type series.
+
+    Each series gets a ring buffer preallocated for hot_window_seconds of
+    readings at hot_window_sample_interval (plus CAPACITY_HEADROOM), filled by
+    the ingest pipeline (before storage compression) in O(1) per reading. A
+    history query whose whole range was observed by this process and has not
+    been overwritten yet is answered without touching Firestore.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = settings.hot_window_seconds,
+        sample_interval: float = settings.hot_window_sample_interval,
+    ):
+        self.window_seconds = window_seconds
+        self.capacity = max(1, math.ceil(window_seconds * CAPACITY_HEADROOM / max(sample_interval, 0.001)))
+        # Chỉ các giá trị nhận được sau thời điểm này mới có trong bộ nhớ
+        self.started_at = time.time()
+        self.series: Dict[Tuple[str, str], _Ring] = {}
+
+        # Counters
+        self.appended = 0
+        self.hits = 0
+        self.misses = 0
+
+    def append(self, zone_id: str, reading_type: str, at: datetime, value: float, sensor_id: Optional[str] = None):
+        """Record one reading of a zone/type series."""
+        ring = self.series.get((zone_id, reading_type))
+        if ring is None:
+            ring = self.series[(zone_id, reading_type)] = _Ring(self.capacity, sensor_id)
+        elif sensor_id and ring.sensor_id != sensor_id:
+            ring.sensor_id = sensor_id
+        if ring.append(_epoch(at), value):
+            self.appended += 1
+
+    def query(
+        self,
+        zone_id: str,
+        reading_type: str,
+        start: datetime,
+        end: datetime,
+        sensor_id: Optional[str] = None,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (epoch seconds, values) of [start, end) from memory, or None when the
+        range is not entirely inside what this store still holds.
+        """
+        ring = self.series.get((zone_id, reading_type))
+        start_at = _epoch(start)
+        # Bộ nhớ có đủ mọi giá trị từ lúc khởi động, trừ những giá trị đã bị ghi đè
+        if (
+            ring is None
+            or (sensor_id and ring.sensor_id != sensor_id)
+            or start_at < self.started_at
+            or start_at <= ring.evicted_until
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ring.window(start_at, _epoch(end))
+
+    def discard(self, zone_id: str):
+        """Drop every series of a deleted zone."""
+        for key in [key for key in self.series if key[0] == zone_id]:
+            del self.series[key]
+
+    def get_zone_footprints(self) -> Dict[str, Dict[str, Any]]:
+        """Series, samples held and bytes allocated, per zone."""
+        zones: Dict[str, Dict[str, Any]] = {}
+        for (zone_id, reading_type), ring in self.series.items():
+            zone = zones.setdefault(zone_id, {"series": 0, "samples": 0, "bytes": 0, "types": []})
+            zone["series"] += 1
+            zone["samples"] += ring.size
+            zone["bytes"] += ring.nbytes
+            zone["types"].append(reading_type)
+        return zones
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the memory footprint per zone."""
+        lookups = self.hits + self.misses
+        return {
+            "windowSeconds": self.window_seconds,
+            "capacityPerSeries": self.capacity,
+            "bytesPerSeries": self.capacity * (8 + 4),
+            "series": len(self.series),
+            "totalBytes": sum(ring.nbytes for ring in self.series.values()),
+            "appended": self.appended,
+            "rejectedOutOfOrder": sum(ring.rejected for ring in self.series.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "zones": self.get_zone_footprints(),
+        }
+
+
+# Global hot window store instance
+hot_window_store = HotWindowStore()
@@ -0,0 +1,227 @@
+import asyncio
+import time
+import zlib
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+IngestHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Khoảng thời gian (giây) dùng để tính throughput gần nhất
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+def shard_for_zone(zone_id: str, shard_count: int) -> int:
+    """Map a zone to a fixed shard. crc32 is stable across processes, unlike hash()."""
+    return zlib.crc32(zone_id.encode("utf-8")) % shard_count
+
+
+class IngestShard:
+    """A bounded FIFO of messages processed by exactly one worker, so per-zone order is kept."""
+
+    def __init__(self, index: int, max_size: int):
+        self.index = index
+        self.max_size = max_size
+        self.items: Deque[Tuple[str, Dict[str, Any], float]] = deque()
+        self.not_empty = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+        # Thời điểm enqueue của message đang được xử lý (None nếu worker rảnh)
+        self.current_enqueued_at: Optional[float] = None
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.last_wait = 0.0
+
+    def put_nowait(self, zone_id: str, data: Dict[str, Any]) -> bool:
+        if len(self.items) >= self.max_size:
+            self.dropped += 1
+            return False
+
+        self.items.append((zone_id, data, time.monotonic()))
+        if len(self.items) > self.max_depth:
+            self.max_depth = len(self.items)
+        self.idle.clear()
+        self.not_empty.set()
+        return True
+
+    async def get(self) -> Tuple[str, Dict[str, Any], float]:
+        while not self.items:
+            self.not_empty.clear()
+            await self.not_empty.wait()
+        item = self.items.popleft()
+        self.current_enqueued_at = item[2]
+        return item
+
+    def done(self):
+        self.current_enqueued_at = None
+        if not self.items:
+            self.idle.set()
+
+    def lag(self, now: float) -> float:
+        """Age of the oldest message of this shard that has not finished processing."""
+        if self.current_enqueued_at is not None:
+            return now - self.current_enqueued_at
+        if self.items:
+            return now - self.items[0][2]
+        return 0.0
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "shard": self.index,
+            "queueDepth": len(self.items),
+            "maxQueueDepth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "lagSeconds": round(self.lag(now), 3),
+            "lastQueueWaitMs": round(self.last_wait * 1000, 3),
+        }
+
+
+class IngestService:
+    """
+    Long-lived ingest pipeline for sensor messages.
+
+    The MQTT callback only decodes the payload and hands it over to the shard
+    owning the zone. Each shard has a single worker, so readings of one zone are
+    processed strictly in order while different zones run in parallel.
+    """
+
+    def __init__(
+        self,
+        shard_count: int = settings.ingest_shard_count,
+        shard_queue_size: int = settings.ingest_shard_queue_size,
+    ):
+        self.shard_count = max(1, shard_count)
+        self.shard_queue_size = shard_queue_size
+
+        self.handler: Optional[IngestHandler] = None
+        self.shards: List[IngestShard] = []
+        self.workers: List[asyncio.Task] = []
+        self.running = False
+
+        # Counters
+        self.started_at: Optional[float] = None
+        self.received = 0
+        self.dropped_not_running = 0
+        self.total_wait_time = 0.0
+        self.total_processing_time = 0.0
+        self._window_started_at = 0.0
+        self._window_count = 0
+        self._last_window_rate = 0.0
+
+    async def start(self, handler: IngestHandler):
+        """Create the shards and their worker tasks on the running event loop."""
+        if self.running:
+            logger.warning("Ingest service already running")
+            return
+
+        self.handler = handler
+        self.shards = [IngestShard(index, self.shard_queue_size) for index in range(self.shard_count)]
+        self.started_at = time.monotonic()
+        self._window_started_at = self.started_at
+        self.running = True
+
+        self.workers = [
+            asyncio.create_task(self._worker(shard), name=f"ingest-shard-{shard.index}")
+            for shard in self.shards
+        ]
+        logger.info(f"Ingest service started with {self.shard_count} shard(s), queue size {self.shard_queue_size} per shard")
+
+    async def stop(self, timeout: float = settings.ingest_drain_timeout):
+        """Stop accepting messages, drain what is queued (bounded by timeout) and stop workers."""
+        if not self.running:
+            return
+
+        self.running = False
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.idle.wait() for shard in self.shards)),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            remaining = sum(len(shard.items) for shard in self.shards)
+            logger.warning(f"Ingest shards not drained after {timeout}s, {remaining} message(s) discarded")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("Ingest service stopped.")
+
+    def submit(self, zone_id: str, data: Dict[str, Any]) -> bool:
+        """Enqueue a message on the shard of its zone. Must be called on the event loop thread."""
+        self.received += 1
+        if not self.running:
+            self.dropped_not_running += 1
+            return False
+
+        shard = self.shards[shard_for_zone(zone_id, self.shard_count)]
+        if not shard.put_nowait(zone_id, data):
+            logger.warning(f"Ingest shard {shard.index} full ({self.shard_queue_size}), dropping message for zone {zone_id}")
+            return False
+        return True
+
+    async def _worker(self, shard: IngestShard):
+        while True:
+            zone_id, data, enqueued_at = await shard.get()
+            started_at = time.monotonic()
+            shard.last_wait = started_at - enqueued_at
+            self.total_wait_time += shard.last_wait
+            try:
+                await self.handler(zone_id, data)
+                shard.processed += 1
+            except Exception as e:
+                shard.failed += 1
+                logger.error(f"Ingest shard {shard.index} failed to process message for zone {zone_id}: {e}", exc_info=True)
+            finally:
+                finished_at = time.monotonic()
+                self.total_processing_time += finished_at - started_at
+                self._record_completion(finished_at)
+                shard.done()
+
+    def _record_completion(self, now: float):
+        elapsed = now - self._window_started_at
+        if elapsed >= THROUGHPUT_WINDOW_SECONDS:
+            self._last_window_rate = self._window_count / elapsed
+            self._window_started_at = now
+            self._window_count = 0
+        self._window_count += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return throughput, queue-depth and per-shard lag counters."""
+        now = time.monotonic()
+        uptime = now - self.started_at if self.started_at else 0.0
+        processed = sum(shard.processed for shard in self.shards)
+        failed = sum(shard.failed for shard in self.shards)
+        completed = processed + failed
+        shard_stats = [shard.get_stats(now) for shard in self.shards]
+
+        return {
+            "running": self.running,
+            "shards": self.shard_count,
+            "shardQueueCapacity": self.shard_queue_size,
+            "uptimeSeconds": round(uptime, 3),
+            "received": self.received,
+            "processed": processed,
+            "failed": failed,
+            "dropped": self.dropped_not_running + sum(shard.dropped for shard in self.shards),
+            "queueDepth": sum(stats["queueDepth"] for stats in shard_stats),
+            "maxLagSeconds": max((stats["lagSeconds"] for stats in shard_stats), default=0.0),
+            "throughputPerSecond": round(completed / uptime, 3) if uptime > 0 else 0.0,
+            "recentThroughputPerSecond": round(self._last_window_rate, 3),
+            "avgQueueWaitMs": round(self.total_wait_time / completed * 1000, 3) if completed else 0.0,
+            "avgProcessingMs": round(self.total_processing_time / completed * 1000, 3) if completed else 0.0,
+            "shardStats": shard_stats,
+        }
+
+
+# Global ingest service instance
+ingest_service = IngestService()
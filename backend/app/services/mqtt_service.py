@@ -1,7 +1,6 @@
 import asyncio
 from datetime import datetime, timedelta
 import json
-import paho.mqtt.client as mqtt
 from fastapi.concurrency import run_in_threadpool
 from app.config import settings
 from app.utils.logger import get_logger
@@ -13,14 +12,27 @@ from app.sensor.sensor_service import SensorService
 from app.services.database import db 
 from app.zone.zone_service import ZoneService
 from app.action_log.action_log_service import ActionLogService
-from app.services.command_service import set_mqtt_client, publish_command
+from app.services.command_service import set_mqtt_transport, publish_command
 from app.services.notification_service import notification_service
+from app.services.ingest_service import ingest_service
+from app.services.history_writer import history_writer
+from app.services.mqtt_transport import create_mqtt_transport
+from app.services.topology_cache import zone_topology_cache
+from app.services.zone_status_store import zone_status_store
+from app.services.reading_compressor import reading_compressor
+from app.services.actuator_state_tracker import actuator_state_tracker
+from app.services.alert_state_machine import alert_state_machine, DEFAULT_HYSTERESIS
+from app.services.email_outbox import email_outbox
+from app.services.notification_rate_limiter import notification_rate_limiter
+from app.services.reading_rollup import reading_rollup
+from app.services.hot_window import hot_window_store
+from app.services.status_hub import status_hub
+from app.services.reading_buckets import BUCKET_LAYOUT, reading_bucket_writer
 
 logger = get_logger(__name__)
 
-# Initialize MQTT Client
-mqtt_client = mqtt.Client(client_id=settings.mqtt_client_id,
-                          callback_api_version=mqtt.CallbackAPIVersion.VERSION1)
+# Initialize MQTT transport (paho hoặc gmqtt, chọn bằng MQTT_TRANSPORT)
+mqtt_transport = create_mqtt_transport(settings.mqtt_transport, settings.mqtt_client_id)
 
 zone_status_service = ZoneStatusService()
 reading_history_service = ReadingHistoryService()
@@ -32,13 +44,25 @@ sensor_service = SensorService()
 zone_service = ZoneService()
 action_log_service = ActionLogService()
 
-
-async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) -> str:
+# Các điều kiện cảnh báo: (tên điều kiện, loại đo, ngưỡng "min" hoặc "max")
+ALERT_CONDITIONS = [
+    ("temperature_low", "temperature", "min"),
+    ("temperature_high", "temperature", "max"),
+    ("soilMoisture_low", "soilMoisture", "min"),
+    ("lightIntensity_low", "lightIntensity", "min"),
+]
+
+async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict, zone_name: str = None, now: datetime = None):
+    """
+    Tính trạng thái của zone từ các ngưỡng. Thông báo chỉ được gửi khi trạng thái
+    cảnh báo chuyển sang NOTIFIED (xem alert_state_machine).
+    Trả về (status, suggestion, các vấn đề vừa được thông báo).
+    """
     overall_status = "Good" 
     suggestion = None
     
-    zone_info = await zone_service.get_zone(zone_id)
-    zone_name = zone_info.get("name", zone_id) if zone_info else zone_id
+    zone_name = zone_name or zone_id
+    now = now or datetime.utcnow()
 
     issue_status = []
 
@@ -59,6 +83,7 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
                     suggestion_text = "Activate Heater?"
 
                     issue_status.append({
+                        "condition": "temperature_low",
                         "status": overall_status,
                         "message": msg,
                         "suggestion": suggestion,
@@ -72,6 +97,7 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
                     suggestion_text = "Activate Fan?"
 
                     issue_status.append({
+                        "condition": "temperature_high",
                         "status": overall_status,
                         "message": msg,
                         "suggestion": suggestion,
@@ -87,6 +113,7 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
                     suggestion_text = "Activate Pump?"
 
                     issue_status.append({
+                        "condition": "soilMoisture_low",
                         "status": overall_status,
                         "message": msg,
                         "suggestion": suggestion,
@@ -103,6 +130,7 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
                     suggestion_text = "Activate Light?"
 
                     issue_status.append({
+                        "condition": "lightIntensity_low",
                         "status": overall_status,
                         "message": msg,
                         "suggestion": suggestion,
@@ -125,8 +153,20 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
                 overall_status = "Warning" 
 
 
+    # Cập nhật máy trạng thái cảnh báo cho mọi điều kiện (kể cả khi không vượt ngưỡng, để ghi nhận hồi phục)
+    notified_conditions = set()
+    for condition, sensor_type, direction in ALERT_CONDITIONS:
+        setting = thresholds.get(sensor_type)
+        if not setting or not setting.get("enabled") or sensor_type not in readings or setting.get(direction) is None:
+            continue
+        hysteresis = setting.get("hysteresis")
+        if hysteresis is None:
+            hysteresis = DEFAULT_HYSTERESIS.get(sensor_type, 0.0)
+        if alert_state_machine.update(zone_id, condition, readings[sensor_type], setting[direction], direction, hysteresis, now):
+            notified_conditions.add(condition)
+
     if not issue_status:
-        return "Good", None
+        return "Good", None, []
 
     issue_status.sort(key=lambda x: x["priority"], reverse=True)
 
@@ -135,8 +175,9 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
     overall_status = most_critical_issue["status"]
     suggestion = most_critical_issue["suggestion"]
 
-    for issue in issue_status:
-        publish_notification(
+    notified_issues = [issue for issue in issue_status if issue["condition"] in notified_conditions]
+    for issue in notified_issues:
+        await publish_notification(
             zone_id, 
             issue["status"], 
             issue["message"], 
@@ -147,9 +188,9 @@ async def evaluate_thresholds(zone_id: str, readings: dict, thresholds: dict) ->
     # Note: Email sending is now handled directly in process_sensor_data
     # when zone status is updated, not through publish_notification
     
-    return overall_status, suggestion
+    return overall_status, suggestion, notified_issues
 
-def publish_notification(zone_id: str, alert_type: str, message: str, suggestion: str, suggestion_text: str):
+async def publish_notification(zone_id: str, alert_type: str, message: str, suggestion: str, suggestion_text: str):
     """Gửi một thông báo/cảnh báo lên topic notifications của một zone cụ thể."""
     try:
         # Xây dựng topic notification động
@@ -162,11 +203,10 @@ def publish_notification(zone_id: str, alert_type: str, message: str, suggestion
         }
         json_payload = json.dumps(payload)
         
-        result = mqtt_client.publish(notification_topic, json_payload, qos=1)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        if await mqtt_transport.publish(notification_topic, json_payload, qos=1):
             logger.info(f"NOTIFICATION SENT to '{notification_topic}': {message}")
         else:
-            logger.error(f"Failed to send notification to '{notification_topic}'. RC: {result.rc}")
+            logger.error(f"Failed to send notification to '{notification_topic}'.")
     except Exception as e:
         logger.error(f"Exception while publishing notification: {e}")
 
@@ -207,20 +247,37 @@ async def trigger_email_notifications(zone_id: str, notification: dict):
         logger.error(f"💥 CRITICAL ERROR in email notifications - Zone: {zone_id}, Error: {str(e)}")
         logger.exception(f"Full traceback for zone {zone_id}:")
 
+DIRECT_ALERT_EMAIL_JOB = "direct_alert"
+
 async def send_direct_alert_email(zone_id: str, status: str, suggestion: str):
-    """Send email directly when zone status changes to severe."""
+    """Queue an alert email when zone status changes to severe. Delivery happens in the email outbox workers."""
+    logger.info(f"📧 DIRECT EMAIL TRIGGERED - Zone: {zone_id}, Status: {status}, Suggestion: {suggestion}")
+    await email_outbox.enqueue(DIRECT_ALERT_EMAIL_JOB, {
+        "zone_id": zone_id,
+        "status": status,
+        "suggestion": suggestion,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+async def deliver_direct_alert_email(job: dict) -> bool:
+    """
+    Email outbox handler: look up the zone owner and send the alert email.
+    Returns False only when sending should be retried.
+    """
+    zone_id = job["zone_id"]
+    status = job["status"]
+    suggestion = job.get("suggestion")
     try:
-        logger.info(f"📧 DIRECT EMAIL TRIGGERED - Zone: {zone_id}, Status: {status}, Suggestion: {suggestion}")
         
         # Get zone info for better email content
-        zone_info = await zone_service.get_zone(zone_id)
-        zone_name = zone_info.get("name", zone_id) if zone_info else zone_id
+        topology = await zone_topology_cache.get(zone_id)
+        zone_name = topology["name"] if topology else zone_id
         
         # Get zone owner for email
-        zone_owner_uid = zone_info.get("owner") if zone_info else None
+        zone_owner_uid = topology["owner"] if topology else None
         if not zone_owner_uid:
             logger.warning(f"⚠️ NO ZONE OWNER - Zone: {zone_id}, Cannot send email")
-            return
+            return True
         
         # Get user profile
         users_ref = db.collection("users")
@@ -228,7 +285,7 @@ async def send_direct_alert_email(zone_id: str, status: str, suggestion: str):
         
         if not user_doc.exists:
             logger.warning(f"⚠️ USER NOT FOUND - Zone: {zone_id}, UID: {zone_owner_uid}")
-            return
+            return True
         
         user_data = user_doc.to_dict()
         user_email = user_data.get("email")
@@ -236,7 +293,7 @@ async def send_direct_alert_email(zone_id: str, status: str, suggestion: str):
         
         if not user_email or not user_data.get("emailVerified", False):
             logger.warning(f"⚠️ USER NOT ELIGIBLE - Zone: {zone_id}, Email: {user_email}, Verified: {user_data.get('emailVerified')}")
-            return
+            return True
         
         logger.info(f"👤 USER FOUND FOR EMAIL - Zone: {zone_id}, Email: {user_email}, Name: {user_name}")
         
@@ -246,9 +303,24 @@ async def send_direct_alert_email(zone_id: str, status: str, suggestion: str):
             "message": f"Zone '{zone_name}' status changed to: {status}",
             "suggestion": suggestion,
             "severity": "critical" if status in ["Too Hot", "Too Cool"] else "warning",
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            "timestamp": job.get("timestamp") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
+        # Tùy chọn của người dùng: tắt email, gom vào email tổng hợp, giới hạn maxPerHour / maxPerDay
+        # (kiểm tra trước khi render template và gửi SMTP)
+        user_info = {
+            "uid": zone_owner_uid,
+            "email": user_email,
+            "displayName": user_name,
+            "notificationPreferences": user_data.get("notificationPreferences") or {},
+        }
+        reserved_at = datetime.utcnow()
+        if not await notification_service.should_send_email_notification(
+            user_info, {**notification_data, "zoneId": zone_id, "zoneName": zone_name}, now=reserved_at
+        ):
+            logger.info(f"⏳ DIRECT ALERT EMAIL NOT SENT NOW - Zone: {zone_id}, Recipient: {user_email}")
+            return True
+        
         logger.info(f"📧 SENDING DIRECT ALERT EMAIL - Zone: {zone_id}, Recipient: {user_email}")
         
         # Import email service
@@ -265,13 +337,19 @@ async def send_direct_alert_email(zone_id: str, status: str, suggestion: str):
         if success:
             logger.info(f"✅ DIRECT ALERT EMAIL SENT - Zone: {zone_id}, Recipient: {user_email}")
         else:
+            # Email sẽ được gửi lại: trả lại lượt đã giữ
+            notification_rate_limiter.release(zone_owner_uid, reserved_at)
             logger.error(f"❌ DIRECT ALERT EMAIL FAILED - Zone: {zone_id}, Recipient: {user_email}")
+        return success
             
     except Exception as e:
         logger.error(f"💥 ERROR in direct alert email - Zone: {zone_id}, Error: {str(e)}")
         logger.exception(f"Direct email error details for zone {zone_id}:")
+        return False
+
+email_outbox.register_handler(DIRECT_ALERT_EMAIL_JOB, deliver_direct_alert_email)
 
-def publish_completion_notification(zone_id: str, completed_command: str):
+async def publish_completion_notification(zone_id: str, completed_command: str):
     """Gửi một thông báo đặc biệt để báo hiệu một hành động đã hoàn thành."""
     try:
         notification_topic = f"ecohub/{zone_id}/notifications"
@@ -283,43 +361,69 @@ def publish_completion_notification(zone_id: str, completed_command: str):
         }
         json_payload = json.dumps(payload)
         
-        result = mqtt_client.publish(notification_topic, json_payload, qos=1)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        if await mqtt_transport.publish(notification_topic, json_payload, qos=1):
             logger.info(f"COMPLETION SIGNAL SENT to '{notification_topic}' for command '{completed_command}'")
         else:
-            logger.error(f"Failed to send completion signal. RC: {result.rc}")
+            logger.error(f"Failed to send completion signal to '{notification_topic}'.")
     except Exception as e:
         logger.error(f"Exception while publishing completion signal: {e}")
 
-def publish_status_update(zone_id: str, status_payload: dict):
+async def publish_status_update(zone_id: str, status_payload: dict):
     """Gửi tin nhắn cập nhật trạng thái của một zone."""
+    # Trình duyệt nhận qua /zones/user/status-stream (không cần kết nối tới broker)
+    status_hub.publish(zone_id, status_payload)
     try:
         # Topic này dành riêng cho việc cập nhật UI
         update_topic = f"ecohub/zones/{zone_id}/status_update"
         json_payload = json.dumps(status_payload, default=str) # default=str để xử lý datetime
         
-        result = mqtt_client.publish(update_topic, json_payload, qos=1)
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+        if await mqtt_transport.publish(update_topic, json_payload, qos=1):
             logger.info(f"STATUS UPDATE SENT to '{update_topic}'")
         else:
-            logger.error(f"Failed to send status update to '{update_topic}'. RC: {result.rc}")
+            logger.error(f"Failed to send status update to '{update_topic}'.")
     except Exception as e:
         logger.error(f"Exception while publishing status update: {e}")
 
+def queue_reading_history(zone_id: str, reading_type: str, read_at: datetime, value: float, sensor_id: str):
+    """Đưa một bản ghi readings_history vào hàng đợi ghi theo lô (hoặc vào bucket giờ của nó)."""
+    if settings.reading_storage_layout == BUCKET_LAYOUT:
+        reading_bucket_writer.add(zone_id, reading_type, read_at, value, sensor_id)
+        return
+    history_data = {
+        "readAt": read_at,
+        "sensorId": sensor_id,
+        "type": reading_type,
+        "value": value,
+        "zoneId": zone_id
+    }
+    history_writer.add(reading_history_service.collection, history_data)
+
+def flush_pending_readings():
+    """Lưu các giá trị cuối cùng đang được giữ lại bởi bộ nén (gọi khi tắt ứng dụng)."""
+    pending = reading_compressor.drain()
+    for zone_id, reading_type, (read_at, value, sensor_id) in pending:
+        queue_reading_history(zone_id, reading_type, read_at, value, sensor_id)
+    if pending:
+        logger.info(f"Queued {len(pending)} pending compressed readings to readings_history.")
+
 async def process_sensor_data(zone_id: str, payload_data: dict):
     logger.info(f"Processing data for zone_id: {zone_id}")
     now = datetime.utcnow() 
 
-    readings = payload_data.get("readings", {})
-    actuator_states = payload_data.get("actuatorStates", {})
+    # Cấu hình của zone (thresholds, sensor map, actuator map) lấy từ cache
+    topology = await zone_topology_cache.get(zone_id)
+    if not topology:
+        logger.warning(f"Zone {zone_id} not found or its configuration could not be loaded. Skipping sensor data.")
+        return
 
-    zone_doc = await zone_service.get_zone(zone_id)
-    thresholds = zone_doc.get("thresholds", {})
+    thresholds = topology["thresholds"]
 
-    calculated_status, calculated_suggestion = await evaluate_thresholds(zone_id, payload_data, thresholds)
+    calculated_status, calculated_suggestion, notified_issues = await evaluate_thresholds(
+        zone_id, payload_data, thresholds, topology["name"], now
+    )
     logger.info(f"Calculated status for zone {zone_id} is: '{calculated_status}'")
 
-    # Update collection zone_status
+    # Update zone status (in-memory, written to Firestore by zone_status_store)
     try:
         status_update_payload = {
             "status": calculated_status, 
@@ -327,18 +431,20 @@ async def process_sensor_data(zone_id: str, payload_data: dict):
             "suggestion": calculated_suggestion
         }
         
-        # Call service for update
-        updated_status = await zone_status_service.update_zone_status(zone_id, status_update_payload)
+        # Lần đầu gặp zone: đọc document hiện có để so sánh status và trả về đầy đủ
+        await zone_status_store.load(zone_id)
+        updated_status = zone_status_store.update(zone_id, status_update_payload)
         logger.info(f"Successfully updated zone_status for zone_id: {zone_id}")
 
         if updated_status:
-            publish_status_update(zone_id, updated_status)
+            await publish_status_update(zone_id, updated_status)
             
-                    # Send email directly if status is severe
-        # This bypasses the complex notification system and sends emails immediately
-        if calculated_status in ["Too Hot", "Too Cool", "Need water", "Need light"]:
-            logger.info(f"🚨 SEVERE STATUS DETECTED - Zone: {zone_id}, Status: {calculated_status}")
-            await send_direct_alert_email(zone_id, calculated_status, calculated_suggestion)
+        # Send email directly when a severe condition has just been notified
+        # (alert state machine: not on every reading while the condition lasts)
+        if notified_issues:
+            alert_issue = notified_issues[0]
+            logger.info(f"🚨 SEVERE STATUS DETECTED - Zone: {zone_id}, Status: {alert_issue['status']}")
+            await send_direct_alert_email(zone_id, alert_issue["status"], alert_issue["suggestion"])
             
     except Exception as e:
         logger.error(f"Error updating zone_status for zone_id {zone_id}: {e}", exc_info=True)
@@ -346,26 +452,12 @@ async def process_sensor_data(zone_id: str, payload_data: dict):
 
     # Update collection readings_history
     try:
-        sensors_in_zone = await sensor_service.get_all_sensors(zone_id=zone_id)
-        logger.info(f"DEBUG: Found {len(sensors_in_zone)} sensor(s) for zone_id '{zone_id}'.")
-
-        if not sensors_in_zone:
+        sensor_map = topology["sensor_map"]
+        if not sensor_map:
             logger.warning(f"No sensors found for zone_id {zone_id}. Cannot save reading history.")
             return
 
-        # Bước 2b: Tạo một "bản đồ tra cứu" từ type sang sensorId   
-        sensor_map = {}
-        for sensor in sensors_in_zone:
-            sensor_id = sensor.get('id')
-            measures = sensor.get('measures', [])
-            if sensor_id and measures:
-                for measure_type in measures:
-                    sensor_map[measure_type] = sensor_id
-        
-        logger.debug(f"Built sensor map for zone {zone_id}: {sensor_map}")
-
-        batch = db.batch()
-        history_collection_ref = reading_history_service.collection
+        storage_policy = topology["storage_policy"]
         records_to_create = 0
 
         for reading_type, value in payload_data.items():
@@ -375,23 +467,25 @@ async def process_sensor_data(zone_id: str, payload_data: dict):
             sensor_id = sensor_map.get(reading_type)
             
             if sensor_id:
-                history_doc_ref = history_collection_ref.document() 
-                history_data = {
-                    "readAt": now,
-                    "sensorId": sensor_id,
-                    "type": reading_type,
-                    "value": float(value), 
-                    "zoneId": zone_id
-                }
-                batch.set(history_doc_ref, history_data)
-                records_to_create += 1
+                # Rollup được tính trên mọi giá trị, trước khi nén
+                reading_rollup.add(zone_id, reading_type, now, float(value))
+                hot_window_store.append(zone_id, reading_type, now, float(value), sensor_id)
+                # Chỉ lưu các giá trị có ý nghĩa theo chính sách lưu trữ (deadband / swinging door)
+                points = reading_compressor.offer(
+                    zone_id, reading_type, now, float(value),
+                    sensor_id=sensor_id, policy=storage_policy.get(reading_type)
+                )
+                for read_at, stored_value, stored_sensor_id in points:
+                    queue_reading_history(zone_id, reading_type, read_at, stored_value, stored_sensor_id)
+                    records_to_create += 1
             else:
                 logger.warning(f"No matching sensor found for reading type '{reading_type}' in zone {zone_id}.")
 
-        # Bước 2d: Thực thi batch nếu có bản ghi để tạo
+        # Bước 2d: Các bản ghi được ghi theo lô bởi history_writer (gộp nhiều zone)
         if records_to_create > 0:
-            await asyncio.to_thread(batch.commit)
-            logger.info(f"Successfully saved {records_to_create} records to readings_history for zone {zone_id}.")
+            logger.info(f"Queued {records_to_create} records to readings_history for zone {zone_id}.")
+        else:
+            logger.debug(f"No reading of zone {zone_id} needs to be stored (within storage policy).")
 
     except Exception as e:
         logger.error(f"Error saving to readings_history for zone_id {zone_id}: {e}", exc_info=True)
@@ -402,15 +496,11 @@ async def process_sensor_data(zone_id: str, payload_data: dict):
             logger.info(f"No actuatorStates in payload for zone {zone_id}. Skipping actuator history.")
             return
 
-        actuators_in_zone = await actuator_service.get_all_actuators(zone_id=zone_id)
-        if not actuators_in_zone:
+        actuator_map = topology["actuator_map"]
+        if not actuator_map:
             logger.warning(f"No actuators found for zone_id {zone_id}. Cannot save actuator history.")
             return
 
-        actuator_map = {actuator.get('type'): actuator.get('id') for actuator in actuators_in_zone if actuator.get('type') and actuator.get('id')}
-        logger.debug(f"Built actuator map for zone {zone_id}: {actuator_map}")
-
-        actuator_batch = db.batch()
         actuator_history_ref = actuator_history_service.collection
         records_to_create = 0
 
@@ -418,122 +508,89 @@ async def process_sensor_data(zone_id: str, payload_data: dict):
             actuator_id = actuator_map.get(actuator_type)
             
             if actuator_id:
-                history_doc_ref = actuator_history_ref.document()
-                history_data = {
-                    "readAt": now,
-                    "actuatorId": actuator_id,
-                    "type": actuator_type,
-                    "state": state,
-                    "zoneId": zone_id
-                }
-                actuator_batch.set(history_doc_ref, history_data)
-                records_to_create += 1
+                # Chỉ ghi khi trạng thái thay đổi (kèm thời lượng của trạng thái trước đó)
+                history_data = actuator_state_tracker.observe(actuator_id, actuator_type, zone_id, state, now)
+                if history_data:
+                    history_writer.add(actuator_history_ref, history_data)
+                    records_to_create += 1
             else:
                 logger.warning(f"No matching actuator found for type '{actuator_type}' in zone {zone_id}.")
 
         if records_to_create > 0:
-            await asyncio.to_thread(actuator_batch.commit)
-            logger.info(f"Successfully saved {records_to_create} records to readings_actuator_history for zone {zone_id}.")
+            logger.info(f"Queued {records_to_create} actuator transition(s) to readings_actuator_history for zone {zone_id}.")
 
     except Exception as e:
         logger.error(f"Error saving to readings_actuator_history for zone_id {zone_id}: {e}", exc_info=True)
 
 
-def on_connect(client, userdata, flags, rc):
+def on_connect():
     """Callback for when the client connects to the broker."""
-    if rc == 0:
-        logger.info(f"Successfully connected to MQTT Broker: {settings.mqtt_broker_host}")
-        # Subscribe to the topic upon connection
-        wildcard_topic = settings.mqtt_topic_pattern
-        client.subscribe(wildcard_topic)
+    logger.info(f"Successfully connected to MQTT Broker: {settings.mqtt_broker_host}")
+    # Subscribe to the topic upon connection
+    wildcard_topic = settings.mqtt_topic_pattern
+    mqtt_transport.subscribe(wildcard_topic)
 
-        logger.info(f"Subscribed to topic: {wildcard_topic}")
+    logger.info(f"Subscribed to topic: {wildcard_topic}")
 
-        notification_topic = settings.mqtt_notification_topic
-        client.subscribe(notification_topic, qos=1)
+    notification_topic = settings.mqtt_notification_topic
+    mqtt_transport.subscribe(notification_topic, qos=1)
 
-        logger.info(f"Subscribed to topic: {notification_topic}")
+    logger.info(f"Subscribed to topic: {notification_topic}")
 
-        feedback_topic = "ecohub/+/command_feedback"
-        client.subscribe(feedback_topic, qos=1)
-        logger.info(f"Subscribed to topic: {feedback_topic}")
-    else:
-        logger.error(f"Failed to connect to MQTT Broker, return code {rc}\n")
+    feedback_topic = "ecohub/+/command_feedback"
+    mqtt_transport.subscribe(feedback_topic, qos=1)
+    logger.info(f"Subscribed to topic: {feedback_topic}")
 
-def on_message(client, userdata, msg):
-    """Callback for when a message is received from the broker."""
+async def on_message(topic: str, payload: bytes):
+    """Callback for when a message is received from the broker. Runs on the event loop."""
     try:
-        topic_parts = msg.topic.split('/')
+        topic_parts = topic.split('/')
         if len(topic_parts) == 3 and topic_parts[0] == "ecohub" and topic_parts[2] == "sensors":
             zone_id = topic_parts[1]
-            payload_str = msg.payload.decode('utf-8')
-            logger.info(f"Received message on topic {msg.topic} for zone_id {zone_id}")
+            payload_str = payload.decode('utf-8')
+            logger.info(f"Received message on topic {topic} for zone_id {zone_id}")
 
             data = json.loads(payload_str)
             logger.debug("Successfully parsed JSON data.")
 
-            asyncio.run(process_sensor_data(zone_id, data))
+            # Chỉ đưa vào hàng đợi, việc xử lý diễn ra trong các worker của ingest
+            ingest_service.submit(zone_id, data)
         elif len(topic_parts) == 3 and topic_parts[0] == "ecohub" and topic_parts[2] == "command_feedback":
             zone_id = topic_parts[1]
-            payload_str = msg.payload.decode('utf-8')
+            payload_str = payload.decode('utf-8')
             logger.info(f"Received COMMAND FEEDBACK from zone '{zone_id}': {payload_str}")
             
             if payload_str.startswith("COMPLETED:"):
                 completed_command = payload_str.split(":", 1)[1]
                 # Gọi hàm để gửi tín hiệu hoàn thành lên cho frontend
-                publish_completion_notification(zone_id, completed_command)
+                await publish_completion_notification(zone_id, completed_command)
         else:
-            logger.warning(f"Received message on an unhandled topic format: {msg.topic}")
+            logger.warning(f"Received message on an unhandled topic format: {topic}")
 
     except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON from payload: {msg.payload.decode()}")
+        logger.error(f"Failed to decode JSON from payload: {payload.decode(errors='replace')}")
     except Exception as e:
         logger.error(f"An error occurred in on_message: {e}", exc_info=True)
 
-mqtt_client.on_connect = on_connect
-mqtt_client.on_message = on_message
-
+mqtt_transport.set_connect_handler(on_connect)
+mqtt_transport.set_message_handler(on_message)
 
-    
-def connect_mqtt():
-    """Connect to the MQTT broker."""
+async def start_mqtt_service():
+    """Connect the MQTT transport; its network loop runs without blocking the application."""
     try:
-        logger.info("Connecting to MQTT broker...")
-        mqtt_client.connect(settings.mqtt_broker_host, settings.mqtt_port, 60)
-    except Exception as e:
-        logger.error(f"Could not connect to MQTT broker: {e}")
-
-def start_mqtt_service():
-    """Start the MQTT client loop in a non-blocking way."""
-    try:
-        # Gán các hàm callback cho client
-        mqtt_client.on_connect = on_connect
-        mqtt_client.on_message = on_message
-        
-        # Set the MQTT client reference in command service
-        set_mqtt_client(mqtt_client)
+        # Set the MQTT transport reference in command service
+        set_mqtt_transport(mqtt_transport)
         
         logger.info("Connecting to MQTT broker...")
-        mqtt_client.connect(settings.mqtt_broker_host, settings.mqtt_port, 60)
-        
-        # Bắt đầu vòng lặp trong một luồng riêng để không block chương trình chính
-        mqtt_client.loop_start()
-        logger.info("MQTT service started and loop is running.")
+        await mqtt_transport.connect(settings.mqtt_broker_host, settings.mqtt_port, 60)
+        logger.info(f"MQTT service started ({mqtt_transport.name} transport).")
     except Exception as e:
         logger.error(f"Could not start MQTT service: {e}")
 
-def stop_mqtt_service():
+async def stop_mqtt_service():
     """Hàm để dừng service MQTT một cách an toàn."""
     try:
-        mqtt_client.loop_stop()
-        mqtt_client.disconnect()
+        await mqtt_transport.disconnect()
         logger.info("MQTT service stopped.")
     except Exception as e:
         logger.error(f"Error stopping MQTT service: {e}")
-
-def stop_mqtt_loop():
-    """Stop the MQTT client loop."""
-    mqtt_client.loop_stop()
-    mqtt_client.disconnect()
-
-    logger.info("MQTT service stopped.")
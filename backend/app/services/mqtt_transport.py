@@ -0,0 +1,164 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Set, Union
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MessageHandler = Callable[[str, bytes], Awaitable[None]]
+ConnectHandler = Callable[[], None]
+Payload = Union[str, bytes]
+
+
+class MqttTransport:
+    """
+    Common interface of the MQTT client backends.
+
+    Handlers are always invoked on the application event loop, whatever the
+    backend, so the rest of the code never has to care about threads.
+    """
+
+    name = "base"
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.message_handler: Optional[MessageHandler] = None
+        self.connect_handler: Optional[ConnectHandler] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def set_message_handler(self, handler: MessageHandler):
+        self.message_handler = handler
+
+    def set_connect_handler(self, handler: ConnectHandler):
+        self.connect_handler = handler
+
+    async def connect(self, host: str, port: int, keepalive: int = 60):
+        raise NotImplementedError
+
+    async def disconnect(self):
+        raise NotImplementedError
+
+    def subscribe(self, topic: str, qos: int = 0):
+        raise NotImplementedError
+
+    async def publish(self, topic: str, payload: Payload, qos: int = 0) -> bool:
+        raise NotImplementedError
+
+    def _dispatch_message(self, topic: str, payload: bytes):
+        """Run the message handler as a task on the loop (keeps a reference until done)."""
+        if not self.message_handler:
+            return
+        task = asyncio.ensure_future(self.message_handler(topic, payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class PahoTransport(MqttTransport):
+    """paho-mqtt backend: the network loop runs in a background thread (loop_start)."""
+
+    name = "paho"
+
+    def __init__(self, client_id: str):
+        super().__init__(client_id)
+        import paho.mqtt.client as mqtt
+
+        self._mqtt = mqtt
+        self.client = mqtt.Client(client_id=client_id,
+                                  callback_api_version=mqtt.CallbackAPIVersion.VERSION1)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.error(f"Failed to connect to MQTT Broker, return code {rc}")
+            return
+        if self.connect_handler and self.loop:
+            self.loop.call_soon_threadsafe(self.connect_handler)
+
+    def _on_message(self, client, userdata, msg):
+        # Chạy trên luồng mạng của paho: chỉ chuyển message sang event loop
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._dispatch_message, msg.topic, msg.payload)
+
+    async def connect(self, host: str, port: int, keepalive: int = 60):
+        self.loop = asyncio.get_running_loop()
+        await asyncio.to_thread(self.client.connect, host, port, keepalive)
+        self.client.loop_start()
+
+    async def disconnect(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def subscribe(self, topic: str, qos: int = 0):
+        self.client.subscribe(topic, qos=qos)
+
+    async def publish(self, topic: str, payload: Payload, qos: int = 0) -> bool:
+        result = self.client.publish(topic, payload, qos=qos)
+        if result.rc != self._mqtt.MQTT_ERR_SUCCESS:
+            logger.error(f"Failed to publish to '{topic}'. RC: {result.rc}")
+            return False
+        return True
+
+
+class GmqttTransport(MqttTransport):
+    """gmqtt backend: the client runs natively on the application event loop."""
+
+    name = "gmqtt"
+
+    def __init__(self, client_id: str):
+        super().__init__(client_id)
+        from gmqtt import Client as GmqttClient
+
+        self.client = GmqttClient(client_id)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.on_disconnect = self._on_disconnect
+
+    def _on_connect(self, client, flags, rc, properties):
+        if rc != 0:
+            logger.error(f"Failed to connect to MQTT Broker, return code {rc}")
+            return
+        if self.connect_handler:
+            self.connect_handler()
+
+    def _on_message(self, client, topic, payload, qos, properties):
+        self._dispatch_message(topic, payload)
+        return 0
+
+    def _on_disconnect(self, client, packet, exc=None):
+        logger.warning(f"Disconnected from MQTT Broker: {exc}" if exc else "Disconnected from MQTT Broker")
+
+    async def connect(self, host: str, port: int, keepalive: int = 60):
+        from gmqtt.mqtt.constants import MQTTv311
+
+        self.loop = asyncio.get_running_loop()
+        await self.client.connect(host, port, keepalive=keepalive, version=MQTTv311)
+
+    async def disconnect(self):
+        await self.client.disconnect()
+
+    def subscribe(self, topic: str, qos: int = 0):
+        self.client.subscribe(topic, qos=qos)
+
+    async def publish(self, topic: str, payload: Payload, qos: int = 0) -> bool:
+        if not self.client.is_connected:
+            logger.error(f"Failed to publish to '{topic}': MQTT client not connected")
+            return False
+        self.client.publish(topic, payload, qos=qos)
+        return True
+
+
+TRANSPORTS = {
+    PahoTransport.name: PahoTransport,
+    GmqttTransport.name: GmqttTransport,
+}
+
+
+def create_mqtt_transport(kind: str, client_id: str) -> MqttTransport:
+    """Create the MQTT transport selected by the MQTT_TRANSPORT setting."""
+    transport_class = TRANSPORTS.get((kind or "").lower())
+    if not transport_class:
+        raise ValueError(f"Unknown MQTT transport '{kind}'. Valid transports are: {list(TRANSPORTS)}")
+    logger.info(f"Using MQTT transport: {transport_class.name}")
+    return transport_class(client_id)
@@ -0,0 +1,200 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.database import db
+from app.services.firestore_stream import stream_dicts
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class NotificationRateLimiter:
+    """
+    Sliding-window limit of notification emails per user (maxPerHour / maxPerDay).
+
+    Send times of the last 24 hours are kept in memory per uid. Notifications
+    over the limit are not dropped: they are kept as deferred items to be
+    rolled into the user's next digest email. The state is checkpointed to
+    Firestore every rate_limit_checkpoint_interval seconds, not per send.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "notification_rate_limits",
+        checkpoint_interval: float = settings.rate_limit_checkpoint_interval,
+        max_deferred: int = settings.rate_limit_max_deferred,
+    ):
+        self.collection = db.collection(collection_name)
+        self.checkpoint_interval = checkpoint_interval
+        self.max_deferred = max_deferred
+
+        self.sent: Dict[str, Deque[datetime]] = {}
+        self.deferred: Dict[str, List[Dict[str, Any]]] = {}
+        self.dirty = set()
+        self.running = False
+        self._checkpoint_task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.allowed = 0
+        self.rejected = 0
+        self.deferred_dropped = 0
+
+    async def start(self):
+        """Load the last checkpoint and start checkpointing periodically."""
+        if self.running:
+            return
+        await self._load()
+        self.running = True
+        self._checkpoint_task = asyncio.create_task(self._checkpoint_loop(), name="rate-limit-checkpoint")
+        logger.info(f"Notification rate limiter started ({len(self.sent)} user(s) restored)")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self._checkpoint_task:
+            self._checkpoint_task.cancel()
+            await asyncio.gather(self._checkpoint_task, return_exceptions=True)
+        await self.checkpoint()
+        logger.info("Notification rate limiter stopped.")
+
+    def try_acquire(self, uid: str, max_per_hour: int, max_per_day: int, notification: Dict[str, Any],
+                    now: Optional[datetime] = None) -> bool:
+        """
+        Reserve one email for a user. When a limit is reached the notification is
+        deferred to the digest and False is returned.
+        """
+        now = now or datetime.utcnow()
+        window = self.sent.setdefault(uid, deque())
+        while window and now - window[0] >= DAY:
+            window.popleft()
+
+        sent_last_hour = sum(1 for sent_at in reversed(window) if now - sent_at < HOUR) if max_per_hour else 0
+        over_hour = bool(max_per_hour) and sent_last_hour >= max_per_hour
+        over_day = bool(max_per_day) and len(window) >= max_per_day
+        self.dirty.add(uid)
+
+        if over_hour or over_day:
+            self.rejected += 1
+            self._defer(uid, notification, now)
+            logger.info(f"Rate limit reached for user {uid} ({sent_last_hour}/{max_per_hour} per hour, "
+                        f"{len(window)}/{max_per_day} per day), notification deferred to digest")
+            return False
+
+        window.append(now)
+        self.allowed += 1
+        return True
+
+    def release(self, uid: str, at: datetime):
+        """Give back a reservation whose email could not be sent (it will be retried)."""
+        window = self.sent.get(uid)
+        if window and at in window:
+            window.remove(at)
+            self.dirty.add(uid)
+
+    def record_send(self, uid: str, now: Optional[datetime] = None):
+        """Count an email that is not subject to the limit (the digest that carries deferred notifications)."""
+        self.sent.setdefault(uid, deque()).append(now or datetime.utcnow())
+        self.dirty.add(uid)
+
+    def next_allowed_at(self, uid: str, max_per_hour: int, max_per_day: int, now: Optional[datetime] = None) -> datetime:
+        """Return the earliest time the user may receive an email again."""
+        now = now or datetime.utcnow()
+        window = list(self.sent.get(uid) or [])
+        candidates = [now]
+        if max_per_hour:
+            last_hour = [sent_at for sent_at in window if now - sent_at < HOUR]
+            if len(last_hour) >= max_per_hour:
+                candidates.append(last_hour[-max_per_hour] + HOUR)
+        if max_per_day and len(window) >= max_per_day:
+            candidates.append(window[-max_per_day] + DAY)
+        return max(candidates)
+
+    def take_deferred(self, uid: str) -> List[Dict[str, Any]]:
+        """Return and clear the notifications deferred for a user (for the digest)."""
+        items = self.deferred.pop(uid, [])
+        if items:
+            self.dirty.add(uid)
+        return items
+
+    def restore_deferred(self, uid: str, items: List[Dict[str, Any]]):
+        """Put back deferred notifications whose digest could not be sent."""
+        if not items:
+            return
+        merged = items + self.deferred.get(uid, [])
+        self.deferred[uid] = merged[-self.max_deferred:]
+        self.deferred_dropped += len(merged) - len(self.deferred[uid])
+        self.dirty.add(uid)
+
+    def _defer(self, uid: str, notification: Dict[str, Any], now: datetime):
+        items = self.deferred.setdefault(uid, [])
+        if len(items) >= self.max_deferred:
+            # Giữ các thông báo mới nhất
+            items.pop(0)
+            self.deferred_dropped += 1
+        items.append({**notification, "deferredAt": now})
+
+    async def _load(self):
+        try:
+            now = datetime.utcnow()
+            async for docs in stream_dicts(self.collection):
+                for data in docs:
+                    sent_at = sorted(_as_utc_naive(value) for value in data.get("sentAt") or [])
+                    self.sent[data["id"]] = deque(value for value in sent_at if now - value < DAY)
+                    if data.get("deferred"):
+                        self.deferred[data["id"]] = list(data["deferred"])[-self.max_deferred:]
+        except Exception as e:
+            logger.error(f"Error loading notification rate limits: {e}")
+
+    async def _checkpoint_loop(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            await self.checkpoint()
+
+    async def checkpoint(self):
+        """Write the windows and deferred items of every user changed since the last checkpoint."""
+        uids = list(self.dirty)
+        self.dirty.clear()
+        for start in range(0, len(uids), FIRESTORE_BATCH_LIMIT):
+            chunk = uids[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = db.batch()
+            for uid in chunk:
+                batch.set(self.collection.document(uid), {
+                    "sentAt": list(self.sent.get(uid, [])),
+                    "deferred": self.deferred.get(uid, []),
+                    "updatedAt": datetime.utcnow(),
+                })
+            try:
+                await run_in_threadpool(batch.commit)
+            except Exception as e:
+                logger.error(f"Error checkpointing rate limits of {len(chunk)} user(s): {e}")
+                self.dirty.update(chunk)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return allowed/rejected counters."""
+        return {
+            "users": len(self.sent),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "deferredPending": sum(len(items) for items in self.deferred.values()),
+            "deferredDropped": self.deferred_dropped,
+        }
+
+
+# Global notification rate limiter instance
+notification_rate_limiter = NotificationRateLimiter()
@@ -1,13 +1,20 @@
 import asyncio
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from fastapi.concurrency import run_in_threadpool
+from app.config import settings
 from app.services.email_service import email_service
+from app.services.email_outbox import email_outbox
 from app.services.database import db
+from app.services.notification_rate_limiter import notification_rate_limiter
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Loại job trong email outbox: một email tổng hợp cho mỗi người dùng mỗi cửa sổ thời gian
+DIGEST_EMAIL_JOB = "alert_digest"
+
 class NotificationService:
     """Service for managing and sending notifications to users."""
     
@@ -114,9 +121,14 @@ class NotificationService:
     async def should_send_email_notification(
         self, 
         user: Dict[str, Any], 
-        notification: Dict[str, Any]
+        notification: Dict[str, Any],
+        now: Optional[datetime] = None
     ) -> bool:
-        """Determine if an email notification should be sent to a user."""
+        """
+        Determine if an email notification should be sent to a user.
+        When it should, one email is reserved in the user's rate limit at `now`
+        (pass the same time to notification_rate_limiter.release if the send fails).
+        """
         try:
             user_email = user.get("email", "unknown")
             user_uid = user.get("uid", "unknown")
@@ -150,14 +162,25 @@ class NotificationService:
                     logger.info(f"🚫 SEVERITY TOO LOW - User: {user_email}, Alert: {severity}, User Min: {min_severity}")
                     return False
             
+            # Digest delivery: collect the alert into the user's next digest email
+            if self.wants_digest(preferences, severity):
+                await self.queue_digest(user, notification)
+                logger.info(f"📥 QUEUED FOR DIGEST - User: {user_email}, Window: {self.digest_window_minutes(preferences)} min")
+                return False
+            
             # Check frequency limits (prevent spam)
             max_per_hour = preferences.get("maxPerHour", 10)
             max_per_day = preferences.get("maxPerDay", 50)
             
             logger.debug(f"⏰ RATE LIMIT CHECK - User: {user_email}, Max/Hour: {max_per_hour}, Max/Day: {max_per_day}")
             
-            # For now, we'll allow all notifications
-            # In a production app, you'd implement proper rate limiting here
+            # Over the limit: the notification is deferred to a digest sent once the limit allows it
+            if not notification_rate_limiter.try_acquire(user_uid, max_per_hour, max_per_day, notification, now=now):
+                next_allowed_at = notification_rate_limiter.next_allowed_at(user_uid, max_per_hour, max_per_day)
+                delay = (next_allowed_at - datetime.utcnow()).total_seconds()
+                await self.queue_digest(user, None, due_at=time.time() + max(0.0, delay))
+                logger.info(f"⏳ RATE LIMITED - User: {user_email}, Notification deferred to digest at {next_allowed_at}")
+                return False
             
             logger.info(f"✅ USER ELIGIBLE - User: {user_email}, Will receive email notification")
             return True
@@ -167,6 +190,73 @@ class NotificationService:
             logger.exception(f"Full error details for user {user.get('uid', 'unknown')}:")
             return True  # Default to sending if there's an error
     
+    def digest_window_minutes(self, preferences: Dict[str, Any]) -> int:
+        """Return the digest window of a user, in minutes."""
+        return preferences.get("digestWindowMinutes") or settings.digest_window_minutes
+
+    def wants_digest(self, preferences: Dict[str, Any], severity: str) -> bool:
+        """Whether an alert of this severity goes into the user's digest instead of its own email."""
+        if preferences.get("delivery", "immediate") != "digest":
+            return False
+        if severity == "critical" and preferences.get("criticalBypassDigest", True):
+            return False
+        return True
+
+    async def queue_digest(
+        self,
+        user: Dict[str, Any],
+        notification: Optional[Dict[str, Any]],
+        due_at: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        Add an alert to the user's pending digest in the email outbox. The first
+        alert opens the window; the digest is sent when it closes.
+        """
+        preferences = user.get("notificationPreferences") or {}
+        if due_at is None:
+            due_at = time.time() + self.digest_window_minutes(preferences) * 60
+        item = None
+        if notification is not None:
+            item = {
+                "zoneId": notification.get("zoneId"),
+                "zoneName": notification.get("zoneName") or notification.get("zoneId"),
+                "type": notification.get("type", "System Alert"),
+                "message": notification.get("message", ""),
+                "suggestion": notification.get("suggestion", ""),
+                "severity": notification.get("severity", "info"),
+                "timestamp": notification.get("timestamp") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        return await email_outbox.enqueue_grouped(
+            DIGEST_EMAIL_JOB,
+            user["uid"],
+            {"uid": user["uid"], "email": user.get("email"), "displayName": user.get("displayName", "User")},
+            item,
+            due_at,
+        )
+
+    async def deliver_digest_email(self, job: Dict[str, Any]) -> bool:
+        """
+        Email outbox handler: send one digest with the collected alerts and the
+        notifications deferred by the rate limiter. Returns False to retry.
+        """
+        uid = job["uid"]
+        deferred = notification_rate_limiter.take_deferred(uid)
+        items = list(job.get("items") or []) + [
+            {**item, "zoneName": item.get("zoneName") or item.get("zoneId")} for item in deferred
+        ]
+        if not items:
+            return True
+
+        logger.info(f"📧 SENDING DIGEST EMAIL - Recipient: {job.get('email')}, Alerts: {len(items)}")
+        success = await email_service.send_digest_email(job.get("email"), job.get("displayName"), items)
+        if success:
+            notification_rate_limiter.record_send(uid)
+            logger.info(f"✅ DIGEST EMAIL SENT - Recipient: {job.get('email')}, Alerts: {len(items)}")
+        else:
+            notification_rate_limiter.restore_deferred(uid, deferred)
+            logger.error(f"❌ DIGEST EMAIL FAILED - Recipient: {job.get('email')}")
+        return success
+
     async def send_notification_emails(
         self, 
         zone_id: str, 
@@ -188,7 +278,7 @@ class NotificationService:
             # Filter users who should receive notifications
             eligible_users = []
             for user in users:
-                should_send = await self.should_send_email_notification(user, notification)
+                should_send = await self.should_send_email_notification(user, {**notification, "zoneId": zone_id})
                 logger.debug(f"🔍 USER ELIGIBILITY CHECK - User: {user.get('email')}, Zone: {zone_id}, Eligible: {should_send}")
                 if should_send:
                     eligible_users.append(user)
@@ -333,3 +423,5 @@ class NotificationService:
 
 # Global notification service instance
 notification_service = NotificationService()
+
+email_outbox.register_handler(DIGEST_EMAIL_JOB, notification_service.deliver_digest_email)
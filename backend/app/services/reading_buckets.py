@@ -0,0 +1,284 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import firestore
+
+from app.config import settings
+from app.services.database import db
+from app.services.scheduler_service import apscheduler_service
+from app.utils import gorilla
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Cách lưu readings: "documents" (một document mỗi giá trị, collection readings_history)
+# hoặc "buckets" (một document mỗi zone / loại đo / giờ, collection readings_buckets)
+DOCUMENT_LAYOUT = "documents"
+BUCKET_LAYOUT = "buckets"
+
+# Cách mã hóa mẫu trong một bucket: mảng offsets / values / sensorIndexes,
+# hoặc một chuỗi nén Gorilla (kiểu bytes) cho mỗi sensor
+ARRAY_ENCODING = "arrays"
+GORILLA_ENCODING = "gorilla"
+
+BUCKETS_COLLECTION = "readings_buckets"
+BUCKET_SECONDS = 3600
+# Số bucket được cập nhật trong một transaction
+BUCKET_TRANSACTION_SIZE = 100
+BUCKET_JOB_ID = "readings-bucket-flush"
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# (zoneId, type, bucket start in epoch seconds)
+BucketKey = Tuple[str, str, int]
+# (offset in milliseconds from the bucket start, value, sensorId)
+Sample = Tuple[int, float, str]
+
+
+def as_utc(value: datetime) -> datetime:
+    """Timezone-aware UTC datetime (naive datetimes are taken as UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def epoch_seconds(value: datetime) -> float:
+    return (as_utc(value) - _EPOCH_UTC).total_seconds()
+
+
+def bucket_start(value: datetime) -> int:
+    """Epoch second of the start of the hour containing `value` (UTC)."""
+    epoch = int(epoch_seconds(value))
+    return epoch - epoch % BUCKET_SECONDS
+
+
+def locate(read_at: datetime) -> Tuple[int, int]:
+    """(bucket start in epoch seconds, offset in milliseconds within the bucket) of a reading."""
+    start = bucket_start(read_at)
+    return start, (as_utc(read_at) - _EPOCH_UTC - timedelta(seconds=start)) // timedelta(milliseconds=1)
+
+
+def bucket_id(key: BucketKey) -> str:
+    zone_id, reading_type, start = key
+    return f"{zone_id}_{reading_type}_{start}"
+
+
+def reading_id(doc_id: str, offset: int, sensor_id: str) -> str:
+    """Stable id of one reading stored in a bucket (used by pagination cursors)."""
+    return f"{doc_id}:{offset}:{sensor_id}"
+
+
+def decode_bucket(data: Dict[str, Any], sensor_id: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (offsets, values, sensor indexes) of a bucket document in either encoding,
+    sorted by offset. With sensor_id only that sensor's samples are decoded.
+    """
+    sensors = data.get("sensors", [])
+    wanted = range(len(sensors))
+    if sensor_id is not None:
+        wanted = [sensors.index(sensor_id)] if sensor_id in sensors else []
+
+    if data.get("encoding") == GORILLA_ENCODING:
+        payloads = data.get("payloads", [])
+        parts = [(gorilla.decode(payloads[index]), index) for index in wanted]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+        offsets = np.concatenate([part_offsets for (part_offsets, _), _ in parts])
+        values = np.concatenate([part_values for (_, part_values), _ in parts])
+        indexes = np.concatenate([np.full(len(part_offsets), index) for (part_offsets, _), index in parts])
+        if len(parts) > 1:
+            order = np.argsort(offsets, kind="stable")
+            offsets, values, indexes = offsets[order], values[order], indexes[order]
+        return offsets, values, indexes
+
+    offsets = np.asarray(data.get("offsets", []), dtype=np.int64)
+    values = np.asarray(data.get("values", []), dtype=np.float64)
+    indexes = np.asarray(data.get("sensorIndexes", []), dtype=np.int64)
+    if sensor_id is not None:
+        mask = np.isin(indexes, list(wanted))
+        offsets, values, indexes = offsets[mask], values[mask], indexes[mask]
+    return offsets, values, indexes
+
+
+def merge_samples(
+    current: Optional[Dict[str, Any]],
+    samples: Iterable[Sample],
+    encoding: str = settings.reading_bucket_encoding,
+) -> Dict[str, Any]:
+    """
+    Add samples to a bucket document, re-encoded with `encoding` whatever the
+    encoding it was stored with. Samples stay sorted by offset, and a sample
+    already stored for the same sensor at the same millisecond is skipped, so
+    merging the same samples twice (a retried flush, a re-run migration)
+    changes nothing.
+    """
+    current = current or {}
+    sensors: List[str] = list(current.get("sensors", []))
+    offsets, values, indexes = decode_bucket(current) if current else ([], [], [])
+    existing = list(zip(
+        np.asarray(offsets).tolist(), np.asarray(values).tolist(), np.asarray(indexes).tolist()
+    ))
+    seen = {(offset, index) for offset, _, index in existing}
+    for offset, value, sensor_id in samples:
+        if sensor_id not in sensors:
+            sensors.append(sensor_id)
+        index = sensors.index(sensor_id)
+        if (offset, index) in seen:
+            continue
+        seen.add((offset, index))
+        existing.append((offset, value, index))
+
+    existing.sort(key=lambda sample: (sample[0], sample[2]))
+    if encoding == GORILLA_ENCODING:
+        # Một chuỗi nén cho mỗi sensor: các giá trị liên tiếp của cùng sensor nén tốt nhất
+        payloads = []
+        for index in range(len(sensors)):
+            series = [(offset, value) for offset, value, sample_index in existing if sample_index == index]
+            payloads.append(gorilla.encode([offset for offset, _ in series], [value for _, value in series]))
+        return {
+            "encoding": GORILLA_ENCODING,
+            "sensors": sensors,
+            "payloads": payloads,
+            "count": len(existing),
+        }
+    return {
+        "encoding": ARRAY_ENCODING,
+        "sensors": sensors,
+        "offsets": [offset for offset, _, _ in existing],
+        "values": [value for _, value, _ in existing],
+        "sensorIndexes": [index for _, _, index in existing],
+        "count": len(existing),
+    }
+
+
+def expand_bucket(doc_id: str, data: Dict[str, Any], sensor_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Bucket document -> reading dicts shaped like readings_history documents, oldest first."""
+    start = as_utc(data["bucketStart"])
+    sensors = data.get("sensors", [])
+    offsets, values, indexes = decode_bucket(data, sensor_id)
+    readings = []
+    for offset, value, index in zip(offsets.tolist(), values.tolist(), indexes.tolist()):
+        readings.append({
+            "id": reading_id(doc_id, offset, sensors[index]),
+            "readAt": start + timedelta(milliseconds=offset),
+            "sensorId": sensors[index],
+            "type": data["type"],
+            "value": value,
+            "zoneId": data["zoneId"],
+        })
+    return readings
+
+
+@firestore.transactional
+def _merge_in_transaction(transaction, refs: List[Any], fields: List[Dict[str, Any]], samples: List[List[Sample]]):
+    snapshots = {snapshot.reference.id: snapshot for snapshot in transaction.get_all(refs)}
+    now = datetime.utcnow()
+    for ref, bucket_fields, bucket_samples in zip(refs, fields, samples):
+        snapshot = snapshots.get(ref.id)
+        current = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+        transaction.set(ref, {**bucket_fields, **merge_samples(current, bucket_samples), "updatedAt": now})
+
+
+def write_buckets(collection, pending: Dict[BucketKey, List[Sample]]) -> int:
+    """
+    Merge samples into their bucket documents, BUCKET_TRANSACTION_SIZE buckets
+    per transaction (blocking; call from a worker thread). Returns the number of
+    buckets written; raises on the first failed transaction.
+    """
+    keys = list(pending)
+    for offset in range(0, len(keys), BUCKET_TRANSACTION_SIZE):
+        chunk = keys[offset:offset + BUCKET_TRANSACTION_SIZE]
+        refs = [collection.document(bucket_id(key)) for key in chunk]
+        fields = [
+            {"zoneId": zone_id, "type": reading_type, "bucketStart": _EPOCH + timedelta(seconds=start)}
+            for zone_id, reading_type, start in chunk
+        ]
+        _merge_in_transaction(db.transaction(), refs, fields, [pending[key] for key in chunk])
+    return len(keys)
+
+
+class ReadingBucketWriter:
+    """
+    Write path of the bucket layout: readings are appended to one document
+    per zone, type and UTC hour, as millisecond offsets and values encoded
+    with reading_bucket_encoding (Gorilla-compressed bytes by default).
+
+    Readings are buffered in memory and merged into their bucket documents by
+    an APScheduler job every reading_bucket_flush_interval seconds, so a zone
+    sending every few seconds costs one write per type per flush instead of
+    one document per reading.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = BUCKETS_COLLECTION,
+        flush_interval: float = settings.reading_bucket_flush_interval,
+    ):
+        self.collection = db.collection(collection_name)
+        self.flush_interval = flush_interval
+        self.pending: Dict[BucketKey, List[Sample]] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Counters
+        self.readings_added = 0
+        self.readings_written = 0
+        self.buckets_written = 0
+        self.failed_flushes = 0
+
+    def start(self):
+        """Register the periodic flush job."""
+        self._flush_lock = asyncio.Lock()
+        apscheduler_service.add_system_interval_job(BUCKET_JOB_ID, self.flush, self.flush_interval, name="Readings bucket flush")
+        logger.info(f"Reading bucket writer started (flush every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Write the buffered readings."""
+        await self.flush()
+        logger.info(f"Reading bucket writer stopped, {self.readings_written} reading(s) written.")
+
+    def add(self, zone_id: str, reading_type: str, read_at: datetime, value: float, sensor_id: str) -> str:
+        """Buffer one reading. Returns the id it will have once written."""
+        start, offset = locate(read_at)
+        key = (zone_id, reading_type, start)
+        self.pending.setdefault(key, []).append((offset, value, sensor_id))
+        self.readings_added += 1
+        return reading_id(bucket_id(key), offset, sensor_id)
+
+    async def flush(self):
+        """Merge the buffered readings into their bucket documents."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            pending, self.pending = self.pending, {}
+            if not pending:
+                return
+            readings = sum(len(samples) for samples in pending.values())
+            try:
+                self.buckets_written += await run_in_threadpool(write_buckets, self.collection, pending)
+                self.readings_written += readings
+            except Exception as e:
+                # Ghi lại toàn bộ ở lần sau: merge_samples bỏ qua các giá trị đã được ghi
+                self.failed_flushes += 1
+                logger.error(f"Error writing {readings} reading(s) to {len(pending)} bucket(s): {e}")
+                for key, samples in pending.items():
+                    self.pending.setdefault(key, []).extend(samples)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return reading/bucket counters."""
+        return {
+            "layout": settings.reading_storage_layout,
+            "encoding": settings.reading_bucket_encoding,
+            "bufferedReadings": sum(len(samples) for samples in self.pending.values()),
+            "readingsAdded": self.readings_added,
+            "readingsWritten": self.readings_written,
+            "bucketsWritten": self.buckets_written,
+            "failedFlushes": self.failed_flushes,
+        }
+
+
+# Global reading bucket writer instance
+reading_bucket_writer = ReadingBucketWriter()
@@ -0,0 +1,201 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_DEADBAND = "deadband"
+COMPRESSION_SWINGING_DOOR = "swinging_door"
+COMPRESSION_MODES = (COMPRESSION_NONE, COMPRESSION_DEADBAND, COMPRESSION_SWINGING_DOOR)
+
+# Độ lệch mặc định cho từng loại đo, gần với độ phân giải thực tế của cảm biến
+DEFAULT_DEADBANDS = {
+    "temperature": 0.1,
+    "airHumidity": 0.5,
+    "soilMoisture": 0.5,
+    "lightIntensity": 10.0,
+    "co2": 10.0,
+    "ph": 0.05,
+}
+
+# (thời điểm, giá trị, sensorId)
+Point = Tuple[datetime, float, Optional[str]]
+
+
+def resolve_storage_policy(zone: Optional[Dict[str, Any]], crop_profile: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the effective storage policy of a zone, per reading type.
+    Zone settings override the crop profile, which overrides the defaults.
+    """
+    policy = {
+        reading_type: {
+            "mode": settings.storage_compression,
+            "deadband": deadband,
+            "heartbeatSeconds": settings.storage_heartbeat_seconds,
+        }
+        for reading_type, deadband in DEFAULT_DEADBANDS.items()
+    }
+
+    for source in (crop_profile, zone):
+        overrides = (source or {}).get("storagePolicy") or {}
+        for reading_type, setting in overrides.items():
+            if not setting:
+                continue
+            merged = dict(policy.get(reading_type) or {
+                "mode": settings.storage_compression,
+                "deadband": 0.0,
+                "heartbeatSeconds": settings.storage_heartbeat_seconds,
+            })
+            merged.update({key: value for key, value in setting.items() if value is not None})
+            policy[reading_type] = merged
+    return policy
+
+
+class _SeriesState:
+    """Compression state of one (zone, reading type) series."""
+
+    __slots__ = ("archived", "last", "slope_upper", "slope_lower")
+
+    def __init__(self, point: Point):
+        self.archived: Point = point
+        self.last: Optional[Point] = None
+        self.slope_upper = float("-inf")
+        self.slope_lower = float("inf")
+
+    def reset(self, point: Point):
+        self.archived = point
+        self.last = None
+        self.slope_upper = float("-inf")
+        self.slope_lower = float("inf")
+
+
+class ReadingCompressor:
+    """
+    Decides which sensor readings are worth persisting.
+
+    - deadband: a reading is stored when it moved more than `deadband` away from
+      the last stored value, or when `heartbeatSeconds` have passed.
+    - swinging_door: the last stored point and the tolerance `deadband` define a
+      corridor; while every new reading fits a straight line through it, nothing
+      is stored. When the corridor closes, the previous reading is stored (with
+      its own timestamp) so the trend is reconstructed by linear interpolation.
+    """
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, str], _SeriesState] = {}
+
+        # Counters
+        self.offered: Dict[str, int] = {}
+        self.persisted: Dict[str, int] = {}
+
+    def offer(self, zone_id: str, reading_type: str, timestamp: datetime, value: float,
+              sensor_id: Optional[str] = None, policy: Optional[Dict[str, Any]] = None) -> List[Point]:
+        """Feed one reading and return the points that must be persisted (possibly none)."""
+        self.offered[reading_type] = self.offered.get(reading_type, 0) + 1
+        point = (timestamp, value, sensor_id)
+        policy = policy or {}
+        mode = policy.get("mode", COMPRESSION_NONE)
+        deadband = float(policy.get("deadband") or 0.0)
+        heartbeat = float(policy.get("heartbeatSeconds") or 0.0)
+
+        key = (zone_id, reading_type)
+        state = self.series.get(key)
+        if mode not in (COMPRESSION_DEADBAND, COMPRESSION_SWINGING_DOOR) or state is None:
+            # Điểm đầu tiên của chuỗi (hoặc không nén) luôn được lưu
+            if mode in (COMPRESSION_DEADBAND, COMPRESSION_SWINGING_DOOR):
+                self.series[key] = _SeriesState(point)
+            else:
+                self.series.pop(key, None)
+            return self._persist(reading_type, [point])
+
+        heartbeat_due = bool(heartbeat) and (timestamp - state.archived[0]).total_seconds() >= heartbeat
+
+        if mode == COMPRESSION_DEADBAND:
+            if heartbeat_due or abs(value - state.archived[1]) > deadband:
+                state.reset(point)
+                return self._persist(reading_type, [point])
+            return []
+
+        stored = self._swinging_door(state, point, deadband)
+        if heartbeat_due and not stored:
+            # Heartbeat: lưu điểm hiện tại, các điểm đã bỏ qua vẫn nằm trong hành lang tới nó
+            state.reset(point)
+            stored.append(point)
+        return self._persist(reading_type, stored)
+
+    def _swinging_door(self, state: _SeriesState, point: Point, deviation: float) -> List[Point]:
+        archived_at, archived_value, _ = state.archived
+        elapsed = (point[0] - archived_at).total_seconds()
+        if elapsed <= 0:
+            # Cùng thời điểm với điểm đã lưu: chỉ lưu nếu vượt ngoài dung sai
+            if abs(point[1] - archived_value) > deviation:
+                state.reset(point)
+                return [point]
+            return []
+
+        # Độ dốc từ hai chốt cửa (điểm đã lưu ± dung sai) tới điểm mới
+        slope_upper = max(state.slope_upper, (point[1] - archived_value - deviation) / elapsed)
+        slope_lower = min(state.slope_lower, (point[1] - archived_value + deviation) / elapsed)
+
+        if slope_upper <= slope_lower:
+            state.slope_upper = slope_upper
+            state.slope_lower = slope_lower
+            state.last = point
+            return []
+
+        # Cửa đóng: lưu điểm trước đó và bắt đầu một đoạn mới từ nó
+        previous = state.last
+        if previous is None:
+            state.reset(point)
+            return [point]
+
+        state.reset(previous)
+        stored = [previous]
+        stored.extend(self._swinging_door(state, point, deviation))
+        return stored
+
+    def drain(self) -> List[Tuple[str, str, Point]]:
+        """Return the pending (not yet stored) last reading of every series, e.g. on shutdown."""
+        pending = []
+        for (zone_id, reading_type), state in self.series.items():
+            if state.last is not None:
+                pending.append((zone_id, reading_type, state.last))
+                state.reset(state.last)
+        for _zone_id, reading_type, _point in pending:
+            self.persisted[reading_type] = self.persisted.get(reading_type, 0) + 1
+        return pending
+
+    def forget(self, zone_id: str):
+        """Drop the state of every series of a zone."""
+        for key in [key for key in self.series if key[0] == zone_id]:
+            del self.series[key]
+
+    def _persist(self, reading_type: str, points: List[Point]) -> List[Point]:
+        if points:
+            self.persisted[reading_type] = self.persisted.get(reading_type, 0) + len(points)
+        return points
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return offered/persisted counters per reading type."""
+        offered = sum(self.offered.values())
+        persisted = sum(self.persisted.values())
+        return {
+            "series": len(self.series),
+            "offered": offered,
+            "persisted": persisted,
+            "compressionRatio": round(offered / persisted, 2) if persisted else 0.0,
+            "byType": {
+                reading_type: {
+                    "offered": count,
+                    "persisted": self.persisted.get(reading_type, 0),
+                }
+                for reading_type, count in self.offered.items()
+            },
+        }
+
+
+# Global reading compressor instance
+reading_compressor = ReadingCompressor()
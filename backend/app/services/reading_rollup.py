@@ -0,0 +1,342 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import firestore
+
+from app.config import settings
+from app.services.database import db
+from app.services.firestore_stream import fetch_dicts
+from app.services.scheduler_service import apscheduler_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Độ phân giải của rollup, từ thô đến mịn: tên -> số giây của một bucket
+RESOLUTIONS: Dict[str, int] = {
+    "1d": 86400,
+    "1h": 3600,
+    "1m": 60,
+}
+# Số bucket được cập nhật trong một transaction
+ROLLUP_TRANSACTION_SIZE = 100
+ROLLUP_JOB_ID = "readings-rollup-flush"
+# Số mã lần ghi gần nhất lưu trong mỗi bucket để bỏ qua một lần ghi lại trùng
+FLUSH_ID_HISTORY = 20
+
+_EPOCH = datetime(1970, 1, 1)
+
+# (zoneId, type, resolution, bucket start in epoch seconds)
+BucketKey = Tuple[str, str, str, int]
+
+
+def _as_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(at: datetime, seconds: int) -> int:
+    """Epoch second of the start of the bucket containing `at` (UTC aligned)."""
+    epoch = int((_as_utc_naive(at) - _EPOCH).total_seconds())
+    return epoch - epoch % seconds
+
+
+def new_aggregate(at: datetime, value: float) -> Dict[str, Any]:
+    return {
+        "count": 1,
+        "sum": value,
+        "min": value,
+        "max": value,
+        "first": value,
+        "firstAt": at,
+        "last": value,
+        "lastAt": at,
+    }
+
+
+def merge_aggregate(current: Optional[Dict[str, Any]], partial: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combine two aggregates of the same bucket. The result does not depend on
+    the order readings arrived in, so late readings update their bucket correctly.
+    """
+    if not current or not current.get("count"):
+        return dict(partial)
+    merged = dict(current)
+    merged["count"] = current["count"] + partial["count"]
+    merged["sum"] = current["sum"] + partial["sum"]
+    merged["min"] = min(current["min"], partial["min"])
+    merged["max"] = max(current["max"], partial["max"])
+    if _as_utc_naive(partial["firstAt"]) < _as_utc_naive(current["firstAt"]):
+        merged["first"], merged["firstAt"] = partial["first"], partial["firstAt"]
+    if _as_utc_naive(partial["lastAt"]) >= _as_utc_naive(current["lastAt"]):
+        merged["last"], merged["lastAt"] = partial["last"], partial["lastAt"]
+    return merged
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> Optional[str]:
+    """
+    Coarsest resolution that still yields at least max_points buckets over
+    [start, end), or None when only raw readings are fine enough.
+    """
+    span = (end - start).total_seconds()
+    for resolution, seconds in RESOLUTIONS.items():
+        if span / seconds >= max_points:
+            return resolution
+    return None
+
+
+@firestore.transactional
+def _merge_in_transaction(transaction, refs: List[Any], partials: List[Dict[str, Any]], flush_id: str):
+    snapshots = {snapshot.reference.id: snapshot for snapshot in transaction.get_all(refs)}
+    now = datetime.utcnow()
+    for ref, partial in zip(refs, partials):
+        snapshot = snapshots.get(ref.id)
+        current = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+        flush_ids = (current or {}).get("flushIds", [])
+        if flush_id in flush_ids:
+            # Lần ghi trước đã commit dù client báo lỗi: không cộng lại lần nữa
+            continue
+        merged = merge_aggregate(current, partial)
+        merged["flushIds"] = (flush_ids + [flush_id])[-FLUSH_ID_HISTORY:]
+        merged["updatedAt"] = now
+        transaction.set(ref, merged)
+
+
+@firestore.transactional
+def _claim_coverage(transaction, ref, data: Dict[str, Any]) -> datetime:
+    """Write the coverage start of a series unless it already has one; return the stored value."""
+    snapshot = ref.get(transaction=transaction)
+    if snapshot.exists:
+        return snapshot.to_dict()["coveredFrom"]
+    transaction.set(ref, data)
+    return data["coveredFrom"]
+
+
+class ReadingRollup:
+    """
+    Incremental 1-minute / 1-hour / 1-day aggregates of readings, per zone and type.
+
+    Every ingested reading (before storage compression) is added to in-memory
+    partial aggregates (count, sum, min, max, first, last). An APScheduler job
+    merges them into the readings_rollups documents every
+    rollup_flush_interval seconds, in transactions, so a reading arriving
+    after its bucket was already written is merged into it instead of
+    overwriting it.
+
+    Each transaction carries a flush id that the buckets remember; a chunk
+    whose commit failed is retried unchanged with the same id, so a commit
+    that succeeded although the client reported an error is not counted twice.
+
+    Rollups only contain readings ingested since they were introduced: the
+    coverage collection records, per zone and type, the time from which every
+    reading is accounted (set once, by the first process that rolled it up).
+    get_buckets returns None for a range starting earlier, and callers fall
+    back to raw readings.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "readings_rollups",
+        coverage_collection_name: str = "readings_rollup_coverage",
+        flush_interval: float = settings.rollup_flush_interval,
+    ):
+        self.collection = db.collection(collection_name)
+        self.coverage_collection = db.collection(coverage_collection_name)
+        self.flush_interval = flush_interval
+        self.pending: Dict[BucketKey, Dict[str, Any]] = {}
+        # Các chunk ghi lỗi: (flush id, keys, partials), ghi lại nguyên vẹn ở lần flush sau
+        self._retry: List[Tuple[str, List[BucketKey], List[Dict[str, Any]]]] = []
+        # Các chunk của lần flush đang chạy (chưa chắc đã commit)
+        self._flushing: List[Tuple[str, List[BucketKey], List[Dict[str, Any]]]] = []
+        # (zoneId, type) -> thời điểm tiến trình này bắt đầu tổng hợp chuỗi đó
+        self.observed_since: Dict[Tuple[str, str], datetime] = {}
+        # (zoneId, type) -> coveredFrom đã lưu trong Firestore
+        self.coverage: Dict[Tuple[str, str], datetime] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Counters
+        self.readings = 0
+        self.buckets_written = 0
+        self.transactions = 0
+        self.failed_transactions = 0
+        self.retried_transactions = 0
+
+    def start(self):
+        """Register the periodic flush job."""
+        self._flush_lock = asyncio.Lock()
+        apscheduler_service.add_system_interval_job(ROLLUP_JOB_ID, self.flush, self.flush_interval, name="Readings rollup flush")
+        logger.info(f"Reading rollup started (flush every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Write the remaining partial aggregates."""
+        await self.flush()
+        logger.info("Reading rollup stopped.")
+
+    def add(self, zone_id: str, reading_type: str, at: datetime, value: float):
+        """Account one reading in its 1m, 1h and 1d buckets."""
+        self.readings += 1
+        self.observed_since.setdefault((zone_id, reading_type), datetime.utcnow())
+        at = _as_utc_naive(at)
+        for resolution, seconds in RESOLUTIONS.items():
+            key = (zone_id, reading_type, resolution, bucket_start(at, seconds))
+            aggregate = self.pending.get(key)
+            if aggregate is None:
+                self.pending[key] = new_aggregate(at, value)
+            else:
+                self.pending[key] = merge_aggregate(aggregate, new_aggregate(at, value))
+
+    @staticmethod
+    def document_id(key: BucketKey) -> str:
+        zone_id, reading_type, resolution, start = key
+        return f"{zone_id}_{reading_type}_{resolution}_{start}"
+
+    @staticmethod
+    def coverage_id(zone_id: str, reading_type: str) -> str:
+        return f"{zone_id}_{reading_type}"
+
+    async def _write_chunk(self, flush_id: str, keys: List[BucketKey], partials: List[Dict[str, Any]]) -> bool:
+        refs = [self.collection.document(self.document_id(key)) for key in keys]
+        try:
+            await run_in_threadpool(_merge_in_transaction, db.transaction(), refs, partials, flush_id)
+            self.transactions += 1
+            self.buckets_written += len(keys)
+            return True
+        except Exception as e:
+            self.failed_transactions += 1
+            logger.error(f"Error writing {len(keys)} rollup bucket(s): {e}")
+            # Có thể đã được commit: giữ nguyên flush id để lần ghi lại không cộng trùng
+            self._retry.append((flush_id, keys, partials))
+            return False
+
+    async def _claim_coverages(self):
+        for (zone_id, reading_type), since in list(self.observed_since.items()):
+            if (zone_id, reading_type) in self.coverage:
+                continue
+            ref = self.coverage_collection.document(self.coverage_id(zone_id, reading_type))
+            data = {"zoneId": zone_id, "type": reading_type, "coveredFrom": since}
+            try:
+                covered_from = await run_in_threadpool(_claim_coverage, db.transaction(), ref, data)
+                self.coverage[(zone_id, reading_type)] = _as_utc_naive(covered_from)
+            except Exception as e:
+                logger.error(f"Error recording rollup coverage of zone {zone_id} ({reading_type}): {e}")
+
+    async def flush(self):
+        """Merge the pending partial aggregates into Firestore."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            retry, self._retry = self._retry, []
+            pending, self.pending = self.pending, {}
+            keys = list(pending)
+            chunks = list(retry)
+            for offset in range(0, len(keys), ROLLUP_TRANSACTION_SIZE):
+                chunk = keys[offset:offset + ROLLUP_TRANSACTION_SIZE]
+                partials = []
+                for key in chunk:
+                    zone_id, reading_type, resolution, start = key
+                    partials.append({
+                        **pending[key],
+                        "zoneId": zone_id,
+                        "type": reading_type,
+                        "resolution": resolution,
+                        "bucketStart": _EPOCH + timedelta(seconds=start),
+                    })
+                chunks.append((uuid.uuid4().hex, chunk, partials))
+
+            # get_buckets vẫn thấy các chunk này cho tới khi flush xong
+            self._flushing = chunks
+            try:
+                for index, (flush_id, chunk, partials) in enumerate(chunks):
+                    if index < len(retry):
+                        self.retried_transactions += 1
+                    await self._write_chunk(flush_id, chunk, partials)
+            finally:
+                self._flushing = []
+
+            await self._claim_coverages()
+
+    async def get_coverage(self, zone_id: str, reading_type: str) -> Optional[datetime]:
+        """Time (naive UTC) from which every reading of the series is in the rollups, None if unknown."""
+        key = (zone_id, reading_type)
+        if key in self.coverage:
+            return self.coverage[key]
+        try:
+            snapshot = await run_in_threadpool(self.coverage_collection.document(self.coverage_id(zone_id, reading_type)).get)
+        except Exception as e:
+            logger.error(f"Error loading rollup coverage of zone {zone_id} ({reading_type}): {e}")
+            return None
+        if snapshot.exists:
+            self.coverage[key] = _as_utc_naive(snapshot.to_dict()["coveredFrom"])
+            return self.coverage[key]
+        # Chưa flush lần nào: chỉ có những gì tiến trình này đã tổng hợp
+        return self.observed_since.get(key)
+
+    async def get_buckets(self, zone_id: str, reading_type: str, resolution: str,
+                          start: datetime, end: datetime) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the buckets of [start, end) at one resolution, oldest first,
+        including the partial aggregates not flushed yet or whose flush is
+        being written or awaiting a retry. None when the rollups do not cover
+        the whole range (or cannot be read): use raw readings.
+        """
+        seconds = RESOLUTIONS[resolution]
+        first_start = bucket_start(start, seconds)
+        first_bucket = _EPOCH + timedelta(seconds=first_start)
+        covered_from = await self.get_coverage(zone_id, reading_type)
+        if covered_from is None or first_bucket < covered_from:
+            return None
+        try:
+            query = self.collection.where(field_path='zoneId', op_string='==', value=zone_id)\
+                                   .where(field_path='type', op_string='==', value=reading_type)\
+                                   .where(field_path='resolution', op_string='==', value=resolution)\
+                                   .where(field_path='bucketStart', op_string='>=', value=first_bucket)\
+                                   .where(field_path='bucketStart', op_string='<', value=_as_utc_naive(end))\
+                                   .order_by('bucketStart')
+            stored = await fetch_dicts(query)
+        except Exception as e:
+            logger.error(f"Error loading {resolution} rollups of zone {zone_id} ({reading_type}): {e}")
+            return None
+
+        buckets = {bucket_start(bucket["bucketStart"], seconds): bucket for bucket in stored}
+        end_epoch = bucket_start(end, 1)
+        series = (zone_id, reading_type, resolution)
+
+        def merge_partial(key: BucketKey, partial: Dict[str, Any]):
+            start_epoch = key[3]
+            if key[:3] != series or not first_start <= start_epoch < end_epoch:
+                return
+            merged = merge_aggregate(buckets.get(start_epoch), partial)
+            merged["bucketStart"] = _EPOCH + timedelta(seconds=start_epoch)
+            buckets[start_epoch] = merged
+
+        # Chunk đang ghi hoặc chờ ghi lại: bỏ qua bucket đã có flush id của chunk (đã commit)
+        unconfirmed = {flush_id: (keys, partials) for flush_id, keys, partials in self._flushing + self._retry}
+        for flush_id, (keys, partials) in unconfirmed.items():
+            for key, partial in zip(keys, partials):
+                stored_bucket = buckets.get(key[3]) if key[:3] == series else None
+                if stored_bucket is None or flush_id not in stored_bucket.get("flushIds", []):
+                    merge_partial(key, partial)
+        # Các giá trị còn trong bộ nhớ (chưa tới lần flush kế tiếp)
+        for key, partial in self.pending.items():
+            merge_partial(key, partial)
+        return [buckets[key] for key in sorted(buckets)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return reading/bucket counters."""
+        return {
+            "readings": self.readings,
+            "pendingBuckets": len(self.pending),
+            "chunksAwaitingRetry": len(self._retry),
+            "bucketsWritten": self.buckets_written,
+            "transactions": self.transactions,
+            "failedTransactions": self.failed_transactions,
+            "retriedTransactions": self.retried_transactions,
+            "seriesCovered": len(self.coverage),
+        }
+
+
+# Global reading rollup instance
+reading_rollup = ReadingRollup()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.services.single_flight import SingleFlight
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CachedResponse:
+    """A rendered JSON body and its strong ETag (hash of the body bytes)."""
+
+    __slots__ = ("value", "body", "etag")
+
+    def __init__(self, value: Any, body: bytes):
+        self.value = value
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _render(content: Any) -> bytes:
+    # Cùng định dạng với JSONResponse của FastAPI
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match dùng so sánh yếu: bỏ tiền tố W/
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def cached_json_response(request: Request, entry: CachedResponse, status_code: int = 200) -> Response:
+    """
+    The cached body with its ETag, or an empty 304 when the client already has
+    this version (If-None-Match).
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Read-through cache of near-static documents, kept as rendered responses.
+
+    A miss loads the value (one Firestore read however many requests wait for
+    it) and renders it to JSON once; hits serve those bytes and their ETag
+    directly. The owning service invalidates entries from its create / update /
+    delete methods; `ttl` bounds staleness from writes made outside this
+    process. Every invalidation bumps `version`, so a load that was running
+    during an invalidation is not cached.
+    """
+
+    def __init__(self, name: str, ttl: float = settings.response_cache_ttl):
+        self.name = name
+        self.ttl = ttl
+        self.version = 0
+        # key -> (thời điểm hết hạn, response)
+        self.entries: Dict[Hashable, Tuple[float, CachedResponse]] = {}
+        self._loading = SingleFlight()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    async def get(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        render: Callable[[Any], Any] = lambda value: value,
+    ) -> Optional[CachedResponse]:
+        """
+        Return the cached response for `key`, calling `load()` on a miss and
+        caching `render(value)` as JSON. A None value (not found) is not cached.
+        """
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return await self._loading.run(key, lambda: self._load(key, load, render))
+
+    async def _load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        render: Callable[[Any], Any],
+    ) -> Optional[CachedResponse]:
+        version = self.version
+        self.loads += 1
+        value = await load()
+        response = CachedResponse(value, _render(render(value))) if value is not None else None
+        if response is not None and version == self.version:
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+        return response
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or every entry when key is None."""
+        self.invalidations += 1
+        self.version += 1
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+        self._loading.forget(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "ttlSeconds": self.ttl,
+            "version": self.version,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global response cache instances
+crop_profile_cache = ResponseCache("crop-profiles")
+zone_settings_cache = ResponseCache("zone-settings")
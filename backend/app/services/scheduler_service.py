@@ -4,6 +4,7 @@ from typing import Dict, List, Optional, Any
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.asyncio import AsyncIOExecutor
 
@@ -12,6 +13,8 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+SYSTEM_JOBSTORE = 'system'
+
 class APSchedulerService:
     """Service class for managing APScheduler operations."""
     
@@ -24,7 +27,9 @@ class APSchedulerService:
         try:
             # Configure job stores and executors
             jobstores = {
-                'default': MemoryJobStore()
+                'default': MemoryJobStore(),
+                # Job nội bộ (rollup, bảo trì): không bị xóa khi reload lịch của người dùng
+                SYSTEM_JOBSTORE: MemoryJobStore()
             }
             
             executors = {
@@ -70,6 +75,23 @@ class APSchedulerService:
         except Exception as e:
             logger.error(f"Failed to stop APScheduler: {str(e)}")
     
+    def add_system_interval_job(self, job_id: str, func, seconds: float, name: Optional[str] = None):
+        """Register an internal recurring job (never more than one run at a time)."""
+        try:
+            return self.scheduler.add_job(
+                func=func,
+                trigger=IntervalTrigger(seconds=seconds),
+                id=job_id,
+                name=name or job_id,
+                jobstore=SYSTEM_JOBSTORE,
+                coalesce=True,
+                max_instances=1,
+                replace_existing=True
+            )
+        except Exception as e:
+            logger.error(f"Error adding system job {job_id}: {str(e)}")
+            return None
+    
     async def create_schedule_job(self, schedule_data: Dict[str, Any]) -> bool:
         """Create a new scheduled job in APScheduler."""
         try:
@@ -139,12 +161,12 @@ class APSchedulerService:
     
     def _create_job_function(self, zone_id: str, device_id: str, command: str):
         """Create a job function that will be executed by APScheduler."""
-        def execute_scheduled_action():
+        async def execute_scheduled_action():
             try:
                 logger.info(f"Executing scheduled command: {command} for device {device_id} in zone {zone_id}")
                 
                 # Publish command to MQTT
-                success = publish_scheduled_command(zone_id, command)
+                success = await publish_scheduled_command(zone_id, command)
                 
                 if success:
                     logger.info(f"Scheduled command executed successfully: {command}")
@@ -333,8 +355,8 @@ class APSchedulerService:
         try:
             logger.info("Reloading schedules from Firestore...")
             
-            # Clear existing jobs
-            self.scheduler.remove_all_jobs()
+            # Clear existing jobs (user schedules only)
+            self.scheduler.remove_all_jobs(jobstore='default')
             logger.info("Cleared existing scheduled jobs")
             
             # If no schedules provided, skip reloading
@@ -373,7 +395,7 @@ class APSchedulerService:
         """Get information about all scheduled jobs."""
         try:
             jobs = []
-            for job in self.scheduler.get_jobs():
+            for job in self.scheduler.get_jobs(jobstore='default'):
                 jobs.append({
                     'id': job.id,
                     'name': job.name,
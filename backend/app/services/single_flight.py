@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    One in-progress call per key, shared by every concurrent caller.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it runs wait for its result or exception instead of starting their
+    own. If the leader is cancelled (client disconnect, shutdown), the
+    waiters are not left hanging: the next one retries the call as the new
+    leader.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+        # Counters
+        self.shared = 0
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of `call()`, or of the call already running for `key`."""
+        while True:
+            pending = self._calls.get(key)
+            if pending is None:
+                break
+            self.shared += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Chính request này bị hủy, không phải leader
+                if not pending.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await call()
+        except Exception as e:
+            future.set_exception(e)
+            # Tránh cảnh báo "exception was never retrieved" khi không có ai chờ
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def forget(self, key: Optional[Hashable] = None):
+        """
+        Let the next caller for `key` (every key when None) start a new call
+        instead of joining the one in progress.
+        """
+        if key is None:
+            self._calls.clear()
+        else:
+            self._calls.pop(key, None)
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import aiosmtplib
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _PooledConnection:
+    """One authenticated SMTP session and its bookkeeping."""
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.messages_sent = 0
+
+
+class SmtpConnectionPool:
+    """
+    Keep-alive SMTP sessions reused across sends.
+
+    The TCP + STARTTLS + AUTH handshake is paid once per connection instead of
+    once per email. Idle connections are closed after idle_timeout, connections
+    idle for more than health_check_after are checked with NOOP before reuse,
+    and a send that fails because the server dropped the session is retried
+    once on a fresh connection.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        use_tls: bool = False,
+        validate_certs: bool = True,
+        size: int = 4,
+        idle_timeout: float = 60.0,
+        health_check_after: float = 15.0,
+        timeout: float = 30.0,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.validate_certs = validate_certs
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+
+        self._idle: Deque[_PooledConnection] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self.open_connections = 0
+
+        # Counters
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.health_check_failures = 0
+        self.idle_closed = 0
+        self.sent = 0
+        self.total_send_time = 0.0
+
+    async def send_message(self, message: EmailMessage):
+        """Send one message on a pooled connection. Raises on failure."""
+        started_at = time.monotonic()
+        async with self._connection() as connection:
+            try:
+                await connection.smtp.send_message(message, timeout=self.timeout)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                # Server đã đóng phiên (idle timeout phía server): kết nối lại và gửi lại một lần
+                self.reconnects += 1
+                await self._discard(connection)
+                connection.smtp = await self._open_smtp()
+                await connection.smtp.send_message(message, timeout=self.timeout)
+            connection.messages_sent += 1
+        self.sent += 1
+        self.total_send_time += time.monotonic() - started_at
+
+    async def close(self):
+        """Close every idle connection and stop the idle reaper."""
+        if self._reaper:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        while self._idle:
+            await self._discard(self._idle.popleft())
+        logger.info("SMTP connection pool closed.")
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[_PooledConnection]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle_loop(), name="smtp-pool-reaper")
+
+        async with self._slots:
+            connection = await self._checkout()
+            try:
+                yield connection
+            except BaseException:
+                # Trạng thái phiên không rõ ràng sau lỗi: không đưa lại vào pool
+                await self._discard(connection)
+                raise
+            connection.last_used_at = time.monotonic()
+            self._idle.append(connection)
+
+    async def _checkout(self) -> _PooledConnection:
+        while self._idle:
+            connection = self._idle.pop()
+            idle_for = time.monotonic() - connection.last_used_at
+            if idle_for >= self.idle_timeout or not connection.smtp.is_connected:
+                await self._discard(connection)
+                continue
+            if idle_for >= self.health_check_after:
+                try:
+                    await connection.smtp.noop(timeout=self.timeout)
+                except Exception as e:
+                    self.health_check_failures += 1
+                    logger.info(f"Pooled SMTP connection failed health check, reconnecting: {e}")
+                    await self._discard(connection)
+                    continue
+            self.reuses += 1
+            return connection
+
+        return _PooledConnection(await self._open_smtp())
+
+    async def _open_smtp(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            start_tls=self.start_tls,
+            use_tls=self.use_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            try:
+                await smtp.login(self.username, self.password or "")
+            except BaseException:
+                # Không đăng nhập được: đóng socket đã mở thay vì bỏ rơi nó
+                smtp.close()
+                raise
+        self.open_connections += 1
+        self.connects += 1
+        logger.debug(f"Opened SMTP connection to {self.hostname}:{self.port} ({self.open_connections} open)")
+        return smtp
+
+    async def _discard(self, connection: _PooledConnection):
+        smtp = connection.smtp
+        if smtp.is_connected:
+            try:
+                await smtp.quit(timeout=5)
+            except Exception:
+                smtp.close()
+        self.open_connections = max(0, self.open_connections - 1)
+
+    async def _reap_idle_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            now = time.monotonic()
+            # Tách toàn bộ kết nối hết hạn khỏi pool trước lần await đầu tiên:
+            # trong lúc đóng kết nối, một lần checkout có thể lấy đi các kết nối khác
+            expired = [conn for conn in self._idle if now - conn.last_used_at >= self.idle_timeout]
+            if not expired:
+                continue
+            self._idle = deque(conn for conn in self._idle if now - conn.last_used_at < self.idle_timeout)
+            for connection in expired:
+                self.idle_closed += 1
+                await self._discard(connection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return connection reuse and latency counters."""
+        return {
+            "size": self.size,
+            "openConnections": self.open_connections,
+            "idleConnections": len(self._idle),
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "reconnects": self.reconnects,
+            "healthCheckFailures": self.health_check_failures,
+            "idleClosed": self.idle_closed,
+            "sent": self.sent,
+            "avgSendMs": round(self.total_send_time / self.sent * 1000, 3) if self.sent else 0.0,
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StatusSubscription:
+    """One connected client: the zones it follows and the latest unsent status of each."""
+
+    def __init__(self, zone_ids: Iterable[str]):
+        self.zone_ids: Set[str] = set(zone_ids)
+        # zoneId -> JSON của trạng thái mới nhất chưa gửi (giá trị mới ghi đè giá trị cũ)
+        self.latest: Dict[str, str] = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+        # Thời điểm có trạng thái chờ gửi mà client chưa lấy
+        self.pending_since: Optional[float] = None
+        self.delivered = 0
+        self.coalesced = 0
+
+
+class StatusHub:
+    """
+    In-process pub/sub of zone status updates for server-push clients.
+
+    publish() never waits on a client: each subscription only keeps the latest
+    status of each zone it follows, so a burst of updates to one zone is
+    coalesced into one message. A client that leaves updates unread for longer
+    than status_stream_slow_consumer_timeout is disconnected instead of holding
+    memory or delaying others.
+    """
+
+    def __init__(
+        self,
+        heartbeat_interval: float = settings.status_stream_heartbeat_interval,
+        slow_consumer_timeout: float = settings.status_stream_slow_consumer_timeout,
+    ):
+        self.heartbeat_interval = heartbeat_interval
+        self.slow_consumer_timeout = slow_consumer_timeout
+        self.by_zone: Dict[str, Set[StatusSubscription]] = {}
+        self.subscriptions: Set[StatusSubscription] = set()
+
+        # Counters
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped_slow = 0
+
+    def subscribe(self, zone_ids: Iterable[str]) -> StatusSubscription:
+        subscription = StatusSubscription(zone_ids)
+        self.subscriptions.add(subscription)
+        for zone_id in subscription.zone_ids:
+            self.by_zone.setdefault(zone_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription):
+        subscription.closed = True
+        subscription.ready.set()
+        self.subscriptions.discard(subscription)
+        for zone_id in subscription.zone_ids:
+            subscribers = self.by_zone.get(zone_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.by_zone[zone_id]
+
+    def publish(self, zone_id: str, status: Dict[str, Any]):
+        """Hand a zone's new status to every subscription following it."""
+        subscribers = self.by_zone.get(zone_id)
+        self.published += 1
+        if not subscribers:
+            return
+        message = json.dumps({"zoneId": zone_id, **status}, default=str)
+        now = time.monotonic()
+        for subscription in list(subscribers):
+            if subscription.pending_since is not None and now - subscription.pending_since > self.slow_consumer_timeout:
+                self.dropped_slow += 1
+                logger.warning(f"Dropping slow status stream client ({len(subscription.zone_ids)} zone(s))")
+                self.unsubscribe(subscription)
+                continue
+            if zone_id in subscription.latest:
+                subscription.coalesced += 1
+                self.coalesced += 1
+            subscription.latest[zone_id] = message
+            if subscription.pending_since is None:
+                subscription.pending_since = now
+            subscription.ready.set()
+
+    async def updates(self, subscription: StatusSubscription) -> AsyncIterator[Optional[Tuple[str, str]]]:
+        """
+        Yield (zoneId, status JSON) as updates arrive, or None every
+        heartbeat_interval seconds without one. Ends when the subscription is closed.
+        """
+        while not subscription.closed:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), timeout=self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if subscription.closed:
+                return
+            latest, subscription.latest = subscription.latest, {}
+            subscription.pending_since = None
+            subscription.ready.clear()
+            for zone_id, message in latest.items():
+                subscription.delivered += 1
+                self.delivered += 1
+                yield zone_id, message
+
+    def close(self):
+        """End every stream (application shutdown)."""
+        for subscription in list(self.subscriptions):
+            self.unsubscribe(subscription)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return subscription/delivery counters."""
+        return {
+            "subscriptions": len(self.subscriptions),
+            "zonesFollowed": len(self.by_zone),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "droppedSlowConsumers": self.dropped_slow,
+        }
+
+
+# Global status hub instance
+status_hub = StatusHub()
@@ -0,0 +1,67 @@
+import secrets
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StreamTicketStore:
+    """
+    Short-lived, single-use tickets for server-push endpoints.
+
+    EventSource cannot send an Authorization header, so the browser first
+    exchanges its ID token for a ticket (authenticated POST) and puts only the
+    ticket in the stream URL. A ticket that ends up in an access log, a proxy
+    log or the browser history is useless: it expires after `ttl` seconds and
+    is consumed by the first request presenting it. Tickets live in this
+    process, like the status hub they give access to.
+    """
+
+    def __init__(self, ttl: float = settings.stream_ticket_ttl):
+        self.ttl = ttl
+        # ticket -> (thời điểm hết hạn, thông tin người dùng)
+        self.tickets: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+        # Counters
+        self.issued = 0
+        self.redeemed = 0
+        self.rejected = 0
+
+    def issue(self, user: Dict[str, Any]) -> str:
+        """Create a ticket for an already verified user."""
+        self._prune()
+        ticket = secrets.token_urlsafe(32)
+        self.tickets[ticket] = (time.monotonic() + self.ttl, dict(user))
+        self.issued += 1
+        return ticket
+
+    def redeem(self, ticket: str) -> Optional[Dict[str, Any]]:
+        """Consume a ticket; return its user, or None if it is unknown, used or expired."""
+        entry = self.tickets.pop(ticket, None)
+        if entry is None or entry[0] <= time.monotonic():
+            self.rejected += 1
+            return None
+        self.redeemed += 1
+        return entry[1]
+
+    def _prune(self):
+        now = time.monotonic()
+        for ticket in [ticket for ticket, (expires_at, _) in self.tickets.items() if expires_at <= now]:
+            del self.tickets[ticket]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return issue/redeem counters."""
+        return {
+            "ttlSeconds": self.ttl,
+            "outstanding": len(self.tickets),
+            "issued": self.issued,
+            "redeemed": self.redeemed,
+            "rejected": self.rejected,
+        }
+
+
+# Global stream ticket store instance
+stream_tickets = StreamTicketStore()
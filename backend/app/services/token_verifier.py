@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from firebase_admin import auth as firebase_auth
+
+from app.config import settings
+from app.services.database import initialize_firebase
+from app.services.single_flight import SingleFlight
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Chứng chỉ Google dùng để ký Firebase ID token
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+
+class FirebaseTokenVerifier:
+    """
+    Cache of verified Firebase ID tokens.
+
+    Decoded claims are kept per token hash until the token's own `exp`, so a
+    dashboard polling with the same token only pays for verification once.
+    Verification runs in a worker thread, concurrent requests with the same
+    token share one verification, and Google's signing certificates are
+    fetched in the background so a request never waits on that download.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.auth_token_cache_size,
+        cert_refresh_interval: float = settings.firebase_cert_refresh_interval,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.cert_refresh_interval = cert_refresh_interval
+
+        # sha256(token) -> (exp, claims)
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._verifying = SingleFlight()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # False khi phiên bản firebase_admin không còn cho phép truy cập session HTTP của nó
+        self.cert_prefetch_supported = True
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.cert_refreshes = 0
+        self.cert_refresh_failures = 0
+
+    async def start(self):
+        """Fetch the signing certificates and keep them fresh in the background."""
+        if self._refresh_task:
+            return
+        await self.refresh_certs()
+        self._refresh_task = asyncio.create_task(self._refresh_loop(), name="firebase-cert-refresh")
+        logger.info("Firebase token verifier started")
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        logger.info("Firebase token verifier stopped.")
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the decoded claims of an ID token. Raises if the token is invalid or expired."""
+        key = hashlib.sha256(token.encode()).hexdigest()
+        entry = self.entries.get(key)
+        if entry:
+            if entry[0] > time.time():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[1]
+            del self.entries[key]
+
+        # Dashboard gửi nhiều request song song với cùng một token: chỉ xác thực một lần
+        return await self._verifying.run(key, lambda: self._verify(key, token))
+
+    async def _verify(self, key: str, token: str) -> Dict[str, Any]:
+        self.misses += 1
+        try:
+            decoded = await run_in_threadpool(firebase_auth.verify_id_token, token)
+        except Exception:
+            self.failures += 1
+            raise
+        self._store(key, decoded)
+        return decoded
+
+    def _store(self, key: str, decoded: Dict[str, Any]):
+        exp = decoded.get("exp")
+        if not exp:
+            return
+        self.entries[key] = (float(exp), decoded)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            now = time.time()
+            for expired_key in [k for k, (expires_at, _) in self.entries.items() if expires_at <= now]:
+                del self.entries[expired_key]
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    async def refresh_certs(self):
+        """
+        Fetch the signing certificates through the Admin SDK's HTTP session.
+        That session caches the response per its Cache-Control header, so
+        verify_id_token reads the certificates from the cache.
+        """
+        if not self.cert_prefetch_supported:
+            return
+        try:
+            await run_in_threadpool(self._fetch_certs)
+            if self.cert_prefetch_supported:
+                self.cert_refreshes += 1
+        except Exception as e:
+            self.cert_refresh_failures += 1
+            logger.warning(f"Failed to prefetch Firebase signing certificates: {e}")
+
+    @staticmethod
+    def _sdk_request():
+        """
+        The cached HTTP request callable used by firebase_auth.verify_id_token,
+        or None. It is not part of the Admin SDK's public API, so it may be
+        missing in other firebase_admin versions.
+        """
+        try:
+            return firebase_auth._get_client(None)._token_verifier.request
+        except AttributeError:
+            return None
+
+    def _fetch_certs(self):
+        initialize_firebase()
+        # Dùng chung session (có cache) với firebase_auth.verify_id_token
+        request = self._sdk_request()
+        if request is None:
+            self.cert_prefetch_supported = False
+            logger.warning(
+                "This firebase_admin version does not expose its token verifier HTTP session: "
+                "background certificate prefetch is disabled, verify_id_token fetches the "
+                "certificates itself when its cache expires."
+            )
+            return
+        response = request(ID_TOKEN_CERT_URI, method="GET")
+        if response.status != 200:
+            raise RuntimeError(f"HTTP {response.status} fetching {ID_TOKEN_CERT_URI}")
+
+    async def _refresh_loop(self):
+        while self.cert_prefetch_supported:
+            await asyncio.sleep(self.cert_refresh_interval)
+            await self.refresh_certs()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "sharedVerifications": self._verifying.shared,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "failures": self.failures,
+            "certPrefetchSupported": self.cert_prefetch_supported,
+            "certRefreshes": self.cert_refreshes,
+            "certRefreshFailures": self.cert_refresh_failures,
+        }
+
+
+# Global Firebase token verifier instance
+token_verifier = FirebaseTokenVerifier()
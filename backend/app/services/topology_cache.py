@@ -0,0 +1,174 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.zone.zone_service import ZoneService
+from app.sensor.sensor_service import SensorService
+from app.actuator.actuator_service import ActuatorService
+from app.crop_profile.crop_profile_service import CropProfileService
+from app.services.firestore_stream import document_to_dict, fetch_dicts
+from app.services.reading_compressor import resolve_storage_policy
+from app.services.single_flight import SingleFlight
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ZoneTopologyCache:
+    """
+    In-process cache of the per-zone configuration used on the ingest hot path:
+    the zone document (name, owner, thresholds), its sensors and actuators, the
+    type -> id maps built from them and the effective reading storage policy.
+
+    Entries expire after `ttl` seconds and are invalidated explicitly by the
+    zone, sensor and actuator routes when that configuration changes. A zone
+    that does not exist is remembered for `negative_ttl` seconds only, and a
+    failed Firestore read is never cached: the expired entry (if any) keeps
+    being served until a load succeeds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = settings.topology_cache_ttl,
+        negative_ttl: float = settings.topology_cache_negative_ttl,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.zone_service = ZoneService()
+        self.sensor_service = SensorService()
+        self.actuator_service = ActuatorService()
+        self.crop_profile_service = CropProfileService()
+
+        # zone_id -> (thời điểm hết hạn, topology hoặc None nếu zone không tồn tại)
+        self.entries: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._loading = SingleFlight()
+        # Tăng ở mỗi lần invalidate: lần tải đang chạy khi đó không được lưu
+        self._generation = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.stale_served = 0
+        self.invalidations = 0
+
+    async def get(self, zone_id: str, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Return the topology of a zone (None if the zone does not exist),
+        loading it from Firestore on a miss. When the load fails, the expired
+        entry is returned if there is one; otherwise the error is raised with
+        raise_errors, and None is returned without it.
+        """
+        entry = self.entries.get(zone_id)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        try:
+            # Nhiều message cùng lúc cho một zone chỉ kích hoạt một lần đọc Firestore
+            return await self._loading.run(zone_id, lambda: self._load_entry(zone_id))
+        except Exception:
+            if entry is not None and entry[1] is not None:
+                self.stale_served += 1
+                return entry[1]
+            if raise_errors:
+                raise
+            return None
+
+    async def _load_entry(self, zone_id: str) -> Optional[Dict[str, Any]]:
+        generation = self._generation
+        try:
+            topology = await self._load(zone_id)
+        except Exception as e:
+            self.load_errors += 1
+            logger.error(f"Error loading topology for zone {zone_id}: {e}", exc_info=True)
+            raise
+        # Không lưu nếu cache bị invalidate trong lúc đang tải
+        if generation == self._generation:
+            ttl = self.ttl if topology is not None else self.negative_ttl
+            self.entries[zone_id] = (time.monotonic() + ttl, topology)
+        return topology
+
+    async def _load(self, zone_id: str) -> Optional[Dict[str, Any]]:
+        """Read the zone and its configuration; Firestore errors are raised, not cached."""
+        self.loads += 1
+        zone_snapshot, sensors, actuators = await asyncio.gather(
+            run_in_threadpool(self.zone_service.collection.document(zone_id).get),
+            fetch_dicts(self.sensor_service.collection.where('zoneId', '==', zone_id)),
+            fetch_dicts(self.actuator_service.collection.where('zoneId', '==', zone_id)),
+        )
+        zone = document_to_dict(zone_snapshot) if zone_snapshot.exists else None
+        if not zone:
+            logger.warning(f"Zone {zone_id} not found while loading topology")
+            return None
+
+        crop_profile = None
+        if zone.get("cropProfileId"):
+            profile_snapshot = await run_in_threadpool(
+                self.crop_profile_service.collection.document(zone["cropProfileId"]).get
+            )
+            crop_profile = document_to_dict(profile_snapshot) if profile_snapshot.exists else None
+
+        # Bản đồ tra cứu từ loại đo (measure) sang sensorId
+        sensor_map = {}
+        for sensor in sensors:
+            sensor_id = sensor.get('id')
+            for measure_type in sensor.get('measures', []) or []:
+                if sensor_id:
+                    sensor_map[measure_type] = sensor_id
+
+        actuator_map = {
+            actuator.get('type'): actuator.get('id')
+            for actuator in actuators
+            if actuator.get('type') and actuator.get('id')
+        }
+
+        return {
+            "zone": zone,
+            "name": zone.get("name", zone_id),
+            "owner": zone.get("owner"),
+            "thresholds": zone.get("thresholds", {}) or {},
+            "sensors": sensors,
+            "actuators": actuators,
+            "sensor_map": sensor_map,
+            "actuator_map": actuator_map,
+            "storage_policy": resolve_storage_policy(zone, crop_profile),
+        }
+
+    def invalidate(self, zone_id: Optional[str] = None):
+        """Drop one zone from the cache, or every zone when zone_id is None."""
+        self.invalidations += 1
+        self._generation += 1
+        self._loading.forget(zone_id)
+        if zone_id is None:
+            self.entries.clear()
+            logger.info("Zone topology cache cleared")
+            return
+
+        self.entries.pop(zone_id, None)
+        logger.debug(f"Zone topology cache invalidated for zone {zone_id}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "ttlSeconds": self.ttl,
+            "negativeTtlSeconds": self.negative_ttl,
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "loadErrors": self.load_errors,
+            "staleServed": self.stale_served,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global zone topology cache instance
+zone_topology_cache = ZoneTopologyCache()
@@ -0,0 +1,267 @@
+import asyncio
+import copy
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from app.config import settings
+from app.zone_status.zone_status_service import ZoneStatusService
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Firestore cho phép tối đa 500 thao tác trong một batch
+FIRESTORE_BATCH_LIMIT = 500
+# Zone đã xóa được nhớ trong khoảng này để các cập nhật đến muộn không tạo lại document
+TOMBSTONE_TTL = 3600.0
+
+
+def _deep_merge(target: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge updates into target the way Firestore set(merge=True) merges nested maps."""
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+    return target
+
+
+class ZoneStatusStore:
+    """
+    In-memory, authoritative table of zone statuses.
+
+    Ingest updates a zone synchronously and gets the merged status back without
+    any Firestore round trip. Pending fields are coalesced per zone (latest wins)
+    and written to Firestore at most once per flush_interval seconds per zone,
+    or right away when the overall status of the zone changes.
+    """
+
+    def __init__(self, flush_interval: float = settings.zone_status_flush_interval):
+        self.flush_interval = flush_interval
+        self.zone_status_service = ZoneStatusService()
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # Các zone đã được đọc từ Firestore (entries chứa đầy đủ document)
+        self.loaded: Set[str] = set()
+        # zone_id -> các trường chưa được ghi xuống Firestore
+        self.dirty: Dict[str, Dict[str, Any]] = {}
+        self.last_flushed_at: Dict[str, float] = {}
+        # zone_id -> thời điểm bị xóa (monotonic)
+        self.deleted: Dict[str, float] = {}
+
+        self.running = False
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._immediate: Set[asyncio.Task] = set()
+
+        # Counters
+        self.updates = 0
+        self.flushes = 0
+        self.zones_written = 0
+        self.failed_flushes = 0
+        self.immediate_flushes = 0
+
+    async def start(self):
+        """Start the periodic flush loop."""
+        if self.running:
+            return
+        self._flush_lock = asyncio.Lock()
+        self.running = True
+        self._flush_task = asyncio.create_task(self._flush_loop(), name="zone-status-flush")
+        logger.info(f"Zone status store started (flush interval {self.flush_interval}s per zone)")
+
+    async def stop(self):
+        """Flush every pending status so nothing is lost on shutdown."""
+        if not self.running:
+            return
+        self.running = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self._immediate:
+            await asyncio.gather(*list(self._immediate), return_exceptions=True)
+        await self.flush()
+        logger.info(f"Zone status store stopped, {self.zones_written} zone status write(s) in {self.flushes} flush(es)")
+
+    async def get(self, zone_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current status of a zone, loading it from Firestore the first time."""
+        if not await self.load(zone_id):
+            return None
+        return copy.deepcopy(self.entries[zone_id])
+
+    async def load(self, zone_id: str) -> bool:
+        """Make sure the stored document of a zone is in memory. Returns False if it has none."""
+        if zone_id in self.loaded:
+            return True
+        if zone_id in self.deleted:
+            return False
+
+        status_data = await self.zone_status_service.get_zone_status(zone_id)
+        pending = self.entries.get(zone_id)
+        if status_data is None:
+            return pending is not None
+
+        # Các cập nhật đến trong lúc đang đọc được ưu tiên hơn dữ liệu từ Firestore
+        if pending is not None:
+            status_data = _deep_merge(status_data, pending)
+        self.entries[zone_id] = status_data
+        self.loaded.add(zone_id)
+        return True
+
+    async def get_many(self, zone_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Current status of several zones: from memory when loaded, the others
+        read from Firestore in bulk (and kept, like load()). Zones without any
+        status are left out.
+        """
+        missing = [zone_id for zone_id in zone_ids if zone_id not in self.loaded and zone_id not in self.deleted]
+        fetched = await self.zone_status_service.get_zone_statuses(missing) if missing else {}
+
+        for zone_id in missing:
+            status_data = fetched.get(zone_id)
+            if status_data is None or zone_id in self.loaded:
+                continue
+            pending = self.entries.get(zone_id)
+            if pending is not None:
+                status_data = _deep_merge(status_data, pending)
+            self.entries[zone_id] = status_data
+            self.loaded.add(zone_id)
+
+        return {
+            zone_id: copy.deepcopy(self.entries[zone_id])
+            for zone_id in zone_ids
+            if zone_id in self.entries
+        }
+
+    def peek(self, zone_id: str) -> Optional[Dict[str, Any]]:
+        """Return the in-memory status of a zone without touching Firestore."""
+        entry = self.entries.get(zone_id)
+        return copy.deepcopy(entry) if entry is not None else None
+
+    def update(self, zone_id: str, status_data: Dict[str, Any], flush_now: bool = False) -> Dict[str, Any]:
+        """
+        Apply an update (merge semantics) and return the resulting status.
+        The Firestore write happens later, coalesced with the following updates.
+        """
+        if zone_id in self.deleted:
+            logger.debug(f"Ignoring status update for deleted zone {zone_id}")
+            return {}
+        self.updates += 1
+        fields = dict(status_data)
+        fields['lastUpdated'] = datetime.utcnow()
+
+        entry = self.entries.setdefault(zone_id, {'id': zone_id})
+        status_changed = 'status' in fields and entry.get('status') != fields['status']
+        _deep_merge(entry, fields)
+        _deep_merge(self.dirty.setdefault(zone_id, {}), fields)
+
+        if (flush_now or status_changed) and self.running:
+            self.immediate_flushes += 1
+            task = asyncio.ensure_future(self._flush_zones([zone_id]))
+            self._immediate.add(task)
+            task.add_done_callback(self._immediate.discard)
+
+        return copy.deepcopy(entry)
+
+    async def initialize(self, zone_id: str, status_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Set the status of a newly created zone and write it to Firestore right away."""
+        self.deleted.pop(zone_id, None)
+        fields = dict(status_data)
+        fields['lastUpdated'] = datetime.utcnow()
+        self.entries[zone_id] = {'id': zone_id, **copy.deepcopy(fields)}
+        self.loaded.add(zone_id)
+        self.dirty[zone_id] = _deep_merge(self.dirty.get(zone_id, {}), fields)
+        # Nếu ghi lỗi, trạng thái vẫn nằm trong hàng chờ và được ghi ở lần flush sau
+        await self._flush_zones([zone_id])
+        return copy.deepcopy(self.entries[zone_id])
+
+    async def suspend(self, zone_id: str):
+        """
+        Stop accepting status updates of a zone that is about to be deleted.
+        Call it before deleting the zone_status document: later updates of the
+        zone are ignored, and a write already in progress is waited for, so the
+        document is not written back after the deletion. The in-memory status is
+        kept until discard() (delete succeeded) or resume() (delete failed).
+        """
+        now = time.monotonic()
+        self.deleted = {deleted_id: at for deleted_id, at in self.deleted.items() if now - at < TOMBSTONE_TTL}
+        self.deleted[zone_id] = now
+        if self._flush_lock is not None:
+            async with self._flush_lock:
+                pass
+
+    def resume(self, zone_id: str):
+        """Accept updates of a suspended zone again; its pending writes are flushed as usual."""
+        self.deleted.pop(zone_id, None)
+
+    async def discard(self, zone_id: str):
+        """Forget a deleted zone, including its pending writes. Later updates are ignored."""
+        await self.suspend(zone_id)
+        self.entries.pop(zone_id, None)
+        self.loaded.discard(zone_id)
+        self.dirty.pop(zone_id, None)
+        self.last_flushed_at.pop(zone_id, None)
+
+    async def flush(self):
+        """Write every pending zone status now."""
+        await self._flush_zones(list(self.dirty))
+
+    async def _flush_loop(self):
+        tick = max(0.1, min(1.0, self.flush_interval))
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            due = [
+                zone_id for zone_id in self.dirty
+                if now - self.last_flushed_at.get(zone_id, 0.0) >= self.flush_interval
+            ]
+            if due:
+                await self._flush_zones(due)
+
+    async def _flush_zones(self, zone_ids: List[str]):
+        lock = self._flush_lock or asyncio.Lock()
+        # Các lần flush chạy tuần tự để bản ghi cũ không đè lên bản ghi mới hơn
+        async with lock:
+            updates = {
+                zone_id: self.dirty.pop(zone_id)
+                for zone_id in zone_ids
+                if zone_id in self.dirty and zone_id not in self.deleted
+            }
+            if not updates:
+                return
+
+            items = list(updates.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                chunk = dict(items[start:start + FIRESTORE_BATCH_LIMIT])
+                flushed_at = time.monotonic()
+                if await self.zone_status_service.write_zone_statuses(chunk):
+                    self.flushes += 1
+                    self.zones_written += len(chunk)
+                    for zone_id in chunk:
+                        self.last_flushed_at[zone_id] = flushed_at
+                else:
+                    self.failed_flushes += 1
+                    # Đưa lại vào hàng chờ, giữ các cập nhật mới hơn đến trong lúc ghi
+                    for zone_id, fields in chunk.items():
+                        if zone_id in self.entries:
+                            self.dirty[zone_id] = _deep_merge(fields, self.dirty.get(zone_id, {}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return coalescing counters."""
+        return {
+            "running": self.running,
+            "flushIntervalSeconds": self.flush_interval,
+            "zones": len(self.entries),
+            "dirtyZones": len(self.dirty),
+            "deletedZones": len(self.deleted),
+            "updates": self.updates,
+            "zoneWrites": self.zones_written,
+            "flushes": self.flushes,
+            "immediateFlushes": self.immediate_flushes,
+            "failedFlushes": self.failed_flushes,
+            "writesSaved": max(0, self.updates - self.zones_written - len(self.dirty)),
+        }
+
+
+# Global zone status store instance
+zone_status_store = ZoneStatusStore()
@@ -0,0 +1,165 @@
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from app.services.ingest_service import ingest_service
+from app.services.history_writer import history_writer
+from app.services.topology_cache import zone_topology_cache
+from app.services.response_cache import crop_profile_cache, zone_settings_cache
+from app.services.zone_status_store import zone_status_store
+from app.services.reading_compressor import reading_compressor
+from app.services.actuator_state_tracker import actuator_state_tracker
+from app.services.alert_state_machine import alert_state_machine
+from app.services.email_outbox import email_outbox
+from app.services.email_service import email_service
+from app.services.notification_rate_limiter import notification_rate_limiter
+from app.services.token_verifier import token_verifier
+from app.services.reading_rollup import reading_rollup
+from app.services.reading_buckets import reading_bucket_writer
+from app.services.hot_window import hot_window_store
+from app.services.status_hub import status_hub
+from app.services.stream_tickets import stream_tickets
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/ingest", response_model=Dict[str, Any])
+async def get_ingest_stats():
+    """
+    Lấy các bộ đếm của pipeline ingest (throughput, độ sâu hàng đợi, ...).
+    """
+    return ingest_service.get_stats()
+
+
+@router.get("/history-writer", response_model=Dict[str, Any])
+async def get_history_writer_stats():
+    """
+    Lấy các bộ đếm của bộ ghi lịch sử theo lô (số commit, số bản ghi mỗi commit, ...).
+    """
+    return history_writer.get_stats()
+
+
+@router.get("/topology-cache", response_model=Dict[str, Any])
+async def get_topology_cache_stats():
+    """
+    Lấy số lần hit/miss của cache cấu hình zone dùng trong pipeline ingest.
+    """
+    return zone_topology_cache.get_stats()
+
+
+@router.get("/response-cache", response_model=Dict[str, Any])
+async def get_response_cache_stats():
+    """
+    Lấy số lần hit/miss của cache hồ sơ cây trồng và dữ liệu cài đặt zone.
+    """
+    return {
+        crop_profile_cache.name: crop_profile_cache.get_stats(),
+        zone_settings_cache.name: zone_settings_cache.get_stats(),
+    }
+
+
+@router.get("/zone-status", response_model=Dict[str, Any])
+async def get_zone_status_store_stats():
+    """
+    Lấy các bộ đếm của bảng trạng thái zone trong bộ nhớ (số lần cập nhật, số lần ghi Firestore, ...).
+    """
+    return zone_status_store.get_stats()
+
+
+@router.get("/compression", response_model=Dict[str, Any])
+async def get_compression_stats():
+    """
+    Lấy số giá trị nhận được và số giá trị thực sự được lưu vào readings_history theo từng loại đo.
+    """
+    return reading_compressor.get_stats()
+
+
+@router.get("/actuator-states", response_model=Dict[str, Any])
+async def get_actuator_state_stats():
+    """
+    Lấy số trạng thái actuator nhận được và số lần chuyển trạng thái thực sự được ghi lại.
+    """
+    return actuator_state_tracker.get_stats()
+
+
+@router.get("/alerts", response_model=Dict[str, Any])
+async def get_alert_stats():
+    """
+    Lấy số điều kiện cảnh báo theo từng trạng thái và số thông báo đã gửi / bị chặn.
+    """
+    return alert_state_machine.get_stats()
+
+
+@router.get("/email-outbox", response_model=Dict[str, Any])
+async def get_email_outbox_stats():
+    """
+    Lấy độ dài hàng đợi email và độ trễ gửi (từ lúc đưa vào hàng đợi tới lúc gửi xong).
+    """
+    return email_outbox.get_stats()
+
+
+@router.get("/smtp-pool", response_model=Dict[str, Any])
+async def get_smtp_pool_stats():
+    """
+    Lấy số kết nối SMTP đang mở, số lần dùng lại kết nối và thời gian gửi trung bình.
+    """
+    if not email_service.smtp_pool:
+        return {"enabled": False}
+    return email_service.smtp_pool.get_stats()
+
+
+@router.get("/rate-limits", response_model=Dict[str, Any])
+async def get_rate_limit_stats():
+    """
+    Lấy số email được gửi / bị giới hạn theo maxPerHour, maxPerDay và số thông báo đang chờ email tổng hợp.
+    """
+    return notification_rate_limiter.get_stats()
+
+
+@router.get("/auth-cache", response_model=Dict[str, Any])
+async def get_auth_cache_stats():
+    """
+    Lấy tỉ lệ cache hit khi xác thực Firebase ID token và số lần tải lại chứng chỉ.
+    """
+    return token_verifier.get_stats()
+
+
+@router.get("/rollups", response_model=Dict[str, Any])
+async def get_rollup_stats():
+    """
+    Lấy số giá trị đã được tổng hợp và số bucket rollup đang chờ / đã ghi xuống Firestore.
+    """
+    return reading_rollup.get_stats()
+
+
+@router.get("/reading-buckets", response_model=Dict[str, Any])
+async def get_reading_bucket_stats():
+    """
+    Lấy layout lưu readings đang dùng và số giá trị / bucket giờ đã ghi xuống readings_buckets.
+    """
+    return reading_bucket_writer.get_stats()
+
+
+@router.get("/hot-window", response_model=Dict[str, Any])
+async def get_hot_window_stats():
+    """
+    Lấy bộ nhớ dùng cho các giá trị gần đây theo từng zone và tỉ lệ truy vấn lịch sử được trả lời từ bộ nhớ.
+    """
+    return hot_window_store.get_stats()
+
+
+@router.get("/status-hub", response_model=Dict[str, Any])
+async def get_status_hub_stats():
+    """
+    Lấy số client đang nhận trạng thái zone qua status stream, số cập nhật đã gộp và số client chậm bị ngắt.
+    """
+    return status_hub.get_stats()
+
+
+@router.get("/stream-tickets", response_model=Dict[str, Any])
+async def get_stream_ticket_stats():
+    """
+    Lấy số ticket mở status stream đã cấp, đã dùng và bị từ chối.
+    """
+    return stream_tickets.get_stats()
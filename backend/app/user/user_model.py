@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
 
@@ -34,4 +34,7 @@ class NotificationPreferences(BaseModel):
     severity: Optional[dict] = Field(None, description="Severity preferences")
     maxPerHour: int = Field(10, description="Maximum notifications per hour")
     maxPerDay: int = Field(50, description="Maximum notifications per day")
-    zones: Optional[list] = Field(None, description="Specific zones to receive notifications for")
\ No newline at end of file
+    zones: Optional[list] = Field(None, description="Specific zones to receive notifications for")
+    delivery: Literal["immediate", "digest"] = Field("immediate", description="Send each alert immediately or collect them into a digest")
+    digestWindowMinutes: int = Field(5, ge=1, le=1440, description="Minutes alerts are collected before the digest is sent")
+    criticalBypassDigest: bool = Field(True, description="Send critical alerts immediately even in digest mode")
\ No newline at end of file
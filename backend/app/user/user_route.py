@@ -125,10 +125,10 @@ async def test_email_notification(current = Depends(get_verified_user)):
         logger.info(f"🧪 TEST EMAIL REQUEST - User: {user_email}, UID: {current['uid']}")
         
         # Test email service initialization
-        logger.info(f"🔧 EMAIL SERVICE STATUS - FastMail: {'✅' if email_service.fastmail else '❌'}, Templates: {'✅' if email_service.template_env else '❌'}")
+        logger.info(f"🔧 EMAIL SERVICE STATUS - SMTP pool: {'✅' if email_service.smtp_pool else '❌'}, Templates: {'✅' if email_service.template_env else '❌'}")
         
-        if not email_service.fastmail:
-            logger.error(f"❌ EMAIL SERVICE NOT READY - FastMail instance is None")
+        if not email_service.smtp_pool:
+            logger.error(f"❌ EMAIL SERVICE NOT READY - SMTP pool is None")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Email service not properly initialized"
@@ -175,7 +175,6 @@ async def test_email_notification(current = Depends(get_verified_user)):
 async def simple_test_email(current = Depends(get_verified_user)):
     """Simple test email without templates to debug basic email functionality."""
     try:
-        from fastapi_mail import MessageSchema
         from app.services.email_service import email_service
         
         # Get user profile
@@ -190,8 +189,8 @@ async def simple_test_email(current = Depends(get_verified_user)):
         logger.info(f"🧪 SIMPLE TEST EMAIL REQUEST - User: {user_email}, UID: {current['uid']}")
         
         # Check email service
-        if not email_service.fastmail:
-            logger.error(f"❌ EMAIL SERVICE NOT READY - FastMail instance is None")
+        if not email_service.smtp_pool:
+            logger.error(f"❌ EMAIL SERVICE NOT READY - SMTP pool is None")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Email service not properly initialized"
@@ -199,11 +198,10 @@ async def simple_test_email(current = Depends(get_verified_user)):
         
         # Create simple message without template
         try:
-            message = MessageSchema(
-                subject="🧪 Simple Test Email from EcoHub",
-                recipients=[user_email],
-                body="This is a simple test email to verify basic SMTP functionality.",
-                subtype="html"
+            message = email_service._build_message(
+                user_email,
+                "🧪 Simple Test Email from EcoHub",
+                "This is a simple test email to verify basic SMTP functionality."
             )
             logger.info(f"📨 SIMPLE MESSAGE CREATED - Recipient: {user_email}")
         except Exception as msg_error:
@@ -216,7 +214,7 @@ async def simple_test_email(current = Depends(get_verified_user)):
         # Send simple email
         try:
             logger.info(f"📤 SENDING SIMPLE TEST EMAIL - Recipient: {user_email}")
-            await email_service.fastmail.send_message(message)
+            await email_service.smtp_pool.send_message(message)
             logger.info(f"✅ SIMPLE TEST EMAIL SUCCESS - Recipient: {user_email}")
             return {"message": "Simple test email sent successfully", "email": user_email}
         except Exception as send_error:
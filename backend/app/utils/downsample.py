@@ -0,0 +1,90 @@
+"""
+Downsampling of time series for charts.
+
+Both functions take the series as NumPy arrays sorted by time and return the
+indices of the points to keep, so callers can pick any parallel array
+(timestamps, values, sensor ids) with the result.
+"""
+import numpy as np
+
+LTTB = "lttb"
+MIN_MAX = "minmax"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last points and, from
+    each of max_points - 2 equal-count buckets, the point that forms the
+    largest triangle with the point kept in the previous bucket and the
+    average of the next bucket. Preserves the visual shape of the series.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Ranh giới của max_points - 2 bucket giữa điểm đầu và điểm cuối
+    every = (n - 2) / (max_points - 2)
+    edges = (np.floor(np.arange(max_points - 1) * every) + 1).astype(np.int64)
+    edges[-1] = n - 1
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_stop].mean()
+            avg_y = y[next_start:next_stop].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        # Diện tích (x2) tam giác tạo bởi điểm a, từng điểm trong bucket và điểm trung bình bucket sau
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    selected[-1] = n - 1
+    return selected
+
+
+def min_max(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Keep the minimum and the maximum of each of max_points // 2 equal-count
+    buckets (in time order), plus the first and last points. Never hides a
+    spike, which LTTB can smooth over when buckets are large.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    buckets = (max_points - 2) // 2
+    if buckets < 1:
+        return np.asarray([0, n - 1], dtype=np.int64)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+    keep = [0]
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop <= start:
+            continue
+        segment = y[start:stop]
+        lowest = start + int(np.argmin(segment))
+        highest = start + int(np.argmax(segment))
+        keep.extend(sorted({lowest, highest}))
+    keep.append(n - 1)
+    return np.asarray(keep, dtype=np.int64)
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = LTTB) -> np.ndarray:
+    """Return the indices to keep with the given method ("lttb" or "minmax")."""
+    if method == MIN_MAX:
+        return min_max(y, max_points)
+    if method == LTTB:
+        return lttb(x, y, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
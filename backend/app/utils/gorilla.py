@@ -0,0 +1,179 @@
+"""
+Gorilla-style compression of a (timestamp, float) series.
+
+Timestamps (integers, e.g. millisecond offsets) are stored as a
+delta-of-delta: a regular sampling interval costs one bit per sample. Values
+are stored as the XOR of their IEEE-754 bits with the previous value: a repeated
+value costs one bit, a slowly changing one only its few meaningful bits.
+
+Layout: a 21-byte header (version, count, first timestamp, first value) then a
+bit stream with, for each further sample, its timestamp then its value.
+NumPy computes the deltas and XORs (encoding) and the running sums and XORs
+(decoding); only the bit packing itself is a Python loop.
+"""
+import struct
+from typing import Sequence, Tuple
+
+import numpy as np
+
+VERSION = 1
+_HEADER = struct.Struct(">BIqd")
+
+# (prefix, prefix length, payload bits) of the delta-of-delta classes; "0" means dod == 0
+_DOD_CLASSES = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+_DOD_FALLBACK = (0b1111, 4, 64)
+
+
+class _BitWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, nbits: int):
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._bits += nbits
+        if self._bits >= 64:
+            # Chỉ giữ lại các bit lẻ để số nguyên tích lũy luôn nhỏ
+            spare = self._bits & 7
+            self.buffer += (self._acc >> spare).to_bytes(self._bits >> 3, "big")
+            self._acc &= (1 << spare) - 1
+            self._bits = spare
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            pad = -self._bits & 7
+            self.buffer += (self._acc << pad).to_bytes((self._bits + pad) >> 3, "big")
+            self._acc = self._bits = 0
+        return bytes(self.buffer)
+
+
+class _BitReader:
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.pos = offset * 8
+        self.size = len(data) * 8
+
+    def read(self, nbits: int) -> int:
+        end = self.pos + nbits
+        if end > self.size:
+            raise ValueError("Truncated Gorilla payload")
+        first, last = self.pos >> 3, (end + 7) >> 3
+        chunk = int.from_bytes(self.data[first:last], "big")
+        self.pos = end
+        return (chunk >> (last * 8 - end)) & ((1 << nbits) - 1)
+
+    def read_bit(self) -> int:
+        if self.pos >= self.size:
+            raise ValueError("Truncated Gorilla payload")
+        bit = (self.data[self.pos >> 3] >> (7 - (self.pos & 7))) & 1
+        self.pos += 1
+        return bit
+
+
+def _signed(value: int, nbits: int) -> int:
+    return value - (1 << nbits) if value >> (nbits - 1) else value
+
+
+def encode(timestamps: Sequence[int], values: Sequence[float]) -> bytes:
+    """Encode a series sorted by timestamp. Returns b"" for an empty series."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(timestamps) != len(values):
+        raise ValueError("timestamps and values must have the same length")
+    count = len(timestamps)
+    if count == 0:
+        return b""
+
+    header = _HEADER.pack(VERSION, count, int(timestamps[0]), float(values[0]))
+    if count == 1:
+        return header
+
+    # Khoảng cách đầu tiên được coi là delta-of-delta so với 0
+    dods = np.diff(timestamps, n=1)
+    dods[1:] = np.diff(dods)
+    bits = values.view(np.uint64)
+    xors = bits[1:] ^ bits[:-1]
+
+    writer = _BitWriter()
+    write = writer.write
+    prev_lead, prev_trail = -1, -1
+    for dod, xor in zip(dods.tolist(), xors.tolist()):
+        if dod == 0:
+            write(0, 1)
+        else:
+            for prefix, prefix_bits, nbits in _DOD_CLASSES:
+                if -(1 << (nbits - 1)) <= dod < (1 << (nbits - 1)):
+                    write(prefix, prefix_bits)
+                    write(dod, nbits)
+                    break
+            else:
+                prefix, prefix_bits, nbits = _DOD_FALLBACK
+                write(prefix, prefix_bits)
+                write(dod, nbits)
+
+        if xor == 0:
+            write(0, 1)
+            continue
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if prev_lead >= 0 and lead >= prev_lead and trail >= prev_trail:
+            # Các bit có nghĩa nằm trong cửa sổ của giá trị trước
+            write(0b10, 2)
+            write(xor >> prev_trail, 64 - prev_lead - prev_trail)
+        else:
+            meaningful = 64 - lead - trail
+            write(0b11, 2)
+            write(lead, 5)
+            write(meaningful - 1, 6)
+            write(xor >> trail, meaningful)
+            prev_lead, prev_trail = lead, trail
+
+    return header + writer.getvalue()
+
+
+def decode(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of encode: (int64 timestamps, float64 values). Raises ValueError on a malformed payload."""
+    if not data:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated Gorilla header")
+    version, count, first_timestamp, first_value = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported Gorilla payload version: {version}")
+
+    dods = [0] * (count - 1)
+    xors = [0] * (count - 1)
+    reader = _BitReader(data, _HEADER.size)
+    read, read_bit = reader.read, reader.read_bit
+    lead = trail = 0
+    for i in range(count - 1):
+        if read_bit():
+            # Tiền tố 10 / 110 / 1110 / 1111
+            if not read_bit():
+                nbits = 7
+            elif not read_bit():
+                nbits = 9
+            elif not read_bit():
+                nbits = 12
+            else:
+                nbits = 64
+            dods[i] = _signed(read(nbits), nbits)
+
+        if read_bit():
+            if read_bit():
+                lead = read(5)
+                meaningful = read(6) + 1
+                trail = 64 - lead - meaningful
+            xors[i] = read(64 - lead - trail) << trail
+
+    deltas = np.cumsum(np.asarray(dods, dtype=np.int64))
+    timestamps = np.empty(count, dtype=np.int64)
+    timestamps[0] = first_timestamp
+    timestamps[1:] = first_timestamp + np.cumsum(deltas)
+
+    bits = np.empty(count, dtype=np.uint64)
+    bits[0] = np.float64(first_value).view(np.uint64)
+    bits[1:] = np.asarray(xors, dtype=np.uint64)
+    values = np.bitwise_xor.accumulate(bits).view(np.float64)
+    return timestamps, values
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, AliasChoices
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class ThresholdSetting(BaseModel):
@@ -7,6 +7,7 @@ class ThresholdSetting(BaseModel):
     enabled: bool = Field(..., description="Enable/disable warning for this threshold")
     min: float = Field(..., description="Lower threshold value")
     max: float = Field(..., description="Upper threshold value")
+    hysteresis: Optional[float] = Field(None, ge=0, description="How far back inside the threshold a value must be to clear the alert")
 
 class Thresholds(BaseModel):
     """Model cho tất cả các ngưỡng trong một khu vực."""
@@ -20,6 +21,21 @@ class Thresholds(BaseModel):
     class Config:
         populate_by_name = True 
 
+class StoragePolicySetting(BaseModel):
+    """Model cho chính sách lưu trữ của một loại đo."""
+    mode: Optional[Literal["none", "deadband", "swinging_door"]] = Field(None, description="Compression mode")
+    deadband: Optional[float] = Field(None, ge=0, description="Minimum change (or swinging-door tolerance) before a reading is stored")
+    heartbeatSeconds: Optional[float] = Field(None, ge=0, description="Store a reading at least this often, even if unchanged")
+
+class StoragePolicy(BaseModel):
+    """Model cho chính sách lưu trữ của tất cả các loại đo."""
+    temperature: Optional[StoragePolicySetting] = Field(None, description="Temperature storage policy")
+    airHumidity: Optional[StoragePolicySetting] = Field(None, description="Humidity storage policy")
+    soilMoisture: Optional[StoragePolicySetting] = Field(None, description="Soil Moisture storage policy")
+    lightIntensity: Optional[StoragePolicySetting] = Field(None, description="Light Intensity storage policy")
+    ph: Optional[StoragePolicySetting] = Field(None, description="pH storage policy")
+    co2: Optional[StoragePolicySetting] = Field(None, description="Co2 storage policy")
+
 class ZoneBase(BaseModel):
     """Base model với các trường chung của một zone."""
     name: str = Field(..., description="Name field")
@@ -27,6 +43,7 @@ class ZoneBase(BaseModel):
     owner: str = Field(..., description="ID of owner")
     cropProfileId: Optional[str] = Field(None, description="ID của applied crop profile")
     thresholds: Thresholds = Field(..., description="Thresholds")
+    storagePolicy: Optional[StoragePolicy] = Field(None, description="Reading storage policy (overrides the crop profile)")
 
 class ZoneCreate(ZoneBase):
     """Model để tạo một zone mới."""
@@ -38,6 +55,7 @@ class ZoneUpdate(BaseModel):
     location: Optional[str] = Field(None, description="New location field")
     cropProfileId: Optional[str] = Field(None, description="New ID of applied crop proflie")
     thresholds: Optional[Thresholds] = Field(None, description="New thresholds")
+    storagePolicy: Optional[StoragePolicy] = Field(None, description="New reading storage policy")
 
 class ZoneResponse(ZoneBase):
     """Model cho dữ liệu trả về, bao gồm các trường do server tạo."""
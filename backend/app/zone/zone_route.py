@@ -1,12 +1,26 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Dict, Any
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
 
 from app.zone.zone_model import ZoneCreate, ZoneUpdate, ZoneResponse
 from app.zone.zone_service import ZoneService
+from app.scheduler.scheduler_service import SchedulerService
+from app.alter.alter_service import AlterService
+from app.action_log.action_log_service import ActionLogService
 from app.utils.logger import get_logger
 
 from app.zone_status.zone_status_route import router as zone_status_router
-from app.services.firebase_auth import get_verified_user 
+from app.services.firebase_auth import get_verified_user, get_stream_user
+from app.services.response_cache import cached_json_response
+from app.services.status_hub import status_hub
+from app.services.stream_tickets import stream_tickets
+from app.services.topology_cache import zone_topology_cache
+from app.services.zone_status_store import zone_status_store
+from app.services.hot_window import hot_window_store
+from app.services.reading_compressor import reading_compressor
+from app.services.alert_state_machine import alert_state_machine
 # Giả sử bạn có một dependency để lấy user hiện tại, nếu không có, owner_id phải được truyền vào.
 # from app.auth.dependencies import get_current_user 
 
@@ -14,6 +28,9 @@ logger = get_logger(__name__)
 
 router = APIRouter(prefix="/zones", tags=["zones"])
 zone_service = ZoneService()
+scheduler_service = SchedulerService()
+alter_service = AlterService()
+action_log_service = ActionLogService()
 
 router.include_router(zone_status_router)
 
@@ -40,6 +57,8 @@ async def create_zone(zone_data: ZoneCreate):
     if not created_zone:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create zone")
     
+    # Xoá cache âm (zone chưa tồn tại) nếu thiết bị đã gửi dữ liệu trước khi zone được tạo
+    zone_topology_cache.invalidate(created_zone['id'])
     return ZoneResponse(**created_zone)
 
 @router.get("/user/my-zones", response_model=List[Dict[str, Any]])
@@ -52,6 +71,59 @@ async def get_my_zones_with_status(user: dict = Depends(get_verified_user)):
     zones_with_status = await zone_service.get_zones_with_status_by_owner(owner_id)
     return zones_with_status
 
+def _sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+@router.post("/user/status-stream/ticket", response_model=Dict[str, Any])
+async def create_status_stream_ticket(user: dict = Depends(get_verified_user)):
+    """
+    Đổi ID token (header Authorization) lấy một ticket dùng một lần, hết hạn sau vài giây,
+    để mở /zones/user/status-stream?ticket=... (EventSource không gửi được header Authorization).
+    """
+    return {"ticket": stream_tickets.issue(user), "expiresIn": stream_tickets.ttl}
+
+@router.get("/user/status-stream")
+async def stream_my_zones_status(
+    request: Request,
+    zone_id: Optional[List[str]] = Query(None, description="Chỉ theo dõi các zone này (mặc định: tất cả zone của người dùng)"),
+    user: dict = Depends(get_stream_user),
+):
+    """
+    Đẩy trạng thái các zone của người dùng tới trình duyệt (Server-Sent Events), thay cho việc kết nối MQTT broker hoặc gọi lại GET /zones/{zone_id}/status.
+    Mỗi event `status` là JSON {"zoneId", "status", "lastReadings", ...}; trạng thái hiện tại của từng zone được gửi ngay khi kết nối.
+    Trình duyệt xác thực bằng query `ticket` lấy từ POST /zones/user/status-stream/ticket vì EventSource không gửi được header Authorization.
+    """
+    owned = {zone['id'] for zone in await zone_service.get_zones_by_owner(user["uid"])}
+    zone_ids = owned & set(zone_id) if zone_id else owned
+    if zone_id and not zone_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matching zone found")
+
+    # Đăng ký trước khi gửi trạng thái hiện tại để không bỏ lỡ cập nhật xen giữa
+    subscription = status_hub.subscribe(zone_ids)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            for current_zone_id in sorted(zone_ids):
+                current = await zone_status_store.get(current_zone_id)
+                if current:
+                    yield _sse_event("status", json.dumps({"zoneId": current_zone_id, **current}, default=str))
+            async for update in status_hub.updates(subscription):
+                if update is None:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_event("status", update[1])
+        finally:
+            status_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/", response_model=List[ZoneResponse])
 async def get_all_zones_for_owner(owner_id: str = Query(..., description="ID của người dùng để lọc các khu vực")):
     """
@@ -83,6 +155,7 @@ async def update_zone(zone_data: ZoneUpdate, zone: dict = Depends(get_zone_or_40
     success = await zone_service.update_zone(zone_id, update_dict)
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not update zone")
+    zone_topology_cache.invalidate(zone_id)
 
     # Lấy lại thông tin mới nhất để trả về
     updated_zone = await zone_service.get_zone(zone_id)
@@ -94,18 +167,93 @@ async def delete_zone(zone: dict = Depends(get_zone_or_404)):
     Xóa một khu vực.
     """
     zone_id = zone['id']
+    # Tạm ngừng nhận trạng thái của zone trong lúc xóa để ingest không ghi lại document zone_status
+    zone_topology_cache.invalidate(zone_id)
+    await zone_status_store.suspend(zone_id)
     success = await zone_service.delete_zone(zone_id)
+    # Topology có thể đã được tải lại trong lúc xóa
+    zone_topology_cache.invalidate(zone_id)
     if not success:
+        # Zone vẫn còn: nhận lại trạng thái, giữ nguyên trạng thái cảnh báo / nén
+        zone_status_store.resume(zone_id)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not delete zone")
+    await zone_status_store.discard(zone_id)
+    hot_window_store.discard(zone_id)
+    reading_compressor.forget(zone_id)
+    await alert_state_machine.discard(zone_id)
     return None 
 
 @router.get("/{zone_id}/settings-data", response_model=Dict[str, Any])
-async def get_zone_raw_data_for_settings(zone: dict = Depends(get_zone_or_404)):
+async def get_zone_raw_data_for_settings(zone_id: str, request: Request):
     """
     Lấy dữ liệu "thô" của một khu vực trực tiếp từ Firestore để dùng cho trang Cài đặt.
     Endpoint này bỏ qua model Pydantic phức tạp để đảm bảo tất cả các trường
     trong 'thresholds' được trả về đầy đủ.
+    Kèm ETag: client gửi If-None-Match trùng khớp sẽ nhận 304.
+    """
+    response = await zone_service.get_zone_settings_response(zone_id)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Zone with ID {zone_id} not found")
+    return cached_json_response(request, response)
+
+# Các phần có thể chọn qua tham số `fields` của /{zone_id}/bootstrap
+BOOTSTRAP_SECTIONS = ("zone", "status", "sensors", "actuators", "schedules", "alerts", "actionLogs")
+
+@router.get("/{zone_id}/bootstrap", response_model=Dict[str, Any])
+async def get_zone_bootstrap(
+    zone_id: str,
+    fields: Optional[str] = Query(None, description=f"Các phần cần lấy, phân tách bằng dấu phẩy (mặc định: tất cả): {', '.join(BOOTSTRAP_SECTIONS)}"),
+    alerts_limit: int = Query(20, ge=1, le=100, description="Số cảnh báo gần nhất"),
+    action_logs_limit: int = Query(20, ge=1, le=100, description="Số nhật ký hành động gần nhất"),
+):
     """
-    logger.info(f"Fetching raw settings data for zone_id: {zone['id']}")
+    Lấy mọi dữ liệu cần để hiển thị dashboard của một khu vực trong một request:
+    zone, trạng thái, sensors, actuators, lịch, cảnh báo và nhật ký hành động gần nhất.
+    Các phần được đọc song song; zone, sensors và actuators lấy từ cache cấu hình zone,
+    trạng thái lấy từ bộ nhớ. Chỉ các phần được yêu cầu có trong kết quả.
+    """
+    if fields:
+        sections = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = sorted(set(sections) - set(BOOTSTRAP_SECTIONS))
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(BOOTSTRAP_SECTIONS)}",
+            )
+    else:
+        sections = list(BOOTSTRAP_SECTIONS)
+
+    # Cấu hình zone (có trong cache) luôn được đọc để trả 404 nếu zone không tồn tại
+    loaders = {
+        "status": lambda: zone_status_store.get(zone_id),
+        "schedules": lambda: scheduler_service.get_all_schedules(zone_id=zone_id),
+        "alerts": lambda: alter_service.get_all_alters(zone_id=zone_id, limit=alerts_limit),
+        "actionLogs": lambda: action_log_service.get_action_logs(zone_id=zone_id, limit=action_logs_limit),
+    }
+    queried = [section for section in sections if section in loaders]
+    topology, *results = await asyncio.gather(
+        zone_topology_cache.get(zone_id, raise_errors=True),
+        *(loaders[section]() for section in queried),
+        return_exceptions=True,
+    )
+    if isinstance(topology, Exception):
+        # Lỗi đọc Firestore, không phải zone không tồn tại
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Could not load zone {zone_id}, try again later")
+    if topology is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Zone with ID {zone_id} not found")
+    failed = []
+    for section, result in zip(queried, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error loading bootstrap section '{section}' of zone {zone_id}: {result}")
+            failed.append(section)
+    if failed:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Could not load {', '.join(failed)}, try again later")
+
+    payload = dict(zip(queried, results))
+    if "status" in payload and payload["status"] is None:
+        payload["status"] = {"status": "Unknown"}
+    for section in ("zone", "sensors", "actuators"):
+        if section in sections:
+            payload[section] = topology[section]
 
-    return zone
\ No newline at end of file
+    return {section: payload[section] for section in sections}
@@ -6,7 +6,9 @@ import asyncio
 from app.services.database import db
 from app.utils.logger import get_logger
 
-from app.zone_status.zone_status_service import ZoneStatusService 
+from app.zone_status.zone_status_service import ZoneStatusService, INITIAL_ZONE_STATUS
+from app.services.zone_status_store import zone_status_store
+from app.services.response_cache import CachedResponse, zone_settings_cache
 from app.device.device_service import DeviceService
 from app.actuator.actuator_service import ActuatorService
 from app.sensor.sensor_service import SensorService
@@ -40,13 +42,8 @@ class ZoneService:
         if not zone_ids:
             return []
 
-        # Lấy tất cả các document status tương ứng trong một lần truy vấn
-        status_docs = await asyncio.to_thread(
-            self.status_collection.where('__name__', 'in', zone_ids).get
-        )
-        
-        # Tạo một "bản đồ" từ zone_id sang status_data để tra cứu nhanh
-        status_map = {doc.id: doc.to_dict() for doc in status_docs}
+        # Lấy trạng thái của tất cả các zone: trong bộ nhớ nếu có, phần còn lại đọc từ Firestore theo lô
+        status_map = await zone_status_store.get_many(zone_ids)
         
         # Ghép dữ liệu status vào từng zone
         for zone in zones:
@@ -67,7 +64,7 @@ class ZoneService:
             zone_id = doc_ref.id
             logger.info(f"Zone created successfully with ID: {zone_id}")
             
-            initial_status = await self.zone_status_service.create_initial_zone_status(zone_id)
+            await zone_status_store.initialize(zone_id, INITIAL_ZONE_STATUS)
 
             # Trả về dữ liệu đã tạo để không cần query lại
             created_data = zone_data.copy()
@@ -119,8 +116,6 @@ class ZoneService:
                     logger.error(f"Error during bulk provisioning for zone {zone_id}: Task {i} failed - {result}")
             
             logger.info(f"Finished hardware provisioning for zone {zone_id}.")
-
-            await self.zone_status_service.create_initial_zone_status(zone_id)
             
             return created_data
             
@@ -143,6 +138,10 @@ class ZoneService:
             logger.error(f"Error retrieving zone {zone_id}: {str(e)}")
             return None
 
+    async def get_zone_settings_response(self, zone_id: str) -> Optional[CachedResponse]:
+        """Dữ liệu thô của zone đã render sẵn (kèm ETag) từ cache; None nếu không tìm thấy."""
+        return await zone_settings_cache.get(zone_id, lambda: self.get_zone(zone_id))
+
     async def get_zones_by_owner(self, owner_id: str) -> List[Dict[str, Any]]:
         """Lấy tất cả các zone thuộc về một owner."""
         zones = []
@@ -165,6 +164,7 @@ class ZoneService:
             
             doc_ref = self.collection.document(zone_id)
             await run_in_threadpool(doc_ref.update, zone_data)
+            zone_settings_cache.invalidate(zone_id)
             
             logger.info(f"Zone updated successfully: {zone_id}")
             return True
@@ -192,6 +192,7 @@ class ZoneService:
             ]
 
             results = await asyncio.gather(*deletion_tasks, return_exceptions=True)
+            zone_settings_cache.invalidate(zone_id)
 
             all_successful = True
             for i, result in enumerate(results):
@@ -2,21 +2,20 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from typing import Dict
 
 from app.zone_status.zone_status_model import ZoneStatusUpdate, ZoneStatusResponse
-from app.zone_status.zone_status_service import ZoneStatusService
+from app.services.zone_status_store import zone_status_store
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 # Prefix thể hiện status là tài nguyên con của zone
 router = APIRouter(prefix="/{zone_id}/status", tags=["zone status"])
-zone_status_service = ZoneStatusService()
 
 @router.get("/", response_model=ZoneStatusResponse)
 async def get_current_zone_status(zone_id: str):
     """
     Lấy trạng thái hiện tại của một khu vực cụ thể.
     """
-    status_data = await zone_status_service.get_zone_status(zone_id)
+    status_data = await zone_status_store.get(zone_id)
     if not status_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,7 +37,9 @@ async def update_current_zone_status(zone_id: str, status_update: ZoneStatusUpda
             detail="No data provided for update"
         )
         
-    updated_status = await zone_status_service.update_zone_status(zone_id, update_dict)
+    await zone_status_store.load(zone_id)
+    # Cập nhật thủ công được ghi xuống Firestore ngay, không chờ lần flush định kỳ
+    updated_status = zone_status_store.update(zone_id, update_dict, flush_now=True)
 
     if not updated_status:
         raise HTTPException(
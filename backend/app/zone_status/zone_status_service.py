@@ -1,5 +1,6 @@
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from datetime import datetime
+import asyncio
 from fastapi.concurrency import run_in_threadpool
 
 from app.services.database import db
@@ -7,6 +8,16 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Số document mỗi lần gọi get_all; các phần được đọc song song
+GET_ALL_CHUNK_SIZE = 100
+
+# Trạng thái của một zone vừa được tạo
+INITIAL_ZONE_STATUS: Dict[str, Any] = {
+    "status": "Initializing",
+    "actuatorStates": {},
+    "lastReadings": {},
+}
+
 class ZoneStatusService:
     """Service class for managing zone status operations."""
 
@@ -37,15 +48,36 @@ class ZoneStatusService:
             logger.error(f"Error retrieving status for zone {zone_id}: {str(e)}")
             return None
 
+    async def get_zone_statuses(self, zone_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lấy trạng thái của nhiều zone: get_all theo từng phần GET_ALL_CHUNK_SIZE
+        document, các phần chạy song song. Zone không có document (hoặc thuộc
+        phần bị lỗi) không có trong kết quả.
+        """
+        zone_ids = list(dict.fromkeys(zone_ids))
+        chunks = [zone_ids[start:start + GET_ALL_CHUNK_SIZE] for start in range(0, len(zone_ids), GET_ALL_CHUNK_SIZE)]
+
+        def fetch(chunk: List[str]) -> list:
+            # get_all trả về generator: đọc hết trong thread
+            return list(db.get_all([self.collection.document(zone_id) for zone_id in chunk]))
+
+        results = await asyncio.gather(*(run_in_threadpool(fetch, chunk) for chunk in chunks), return_exceptions=True)
+
+        statuses: Dict[str, Dict[str, Any]] = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error retrieving status for {len(chunk)} zone(s): {result}")
+                continue
+            for doc in result:
+                if doc.exists:
+                    status_data = doc.to_dict()
+                    status_data['id'] = doc.id
+                    statuses[doc.id] = status_data
+        return statuses
+
     async def create_initial_zone_status(self, zone_id: str) -> Optional[Dict[str, Any]]:
         """Tạo một document status ban đầu cho một zone mới."""
-        initial_status_data = {
-            "status": "Initializing",  
-            "actuatorStates": {}, 
-            "lastReadings": {},  
-        }
-        
-        return await self.update_zone_status(zone_id, initial_status_data)
+        return await self.update_zone_status(zone_id, dict(INITIAL_ZONE_STATUS))
 
     async def update_zone_status(self, zone_id: str, status_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -70,6 +102,24 @@ class ZoneStatusService:
             logger.error(f"Error updating status for zone {zone_id}: {str(e)}")
             return None
         
+    async def write_zone_statuses(self, updates: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Ghi (upsert, merge) trạng thái của nhiều zone trong một batch, không đọc lại.
+        Dùng bởi zone_status_store để flush các thay đổi đã gộp.
+        """
+        if not updates:
+            return True
+        try:
+            batch = db.batch()
+            for zone_id, status_data in updates.items():
+                batch.set(self.collection.document(zone_id), status_data, merge=True)
+            await run_in_threadpool(batch.commit)
+            logger.debug(f"Wrote status for {len(updates)} zone(s).")
+            return True
+        except Exception as e:
+            logger.error(f"Error writing status for zones {list(updates)}: {str(e)}")
+            return False
+
     async def delete_status_for_zone(self, zone_id: str) -> bool:
         try:
             # Truy vấn trực tiếp bằng zone_id
@@ -0,0 +1,75 @@
+"""
+Bytes per sample and encode/decode throughput of the Gorilla codec used for
+readings_buckets, on synthetic one-hour buckets.
+
+    cd backend
+    poetry run python -m scripts.benchmark_gorilla [--interval 5] [--jitter-ms 40] [--repeat 20]
+
+"arrays" is the size of the same samples stored as Firestore arrays
+(offsets, values, sensorIndexes: 8 bytes per element each, per Firestore's
+storage size rules).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.utils import gorilla
+
+ARRAY_BYTES_PER_SAMPLE = 24
+
+
+def hour_of_offsets(rng: np.random.Generator, interval: float, jitter_ms: int) -> np.ndarray:
+    count = int(3600 / interval)
+    steps = np.full(count, int(interval * 1000), dtype=np.int64)
+    if jitter_ms:
+        steps += rng.integers(-jitter_ms, jitter_ms + 1, count)
+    steps[0] = 0
+    offsets = np.cumsum(steps)
+    return offsets[offsets < 3_600_000]
+
+
+def scenarios(rng: np.random.Generator, count: int):
+    yield "constant", np.full(count, 65.0)
+    yield "random walk, 0.1 steps", np.round(25 + np.cumsum(rng.normal(0, 0.05, count)), 1)
+    yield "random walk, 0.01 steps", np.round(6.5 + np.cumsum(rng.normal(0, 0.005, count)), 2)
+    yield "full-precision noise", 25 + rng.normal(0, 1, count)
+
+
+def benchmark(interval: float, jitter_ms: int, repeat: int):
+    rng = np.random.default_rng(0)
+    offsets = hour_of_offsets(rng, interval, jitter_ms)
+    count = len(offsets)
+    print(f"{count} samples per bucket (interval {interval}s, jitter ±{jitter_ms}ms), {repeat} runs each\n")
+    print(f"{'series':<26}{'bytes':>8}{'B/sample':>10}{'vs arrays':>11}{'encode/s':>14}{'decode/s':>14}")
+
+    for name, values in scenarios(rng, count):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            payload = gorilla.encode(offsets, values)
+        encode_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            decoded_offsets, decoded_values = gorilla.decode(payload)
+        decode_time = time.perf_counter() - started
+
+        assert np.array_equal(decoded_offsets, offsets) and np.array_equal(decoded_values, values)
+        per_sample = len(payload) / count
+        print(
+            f"{name:<26}{len(payload):>8}{per_sample:>10.2f}{ARRAY_BYTES_PER_SAMPLE / per_sample:>10.1f}x"
+            f"{count * repeat / encode_time:>14,.0f}{count * repeat / decode_time:>14,.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Gorilla codec on synthetic one-hour buckets.")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between samples")
+    parser.add_argument("--jitter-ms", type=int, default=40, help="Random jitter of each interval, in milliseconds")
+    parser.add_argument("--repeat", type=int, default=20, help="Encode/decode runs per series")
+    args = parser.parse_args()
+    benchmark(args.interval, args.jitter_ms, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency of looking up the status of every zone of one owner, as done by
+ZoneService.get_zones_with_status_by_owner, for owners with 10, 100 and 1000
+zones.
+
+    cd backend
+    poetry run python -m scripts.benchmark_zone_status [--zones 10 100 1000] [--repeat 5]
+
+Runs against the configured Firestore project (or the emulator when
+FIRESTORE_EMULATOR_HOST is set). Status documents are seeded into a scratch
+collection, which is emptied afterwards unless --keep is given.
+
+Strategies:
+  per-document  one get() per zone, awaited one after another
+  get_all       a single db.get_all() of every document
+  chunked       ZoneStatusService.get_zone_statuses (get_all chunks of
+                GET_ALL_CHUNK_SIZE, run concurrently)
+The previous `where('__name__', 'in', ids)` query is not measured: Firestore
+rejects it past 30 values.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from typing import List
+
+from app.services.database import db
+from app.services.history_writer import FIRESTORE_BATCH_LIMIT
+from app.zone_status.zone_status_service import GET_ALL_CHUNK_SIZE, ZoneStatusService
+
+
+def seed(collection, count: int) -> List[str]:
+    zone_ids = [f"benchmark_zone_{index:04d}" for index in range(count)]
+    for offset in range(0, count, FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for zone_id in zone_ids[offset:offset + FIRESTORE_BATCH_LIMIT]:
+            batch.set(collection.document(zone_id), {
+                "status": "OK",
+                "lastUpdated": datetime.utcnow(),
+                "sensors": {"temperature": {"value": 25.0}, "humidity": {"value": 60.0}},
+            })
+        batch.commit()
+    return zone_ids
+
+
+def clear(collection) -> None:
+    while True:
+        refs = [doc.reference for doc in collection.limit(FIRESTORE_BATCH_LIMIT).stream()]
+        if not refs:
+            return
+        batch = db.batch()
+        for ref in refs:
+            batch.delete(ref)
+        batch.commit()
+
+
+async def per_document(service: ZoneStatusService, zone_ids: List[str]) -> int:
+    found = 0
+    for zone_id in zone_ids:
+        doc = await asyncio.to_thread(service.collection.document(zone_id).get)
+        found += doc.exists
+    return found
+
+
+async def single_get_all(service: ZoneStatusService, zone_ids: List[str]) -> int:
+    refs = [service.collection.document(zone_id) for zone_id in zone_ids]
+    docs = await asyncio.to_thread(lambda: list(db.get_all(refs)))
+    return sum(doc.exists for doc in docs)
+
+
+async def chunked(service: ZoneStatusService, zone_ids: List[str]) -> int:
+    return len(await service.get_zone_statuses(zone_ids))
+
+
+STRATEGIES = (("per-document", per_document), ("get_all", single_get_all), ("chunked", chunked))
+
+
+async def benchmark(zone_counts: List[int], repeat: int, collection_name: str, keep: bool):
+    service = ZoneStatusService(collection_name)
+    print(f"collection {collection_name}, {repeat} run(s) each, chunk size {GET_ALL_CHUNK_SIZE}\n")
+    print(f"{'zones':>6}  {'strategy':<14}{'median ms':>11}{'min ms':>9}{'max ms':>9}")
+    try:
+        for count in zone_counts:
+            zone_ids = seed(service.collection, count)
+            for name, strategy in STRATEGIES:
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    found = await strategy(service, zone_ids)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    assert found == count, f"{name} returned {found} of {count} statuses"
+                print(f"{count:>6}  {name:<14}{statistics.median(timings):>11.1f}{min(timings):>9.1f}{max(timings):>9.1f}")
+            print()
+    finally:
+        if not keep:
+            clear(service.collection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk zone status lookups against Firestore.")
+    parser.add_argument("--zones", type=int, nargs="+", default=[10, 100, 1000], help="Zones per owner to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per strategy and zone count")
+    parser.add_argument("--collection", default="zone_status_benchmark", help="Scratch collection for seeded statuses")
+    parser.add_argument("--keep", action="store_true", help="Do not delete the seeded documents afterwards")
+    args = parser.parse_args()
+    asyncio.run(benchmark(sorted(args.zones), args.repeat, args.collection, args.keep))
+
+
+if __name__ == "__main__":
+    main()
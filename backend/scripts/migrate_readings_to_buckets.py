@@ -0,0 +1,84 @@
+"""
+Convert readings_history documents (one per reading) into readings_buckets
+documents (one per zone, type and UTC hour).
+
+    cd backend
+    poetry run python -m scripts.migrate_readings_to_buckets [--zone-id ZONE] [--dry-run] [--keep-source]
+
+ReadingHistoryService reads both layouts and merges them, so the source
+documents of every written bucket are deleted afterwards; with --keep-source
+they stay and are returned twice until removed. Merging skips samples that are
+already in a bucket (same sensor, same millisecond), so an interrupted run can
+simply be started again.
+"""
+import argparse
+from typing import Dict, List, Optional
+
+from app.services.database import db
+from app.services.history_writer import FIRESTORE_BATCH_LIMIT
+from app.services.reading_buckets import BUCKETS_COLLECTION, BucketKey, Sample, locate, write_buckets
+
+
+def delete_documents(refs: List) -> None:
+    for offset in range(0, len(refs), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        for ref in refs[offset:offset + FIRESTORE_BATCH_LIMIT]:
+            batch.delete(ref)
+        batch.commit()
+
+
+def migrate(zone_id: Optional[str] = None, page_size: int = 2000, dry_run: bool = False, keep_source: bool = False) -> None:
+    source = db.collection("readings_history")
+    buckets = db.collection(BUCKETS_COLLECTION)
+
+    query = source
+    if zone_id:
+        query = query.where(field_path='zoneId', op_string='==', value=zone_id)
+    query = query.order_by('__name__').limit(page_size)
+
+    migrated = skipped = written_buckets = 0
+    last = None
+    while True:
+        page = query.start_after(last).get() if last else query.get()
+        if not page:
+            break
+        last = page[-1]
+
+        pending: Dict[BucketKey, List[Sample]] = {}
+        refs = []
+        for doc in page:
+            data = doc.to_dict()
+            try:
+                start, offset = locate(data['readAt'])
+                sample = (offset, float(data['value']), data['sensorId'])
+                pending.setdefault((data['zoneId'], data['type'], start), []).append(sample)
+                refs.append(doc.reference)
+            except (KeyError, TypeError, ValueError) as e:
+                skipped += 1
+                print(f"Skipping {doc.id}: {e!r}")
+
+        if not dry_run:
+            written_buckets += write_buckets(buckets, pending)
+            if not keep_source:
+                delete_documents(refs)
+        else:
+            written_buckets += len(pending)
+        migrated += len(refs)
+        print(f"{migrated} reading(s) -> {written_buckets} bucket write(s) so far")
+
+    action = "would be written" if dry_run else "written"
+    print(f"Done: {migrated} reading(s), {written_buckets} bucket write(s) {action}, {skipped} skipped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate readings_history documents to hourly readings_buckets documents.")
+    parser.add_argument("--zone-id", help="Only migrate the readings of this zone")
+    parser.add_argument("--page-size", type=int, default=2000, help="Source documents read per page")
+    parser.add_argument("--dry-run", action="store_true", help="Count readings and buckets without writing anything")
+    parser.add_argument("--keep-source", action="store_true", help="Do not delete the migrated readings_history documents")
+    args = parser.parse_args()
+    migrate(args.zone_id, args.page_size, args.dry_run, args.keep_source)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 "use client"
 
-import { useEffect, useMemo, useState, useRef } from "react"
+import { useEffect, useMemo, useState } from "react"
 import { useParams } from "next/navigation"
 import { Card, CardContent } from "@/components/ui/card"
 import { Skeleton } from "@/components/ui/skeleton"
 import MetricsGrid, { type ZoneStatusReadings } from "@/components/layout/metrics-grid"
 import ZoneMap from "@/components/ui/zone-map"
 import { get } from "@/lib/api"
-import mqtt from "mqtt"
+import { subscribeZoneStatus } from "@/lib/statusStream"
 import { Leaf, MapPin, Clock, Activity, CheckCircle, AlertTriangle, XCircle } from "lucide-react"
 
 type ZoneStatusResponse = {
@@ -38,7 +38,6 @@ export default function ZoneInformationPage() {
   const [error, setError] = useState<string | null>(null)
   const [zoneStatus, setZoneStatus] = useState<ZoneStatusResponse | null>(null)
   const [zoneInfo, setZoneInfo] = useState<ZoneInfo | null>(null)
-  const clientRef = useRef<any>(null)
 
   // Fetch zone information
   useEffect(() => {
@@ -81,53 +80,22 @@ export default function ZoneInformationPage() {
     }
   }, [zoneId])
 
-  // Real-time MQTT updates
+  // Real-time status updates pushed by the backend
   useEffect(() => {
     if (!zoneId) return
 
-    const wsUrl = process.env.NEXT_PUBLIC_MQTT_BROKER_URL || "ws://localhost:8884"
-    const client = mqtt.connect(wsUrl)
-    clientRef.current = client
-
-    // Subscribe to zone-specific status updates
-    const statusTopic = `ecohub/zones/${zoneId}/status_update`
-
-    client.on("connect", () => {
-      console.log(`MQTT connected for zone ${zoneId} status updates`)
-      client.subscribe(statusTopic, { qos: 1 })
-    })
-
-    client.on("message", (topic: string, payload: Buffer) => {
-      if (topic === statusTopic) {
-        try {
-          const updatedStatusData = JSON.parse(payload.toString())
-          console.log(`Received real-time update for zone ${zoneId}:`, updatedStatusData)
-          
-          // Update zone status with real-time data
-          setZoneStatus(prevStatus => ({
-            ...prevStatus,
-            status: updatedStatusData.status || prevStatus?.status,
-            lastUpdated: updatedStatusData.lastUpdated || prevStatus?.lastUpdated,
-            lastReadings: {
-              ...prevStatus?.lastReadings,
-              ...updatedStatusData.lastReadings
-            }
-          }))
-        } catch (e) {
-          console.error("Error processing real-time status update:", e)
+    return subscribeZoneStatus([zoneId], updatedStatusData => {
+      if (updatedStatusData.zoneId !== zoneId) return
+      setZoneStatus(prevStatus => ({
+        ...prevStatus,
+        status: updatedStatusData.status || prevStatus?.status,
+        lastUpdated: updatedStatusData.lastUpdated || prevStatus?.lastUpdated,
+        lastReadings: {
+          ...prevStatus?.lastReadings,
+          ...updatedStatusData.lastReadings
         }
-      }
+      }))
     })
-
-    client.on("error", (err) => {
-      console.error("MQTT error:", err)
-    })
-
-    return () => {
-      if (clientRef.current) {
-        clientRef.current.end(true)
-      }
-    }
   }, [zoneId])
 
   const readings: Partial<ZoneStatusReadings> | undefined = useMemo(() => zoneStatus?.lastReadings, [zoneStatus])
@@ -18,6 +18,9 @@ interface NotificationPreferences {
   maxPerHour: number;
   maxPerDay: number;
   zones: string[];
+  delivery: 'immediate' | 'digest';
+  digestWindowMinutes: number;
+  criticalBypassDigest: boolean;
 }
 
 export default function NotificationPreferences() {
@@ -27,7 +30,10 @@ export default function NotificationPreferences() {
     severity: { minimum: 'info' },
     maxPerHour: 10,
     maxPerDay: 50,
-    zones: []
+    zones: [],
+    delivery: 'immediate',
+    digestWindowMinutes: 5,
+    criticalBypassDigest: true
   });
   const [loading, setLoading] = useState(false);
   const [saving, setSaving] = useState(false);
@@ -65,7 +71,10 @@ export default function NotificationPreferences() {
           severity: data.severity ?? { minimum: 'info' },
           maxPerHour: data.maxPerHour ?? 10,
           maxPerDay: data.maxPerDay ?? 50,
-          zones: data.zones ?? []
+          zones: data.zones ?? [],
+          delivery: data.delivery ?? 'immediate',
+          digestWindowMinutes: data.digestWindowMinutes ?? 5,
+          criticalBypassDigest: data.criticalBypassDigest ?? true
         });
       } else {
         console.error('Failed to load preferences');
@@ -269,6 +278,54 @@ export default function NotificationPreferences() {
           </div>
         </div>
 
+        {/* Delivery Mode */}
+        <div className="space-y-2">
+          <Label htmlFor="delivery-mode">Delivery</Label>
+          <Select
+            value={preferences.delivery}
+            onValueChange={(value) => setPreferences(prev => ({ ...prev, delivery: value as 'immediate' | 'digest' }))}
+          >
+            <SelectTrigger className="cursor-pointer">
+              <SelectValue placeholder="Select delivery mode" />
+            </SelectTrigger>
+            <SelectContent>
+              <SelectItem value="immediate">Immediate - One email per alert</SelectItem>
+              <SelectItem value="digest">Digest - One email summarizing all alerts</SelectItem>
+            </SelectContent>
+          </Select>
+          <p className="text-sm text-muted-foreground">
+            In digest mode, alerts from all your zones are collected and sent together
+          </p>
+        </div>
+
+        {preferences.delivery === 'digest' && (
+          <div className="grid grid-cols-2 gap-4">
+            <div className="space-y-2">
+              <Label htmlFor="digest-window">Digest Window (minutes)</Label>
+              <Input
+                id="digest-window"
+                type="number"
+                min="1"
+                max="1440"
+                value={preferences.digestWindowMinutes}
+                onChange={(e) => setPreferences(prev => ({ ...prev, digestWindowMinutes: parseInt(e.target.value) || 1 }))}
+              />
+              <p className="text-sm text-muted-foreground">How long alerts are collected before sending</p>
+            </div>
+            <div className="flex items-center justify-between">
+              <div className="space-y-0.5">
+                <Label htmlFor="critical-bypass">Critical Alerts Immediately</Label>
+                <p className="text-sm text-muted-foreground">Send critical alerts without waiting for the digest</p>
+              </div>
+              <Switch
+                id="critical-bypass"
+                checked={preferences.criticalBypassDigest}
+                onCheckedChange={(checked) => setPreferences(prev => ({ ...prev, criticalBypassDigest: checked }))}
+              />
+            </div>
+          </div>
+        )}
+
         {/* Save Button */}
         <div className="flex justify-end space-x-2">
           {/* <Button 
@@ -299,6 +356,7 @@ export default function NotificationPreferences() {
             <li>• <strong>Warning:</strong> Soil moisture, light intensity, and moderate issues</li>
             <li>• <strong>Critical:</strong> Extreme temperature, system failures, and urgent alerts</li>
             <li>• Rate limiting prevents notification spam while ensuring important alerts get through</li>
+            <li>• Alerts over your hourly or daily limit are not lost: they are sent in a digest later</li>
           </ul>
         </div>
       </CardContent>
@@ -9,7 +9,7 @@ import { LoadingOverlay } from "../ui/loading-overlay"
 import { get, post, del } from "@/lib/api"
 import { useAuth } from "@/contexts/AuthContext"  
 import { useRouter } from "next/navigation"
-// Import động mqtt sẽ được thực hiện trong useEffect
+import { subscribeZoneStatus } from "@/lib/statusStream"
 
 export default function HomePage() {
   const [scrollPosition, setScrollPosition] = useState(0)
@@ -72,52 +72,24 @@ export default function HomePage() {
   }, [ownerId]);
 
   // ====================================================================
-  // === BƯỚC 2: THÊM LOGIC LẮNG NGHE MQTT/WEBSOCKET =====================
+  // === BƯỚC 2: NHẬN CẬP NHẬT TRẠNG THÁI TỪ BACKEND (SERVER-SENT EVENTS) ==
   // ====================================================================
   useEffect(() => {
-    // Chỉ kết nối MQTT khi đã có danh sách fields để tránh kết nối không cần thiết
+    // Chỉ mở stream khi đã có danh sách fields để tránh kết nối không cần thiết
     if (fields.length === 0) {
       return;
     }
 
-    let client: any = null;
-    // Import động thư viện mqtt để đảm bảo nó chỉ chạy ở phía client
-    import('mqtt').then(mqtt => {
-      const brokerUrl = process.env.NEXT_PUBLIC_MQTT_BROKER_URL || 'ws://localhost:9001';
-      client = mqtt.connect(brokerUrl);
-
-      client.on('connect', () => {
-        console.log('MQTT connected for Home Page status updates.');
-        // Lắng nghe trên topic wildcard cho tất cả các zone
-        client.subscribe('ecohub/zones/+/status_update', { qos: 1 });
-      });
-
-      client.on('message', (topic: string, payload: Buffer) => {
-        try {
-          const updatedStatusData = JSON.parse(payload.toString());
-          const topicParts = topic.split('/');
-          const updatedZoneId = topicParts[2]; // Lấy zoneId từ topic
-
-          // Cập nhật state của component
-          setFields(prevFields =>
-            prevFields.map(field =>
-              field.id === updatedZoneId
-                ? { ...field, status: updatedStatusData.status || 'Updated' } // Cập nhật status cho đúng field
-                : field
-            )
-          );
-        } catch (e) {
-          console.error("Error processing status update:", e);
-        }
-      });
+    // Không truyền zone_id: backend gửi trạng thái của tất cả zone thuộc người dùng
+    return subscribeZoneStatus([], updatedStatusData => {
+      setFields(prevFields =>
+        prevFields.map(field =>
+          field.id === updatedStatusData.zoneId
+            ? { ...field, status: updatedStatusData.status || 'Updated' } // Cập nhật status cho đúng field
+            : field
+        )
+      );
     });
-
-    // Hàm dọn dẹp để ngắt kết nối khi component unmount
-    return () => {
-      if (client) {
-        client.end();
-      }
-    };
   }, [fields.length]); // Chạy lại effect này khi số lượng field thay đổi (sau khi fetch lần đầu)
 
   // ====================================================================
@@ -33,15 +33,29 @@ ChartJS.register(
   zoomPlugin
 )
 
-interface HistoricalDataPoint {
-  id: string
-  sensorId: string
-  zoneId: string
-  type: string
-  value: number
+interface SeriesPoint {
   readAt: string
+  value: number
+}
+
+interface ReadingSeries {
+  rawPoints: number
+  points: SeriesPoint[]
 }
 
+type TimeFilter = 'hours' | 'day' | 'month' | 'all'
+
+// Length of each period; "all" starts at the epoch
+const PERIOD_MS: Record<TimeFilter, number | null> = {
+  hours: 24 * 60 * 60 * 1000,
+  day: 7 * 24 * 60 * 60 * 1000,
+  month: 30 * 24 * 60 * 60 * 1000,
+  all: null,
+}
+
+// The server downsamples (and reads rollups for long periods) down to this many points
+const MAX_POINTS = 500
+
 interface ChartPopupProps {
   isOpen: boolean
   onClose: () => void
@@ -59,9 +73,9 @@ export default function ChartPopup({
   metricTitle, 
   metricUnit 
 }: ChartPopupProps) {
-  const [allData, setAllData] = useState<HistoricalDataPoint[]>([])
-  const [filteredData, setFilteredData] = useState<HistoricalDataPoint[]>([])
-  const [timeFilter, setTimeFilter] = useState<'hours' | 'day' | 'month' | 'all'>('all')
+  const [filteredData, setFilteredData] = useState<SeriesPoint[]>([])
+  const [rawPoints, setRawPoints] = useState(0)
+  const [timeFilter, setTimeFilter] = useState<TimeFilter>('all')
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const [chartRef, setChartRef] = useState<any>(null)
@@ -99,24 +113,27 @@ export default function ChartPopup({
       setLoading(true)
       setError(null)
       try {
-        const url = `/readings_history/?zone_id=${encodeURIComponent(zoneId)}&type=${encodeURIComponent(metricType)}`
+        // Only the selected period is requested, already downsampled by the server
+        const end = new Date()
+        const period = PERIOD_MS[timeFilter]
+        const start = period === null ? new Date(0) : new Date(end.getTime() - period)
+        const params = new URLSearchParams({
+          zone_id: zoneId,
+          type: metricType,
+          start: start.toISOString(),
+          end: end.toISOString(),
+          max_points: String(MAX_POINTS),
+        })
+        const url = `/readings_history/series?${params.toString()}`
         console.log("Fetching historical data from:", url)
-        console.log("Zone ID:", zoneId, "Metric Type:", metricType)
         
-        const response = await get<HistoricalDataPoint[]>(url)
-        console.log("API Response:", response)
-        console.log("Response length:", response?.length || 0)
-        
-        // If no data, show some mock data for testing
+        const response = await get<ReadingSeries>(url)
+        console.log("Response points:", response?.points?.length || 0)
         
         if (!cancelled) {
-          // Sort data by timestamp for proper display - show ALL data
-          const sortedData = response
-            .sort((a, b) => new Date(a.readAt).getTime() - new Date(b.readAt).getTime())
-          
-          console.log("Chart data:", sortedData)
-          setAllData(sortedData)
-          setFilteredData(sortedData) // Initially show all data
+          // Points are returned oldest first
+          setFilteredData(response?.points ?? [])
+          setRawPoints(response?.rawPoints ?? 0)
         }
       } catch (e) {
         console.error("Error fetching historical data:", e)
@@ -131,39 +148,7 @@ export default function ChartPopup({
     return () => {
       cancelled = true
     }
-  }, [isOpen, zoneId, metricType])
-
-  // Filter data based on time period
-  useEffect(() => {
-    if (allData.length === 0) return
-
-    const now = new Date()
-    let filtered = allData
-
-    switch (timeFilter) {
-      case 'hours':
-        // Last 24 hours
-        const last24Hours = new Date(now.getTime() - 24 * 60 * 60 * 1000)
-        filtered = allData.filter(item => new Date(item.readAt) >= last24Hours)
-        break
-      case 'day':
-        // Last 7 days
-        const last7Days = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000)
-        filtered = allData.filter(item => new Date(item.readAt) >= last7Days)
-        break
-      case 'month':
-        // Last 30 days
-        const last30Days = new Date(now.getTime() - 30 * 24 * 60 * 60 * 1000)
-        filtered = allData.filter(item => new Date(item.readAt) >= last30Days)
-        break
-      case 'all':
-      default:
-        filtered = allData
-        break
-    }
-
-    setFilteredData(filtered)
-  }, [allData, timeFilter])
+  }, [isOpen, zoneId, metricType, timeFilter])
 
   // Chart.js zoom controls
   const handleZoomIn = () => {
@@ -312,7 +297,7 @@ export default function ChartPopup({
                     variant={timeFilter === 'hours' ? 'default' : 'outline'}
                     size="sm"
                     onClick={() => setTimeFilter('hours')}
-                    disabled={loading || allData.length === 0}
+                    disabled={loading}
                     className="cursor-pointer"
                   >
                     24H
@@ -321,7 +306,7 @@ export default function ChartPopup({
                     variant={timeFilter === 'day' ? 'default' : 'outline'}
                     size="sm"
                     onClick={() => setTimeFilter('day')}
-                    disabled={loading || allData.length === 0}
+                    disabled={loading}
                     className="cursor-pointer"
                   >
                     7D
@@ -330,7 +315,7 @@ export default function ChartPopup({
                     variant={timeFilter === 'month' ? 'default' : 'outline'}
                     size="sm"
                     onClick={() => setTimeFilter('month')}
-                    disabled={loading || allData.length === 0}
+                    disabled={loading}
                     className="cursor-pointer"
                   >
                     30D
@@ -339,7 +324,7 @@ export default function ChartPopup({
                     variant={timeFilter === 'all' ? 'default' : 'outline'}
                     size="sm"
                     onClick={() => setTimeFilter('all')}
-                    disabled={loading || allData.length === 0}
+                    disabled={loading}
                     className="cursor-pointer"
                   >
                     All
@@ -414,7 +399,7 @@ export default function ChartPopup({
 
           {!loading && !error && filteredData.length > 0 && (
             <div className="mt-4 text-sm text-gray-600 text-center">
-              Showing {filteredData.length} of {allData.length} readings • Use mouse wheel to zoom • Click and drag to pan
+              Showing {filteredData.length} of {rawPoints} readings • Use mouse wheel to zoom • Click and drag to pan
             </div>
           )}
         </CardContent>
@@ -0,0 +1,69 @@
+import { post } from '@/lib/api'
+
+const BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000'
+const RECONNECT_DELAY_MS = 5000
+
+export type ZoneStatusUpdate = {
+  zoneId: string
+  status?: string
+  lastUpdated?: string | number
+  lastReadings?: Record<string, number>
+  [key: string]: unknown
+}
+
+/**
+ * Receive zone status updates pushed by the backend (Server-Sent Events),
+ * starting with the current status of every zone. Returns a function that
+ * closes the stream.
+ */
+export function subscribeZoneStatus(
+  zoneIds: string[],
+  onStatus: (update: ZoneStatusUpdate) => void,
+): () => void {
+  let source: EventSource | null = null
+  let closed = false
+  let retryTimer: ReturnType<typeof setTimeout> | undefined
+
+  function scheduleReconnect() {
+    if (!closed) retryTimer = setTimeout(connect, RECONNECT_DELAY_MS)
+  }
+
+  async function connect() {
+    // EventSource không gửi được header Authorization: đổi ID token lấy ticket dùng một lần
+    // thay vì đưa token vào URL (access log, proxy log, lịch sử trình duyệt)
+    let ticket: string
+    try {
+      ticket = (await post<{ ticket: string }>('/zones/user/status-stream/ticket', {})).ticket
+    } catch (e) {
+      console.error('Failed to get status stream ticket:', e)
+      scheduleReconnect()
+      return
+    }
+    if (closed) return
+
+    const params = new URLSearchParams()
+    zoneIds.forEach(id => params.append('zone_id', id))
+    params.set('ticket', ticket)
+
+    source = new EventSource(`${BASE_URL}/zones/user/status-stream?${params.toString()}`)
+    source.addEventListener('status', event => {
+      try {
+        onStatus(JSON.parse((event as MessageEvent).data))
+      } catch (e) {
+        console.error('Error processing status update:', e)
+      }
+    })
+    source.onerror = () => {
+      // Ticket chỉ dùng được một lần: kết nối lại với ticket mới
+      source?.close()
+      scheduleReconnect()
+    }
+  }
+
+  connect()
+  return () => {
+    closed = true
+    if (retryTimer) clearTimeout(retryTimer)
+    source?.close()
+  }
+}